@@ -1,9 +1,13 @@
 from django import forms
 from django.contrib import admin
+from django.db.models import Prefetch
 from django.urls import reverse
 from django.utils.html import format_html
 
-from chain.models import Address, NetworkLink, Product
+from chain.models import (Address, DebtClearance, DebtClearanceBatch,
+                          DebtLevelTotal, DebtTransaction, NetworkLink,
+                          Product)
+from chain.paginators import EstimatedCountPaginator
 
 
 @admin.register(NetworkLink)
@@ -18,27 +22,70 @@ class NetworkLinkAdmin(admin.ModelAdmin):
         "email",
         "address",
         "debt_to_supplier",
+        "subtree_debt",
         "supplier_link",
+        "client_count",
         "product_count",
         "view_products_link",
     )
     list_filter = ("address__city",)  # Фильтр по названию города
-    actions = ["clear_debt"]  # Добавляем admin action для очистки задолженности
+    # Поиск по подстроке использует триграммные индексы name и email
+    search_fields = ("name", "email")
+    # Поставщик выбирается через поиск с подгрузкой, а не списком всех звеньев
+    autocomplete_fields = ("supplier",)
+    ordering = ("-id",)
+    # Адрес и поставщик подгружаются тем же запросом, что и страница списка
+    list_select_related = ("address", "supplier")
+    # Без полного COUNT(*) по таблице для надписи "Показать все"
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    # Добавляем admin action для очистки задолженности
+    actions = ["clear_debt", "clear_debt_in_background"]
+
+    def get_readonly_fields(self, request, obj=None):
+        # Задолженность существующего звена меняется только через журнал
+        readonly_fields = super().get_readonly_fields(request, obj)
+        if obj is not None:
+            readonly_fields = (*readonly_fields, "debt_to_supplier")
+        return readonly_fields
 
     def clear_debt(self, request, queryset):
         """Очищает задолженность перед поставщиком у выбранных объектов"""
-        updated_count = queryset.update(debt_to_supplier=0.00)
+        clearance = self.start_debt_clearance(request, queryset)
+        clearance.run(queryset)
         self.message_user(
-            request, f"Задолженность успешно очищена для {updated_count} элементов."
+            request,
+            f"Задолженность успешно очищена для {clearance.processed} элементов "
+            f"на сумму {clearance.cleared_debt}.",
         )
 
     clear_debt.short_description = "Очистить задолженность перед поставщиком"
 
-    def product_count(self, obj):
-        """Возвращает количество продуктов"""
-        return obj.products.count()
+    def clear_debt_in_background(self, request, queryset):
+        """Запускает очистку задолженности в фоне; прогресс виден в разделе
+        "Очистки задолженности"."""
+        clearance = self.start_debt_clearance(request, queryset)
+        clearance.run_in_background(queryset)
+        url = reverse("admin:chain_debtclearance_change", args=[clearance.pk])
+        self.message_user(
+            request,
+            format_html(
+                'Очистка задолженности для {} элементов запущена: <a href="{}">{}</a>',
+                clearance.total,
+                url,
+                clearance,
+            ),
+        )
+
+    clear_debt_in_background.short_description = (
+        "Очистить задолженность перед поставщиком (в фоне)"
+    )
 
-    product_count.short_description = "Количество продуктов"
+    def start_debt_clearance(self, request, queryset):
+        return DebtClearance.objects.create(
+            user=request.user,
+            total=queryset.filter(debt_to_supplier__gt=0).count(),
+        )
 
     def view_products_link(self, obj):
         """Возвращает ссылку на список продуктов звена сети"""
@@ -53,12 +100,14 @@ class NetworkLinkAdmin(admin.ModelAdmin):
 
     def supplier_link(self, obj):
         """Возвращает ссылку на поставщика звена сети, если такой есть"""
-        if obj.supplier:
-            url = reverse("admin:chain_networklink_change", args=[obj.supplier.id])
-            return format_html('<a href="{}">{}</a>', url, obj.supplier.name)
+        supplier = obj.supplier
+        if supplier:
+            url = reverse("admin:chain_networklink_change", args=[supplier.id])
+            return format_html('<a href="{}">{}</a>', url, supplier.name)
         return "Нет поставщика"
 
     supplier_link.short_description = "Поставщик"
+    supplier_link.admin_order_field = "supplier__name"
 
     def get_fieldsets(self, request, obj=None):
         """Добавляет ссылку на поставщика на странице объекта сети"""
@@ -104,6 +153,23 @@ class ProductAdmin(admin.ModelAdmin):
         "name",
         "model",
     )
+    # Звенья сети выбираются через поиск с подгрузкой
+    autocomplete_fields = ("network_links",)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_queryset(self, request):
+        # Названия звеньев всех продуктов страницы - одним дополнительным запросом
+        return (
+            super()
+            .get_queryset(request)
+            .prefetch_related(
+                Prefetch(
+                    "network_links",
+                    queryset=NetworkLink.objects.only("id", "name").order_by("id"),
+                )
+            )
+        )
 
     def get_network_links(self, obj):
         return ", ".join(
@@ -120,3 +186,98 @@ class AddressAdmin(admin.ModelAdmin):
     list_display = ("id", "country", "city", "street", "house_number")
     list_filter = ("country", "city", "street")
     search_fields = ("country", "city", "street", "house_number")
+
+
+class DebtClearanceBatchInline(admin.TabularInline):
+    model = DebtClearanceBatch
+    fields = ("created_at", "link_count", "total_debt", "previous_debts")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DebtClearance)
+class DebtClearanceAdmin(admin.ModelAdmin):
+    """Админ-панель для журнала очисток задолженности (только просмотр)"""
+
+    list_display = (
+        "id",
+        "user",
+        "status",
+        "progress",
+        "cleared_debt",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    list_select_related = ("user",)
+    readonly_fields = (
+        "user",
+        "status",
+        "total",
+        "processed",
+        "cleared_debt",
+        "error",
+        "created_at",
+        "finished_at",
+    )
+    inlines = [DebtClearanceBatchInline]
+
+    def progress(self, obj):
+        """Возвращает прогресс очистки в виде "обработано / всего" """
+        return f"{obj.processed} / {obj.total}"
+
+    progress.short_description = "Прогресс"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DebtTransaction)
+class DebtTransactionAdmin(admin.ModelAdmin):
+    """Админ-панель для журнала задолженности (только просмотр)"""
+
+    list_display = (
+        "id",
+        "link_id",
+        "kind",
+        "amount",
+        "balance",
+        "external_id",
+        "created_at",
+    )
+    list_filter = ("kind",)
+    search_fields = ("=link__id", "=external_id")
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DebtLevelTotal)
+class DebtLevelTotalAdmin(admin.ModelAdmin):
+    """Админ-панель для итогов задолженности по уровням (только просмотр)"""
+
+    list_display = ("level", "debt")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
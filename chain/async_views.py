@@ -0,0 +1,156 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotAuthenticated, NotFound,
+                                       PermissionDenied)
+from rest_framework.request import Request
+
+from chain import cache
+from chain.models import NetworkLink
+from chain.renderers import FastJSONRenderer
+from chain.views import NetworkLinkViewSet
+from users.authentication import AsyncJWTAuthentication
+
+
+class AsyncNetworkLinkView(View):
+    """Асинхронное (ASGI) чтение звеньев сети.
+    Фильтры, пагинация, кэш, ETag и сериализация - те же, что в NetworkLinkViewSet,
+    поэтому ответы совпадают с синхронным API. К БД представление обращается
+    только через асинхронный ORM, а аутентификация и проверка прав
+    (IsActiveEmployee) выполняются без синхронных запросов.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    viewset_class = NetworkLinkViewSet
+    # Действие NetworkLinkViewSet: list, retrieve, descendants или ancestors
+    action = None
+
+    authenticator = AsyncJWTAuthentication()
+    renderer = FastJSONRenderer()
+
+    async def get(self, request, pk=None):
+        drf_request = Request(request)
+        viewset = self.viewset_class(
+            request=drf_request,
+            args=(),
+            kwargs={} if pk is None else {"pk": pk},
+            format_kwarg=None,
+            action=self.action,
+        )
+        try:
+            await self.authenticate(drf_request)
+            self.check_permissions(viewset)
+            if self.action == "retrieve":
+                return await self.retrieve(viewset, pk)
+            return await self.cached_list_response(viewset, pk)
+        except APIException as exc:
+            return self.handle_exception(drf_request, exc)
+
+    async def authenticate(self, request):
+        result = await self.authenticator.aauthenticate(request)
+        request.user, request.auth = result or (AnonymousUser(), None)
+
+    def check_permissions(self, viewset):
+        """Права проверяются по уже загруженному пользователю, без запросов к БД."""
+        request = viewset.request
+        for permission in viewset.get_permissions():
+            if not permission.has_permission(request, viewset):
+                if not request.user.is_authenticated:
+                    raise NotAuthenticated()
+                raise PermissionDenied(getattr(permission, "message", None))
+
+    async def retrieve(self, viewset, pk):
+        use_cache = not viewset.request.query_params
+        entry = await cache.aget_detail(pk) if use_cache else None
+        if entry is None:
+            # Продукты подгружаются только если ответ не 304
+            queryset = viewset.filter_queryset(
+                viewset.get_queryset().prefetch_related(None)
+            )
+            instance = await self.aget_object(queryset, pk)
+            entry = viewset.get_validators([instance])
+            not_modified = viewset.get_not_modified_response(entry)
+            if not_modified:
+                return not_modified
+            await self.prefetch(viewset, [instance])
+            entry["data"] = viewset.serialize(instance)
+            if use_cache:
+                await cache.aset_detail(pk, entry)
+        else:
+            not_modified = viewset.get_not_modified_response(entry)
+            if not_modified:
+                return not_modified
+        return self.render(viewset, entry)
+
+    async def cached_list_response(self, viewset, pk=None):
+        """Страница списка звеньев или, для descendants/ancestors, поддерева."""
+        request = viewset.request
+        key = await cache.aget_list_key(request.get_full_path())
+        entry = await cache.aget_list(key)
+        if entry is None:
+            queryset = viewset.get_queryset().prefetch_related(None)
+            if self.action in ("descendants", "ancestors"):
+                root = await self.aget_object(
+                    NetworkLink.objects.only("id", "path", "level"), pk
+                )
+                lookup = getattr(queryset, f"{self.action}_of")
+                queryset = lookup(root, depth=viewset.get_depth())
+            queryset = viewset.filter_queryset(queryset)
+
+            page = await viewset.paginator.apaginate_queryset(
+                queryset, request, view=viewset
+            )
+            entry = viewset.get_validators(page, viewset.paginator.get_next_link())
+            not_modified = viewset.get_not_modified_response(entry)
+            if not_modified:
+                return not_modified
+            await self.prefetch(viewset, page)
+            entry["data"] = viewset.get_paginated_response(
+                viewset.serialize(page, many=True)
+            ).data
+            await cache.aset_list(key, entry)
+        else:
+            not_modified = viewset.get_not_modified_response(entry)
+            if not_modified:
+                return not_modified
+        return self.render(viewset, entry)
+
+    @staticmethod
+    async def aget_object(queryset, pk):
+        try:
+            return await queryset.aget(pk=pk)
+        except NetworkLink.DoesNotExist:
+            raise NotFound()
+
+    @staticmethod
+    async def prefetch(viewset, instances):
+        # В Django 4.2 нет асинхронного prefetch_related_objects
+        await sync_to_async(prefetch_related_objects)(
+            instances, *viewset.get_prefetch_lookups()
+        )
+
+    def render(self, viewset, entry):
+        response = HttpResponse(
+            self.renderer.render(entry["data"]), content_type="application/json"
+        )
+        return viewset.set_validator_headers(response, entry)
+
+    def handle_exception(self, request, exc):
+        """Ответ на ошибку в том же виде, что и у DRF."""
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        response = HttpResponse(
+            self.renderer.render(data),
+            status=exc.status_code,
+            content_type="application/json",
+        )
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            response["WWW-Authenticate"] = self.authenticator.authenticate_header(
+                request
+            )
+        return response
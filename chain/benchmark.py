@@ -0,0 +1,265 @@
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from chain import cache
+from chain.models import (Address, DebtLevelTotal, DebtTransaction,
+                          NetworkLink, Product)
+from chain.utils import reset_sequences
+
+COUNTRIES = ["Россия", "USA", "China", "Germany", "Japan", "India", "Brazil", "France"]
+STREET = "Benchmark street"
+
+
+class SupplyChainGenerator:
+    """Синтетическая сеть поставок для нагрузочных замеров.
+
+    - `links` звеньев на `depth` уровнях: заводы на уровне 0, у каждого звена
+      в среднем `fan_out` клиентов (поставщик выбирается случайно среди звеньев
+      предыдущего уровня, поэтому число клиентов разное);
+    - `products` продуктов, у звена - в среднем `products_per_link` продуктов;
+    - адреса в `cities` городах с распределением Ципфа: при `address_skew` = 0
+      города равновероятны, чем больше - тем больше звеньев в крупных городах.
+
+    path, level, счетчики, итоги по уровням и начальные проводки журнала
+    считаются в памяти, поэтому данные согласованы так же, как после
+    создания звеньев через API, а запись идет только пакетными INSERT.
+    """
+
+    def __init__(
+        self,
+        links=10_000,
+        depth=5,
+        fan_out=10,
+        products=500,
+        products_per_link=5,
+        cities=200,
+        address_skew=1.0,
+        seed=42,
+        batch_size=5000,
+    ):
+        self.links = links
+        self.depth = max(1, depth)
+        self.fan_out = max(1, fan_out)
+        self.products = products
+        self.products_per_link = products_per_link
+        self.cities = max(1, cities)
+        self.address_skew = address_skew
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+
+    def build_levels(self):
+        """Размеры уровней: заводов столько, чтобы `depth` уровней вместили все звенья."""
+        capacity = sum(self.fan_out**level for level in range(self.depth))
+        sizes = [max(1, -(-self.links // capacity))]
+        while sum(sizes) < self.links:
+            sizes.append(min(sizes[-1] * self.fan_out, self.links - sum(sizes)))
+        return sizes
+
+    def build_cities(self):
+        cities = [
+            (COUNTRIES[n % len(COUNTRIES)], f"{COUNTRIES[n % len(COUNTRIES)]} {n}")
+            for n in range(self.cities)
+        ]
+        weights = [1 / (rank**self.address_skew) for rank in range(1, self.cities + 1)]
+        return cities, weights
+
+    def generate(self):
+        """Заполняет БД и возвращает сводку: число звеньев, продуктов и уровней."""
+        offset = NetworkLink.objects.order_by("-id").values_list("id", flat=True)
+        offset = offset.first() or 0
+        rnd = self.random
+
+        # Иерархия: поставщик, путь и уровень каждого звена
+        suppliers, paths, levels = {}, {}, {}
+        previous = []
+        pk = offset
+        for level, size in enumerate(self.build_levels()):
+            current = []
+            for _ in range(size):
+                pk += 1
+                supplier = rnd.choice(previous) if previous else None
+                suppliers[pk] = supplier
+                paths[pk] = f"{paths[supplier] if supplier else ''}{pk}/"
+                levels[pk] = level
+                current.append(pk)
+            previous = current
+
+        debts = {
+            pk: (
+                Decimal(rnd.randrange(1_000_000)) / 100
+                if supplier and rnd.random() < 0.8
+                else Decimal("0.00")
+            )
+            for pk, supplier in suppliers.items()
+        }
+
+        # Счетчики: клиенты и задолженность поддерева (от нижних уровней к верхним)
+        client_count = defaultdict(int)
+        subtree_debt = defaultdict(Decimal)
+        level_debt = defaultdict(Decimal)
+        for pk in sorted(suppliers, key=levels.get, reverse=True):
+            level_debt[levels[pk]] += debts[pk]
+            supplier = suppliers[pk]
+            if supplier:
+                client_count[supplier] += 1
+                subtree_debt[supplier] += debts[pk] + subtree_debt[pk]
+
+        product_ids = self.create_products()
+        link_products = {
+            pk: rnd.sample(
+                product_ids,
+                min(len(product_ids), rnd.randint(0, 2 * self.products_per_link)),
+            )
+            for pk in suppliers
+        }
+
+        cities, weights = self.build_cities()
+        network_types = [choice for choice, _ in NetworkLink.TYPE_CHOICES[1:]]
+        through = Product.network_links.through
+        ids = list(suppliers)
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start : start + self.batch_size]
+            addresses = [
+                Address(country=country, city=city, street=STREET, house_number=str(pk))
+                for pk, (country, city) in zip(
+                    batch, rnd.choices(cities, weights, k=len(batch))
+                )
+            ]
+            with transaction.atomic():
+                Address.objects.bulk_create(addresses)
+                NetworkLink.objects.bulk_create(
+                    NetworkLink(
+                        id=pk,
+                        name=f"Link {pk}",
+                        network_type=(
+                            "factory" if levels[pk] == 0 else rnd.choice(network_types)
+                        ),
+                        email=f"benchmark{pk}@example.com",
+                        address=address,
+                        supplier_id=suppliers[pk],
+                        debt_to_supplier=debts[pk],
+                        path=paths[pk],
+                        level=levels[pk],
+                        product_count=len(link_products[pk]),
+                        client_count=client_count[pk],
+                        subtree_debt=subtree_debt[pk],
+                    )
+                    for pk, address in zip(batch, addresses)
+                )
+                through.objects.bulk_create(
+                    through(networklink_id=pk, product_id=product_id)
+                    for pk in batch
+                    for product_id in link_products[pk]
+                )
+                DebtTransaction.objects.bulk_create(
+                    DebtTransaction(
+                        link_id=pk,
+                        amount=debts[pk],
+                        balance=debts[pk],
+                        kind=DebtTransaction.ADJUSTMENT,
+                        comment="Начальный остаток",
+                    )
+                    for pk in batch
+                    if debts[pk]
+                )
+        DebtLevelTotal.objects.add(level_debt)
+        reset_sequences(NetworkLink)
+        # Звенья добавлены в обход save(), поэтому закэшированные списки устарели
+        cache.get_cache().clear()
+        return {
+            "links": len(suppliers),
+            "products": len(product_ids),
+            "levels": len(set(levels.values())),
+            "first_id": offset + 1,
+        }
+
+    def create_products(self):
+        start = date(2010, 1, 1)
+        products = Product.objects.bulk_create(
+            Product(
+                name=f"Benchmark product {n}",
+                model=f"BM-{n}",
+                release_date=start + timedelta(days=self.random.randrange(5000)),
+            )
+            for n in range(self.products)
+        )
+        if products and products[0].pk is None:
+            # БД не возвращает id при пакетной вставке
+            return list(
+                Product.objects.filter(name__startswith="Benchmark product ")
+                .order_by("-id")
+                .values_list("id", flat=True)[: self.products]
+            )
+        return [product.pk for product in products]
+
+
+def percentile(values, percent):
+    """Процентиль по методу ближайшего ранга; `values` отсортированы."""
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[min(int(index), len(values) - 1)]
+
+
+def measure(request, repeat=20, warmup=2, rollback=False):
+    """Замеряет запрос `request()` (возвращает ответ тестового клиента).
+
+    Число запросов к БД считается на отдельном прогоне, пиковая память -
+    на прогоне с tracemalloc, время - на `repeat` прогонах без инструментов.
+    С `rollback` каждый прогон откатывается, чтобы запросы на запись
+    выполнялись на одних и тех же данных.
+    """
+
+    def run():
+        if not rollback:
+            return consume(request())
+        with transaction.atomic():
+            response = consume(request())
+            transaction.set_rollback(True)
+        return response
+
+    for _ in range(warmup):
+        run()
+
+    with CaptureQueriesContext(connection) as context:
+        response = run()
+    # Журнал запросов очищается в начале следующего запроса
+    queries = len(context.captured_queries)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    return {
+        "status": response.status_code,
+        "queries": queries,
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p90_ms": round(percentile(timings, 90), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "max_ms": round(timings[-1], 3),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def consume(response):
+    """Дочитывает потоковый ответ, чтобы замер включал всю выгрузку."""
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
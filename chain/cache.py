@@ -0,0 +1,98 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DETAIL_KEY = "chain:network_link:{}"
+LIST_KEY = "chain:network_links:{}:{}"
+LIST_GENERATION_KEY = "chain:network_links:generation"
+
+
+def get_cache():
+    return caches[settings.CHAIN_CACHE_ALIAS]
+
+
+def get_detail(pk):
+    return get_cache().get(DETAIL_KEY.format(pk))
+
+
+def set_detail(pk, data):
+    get_cache().set(DETAIL_KEY.format(pk), data, settings.CHAIN_CACHE_TIMEOUT)
+
+
+def get_list_key(full_path):
+    """Ключ списка зависит от запроса и от поколения списков:
+    любое изменение звеньев увеличивает поколение, и старые ключи
+    перестают использоваться (они вытесняются по таймауту).
+    """
+    digest = hashlib.md5(full_path.encode()).hexdigest()
+    return LIST_KEY.format(get_list_generation(), digest)
+
+
+def get_list_generation():
+    """Поколение списков: меняется при любом изменении звеньев."""
+    cache = get_cache()
+    generation = cache.get(LIST_GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        cache.add(LIST_GENERATION_KEY, generation, None)
+    return generation
+
+
+def get_list(key):
+    return get_cache().get(key)
+
+
+def set_list(key, data):
+    get_cache().set(key, data, settings.CHAIN_CACHE_TIMEOUT)
+
+
+# Асинхронные варианты для ASGI-представлений (см. chain/async_views.py)
+
+
+async def aget_detail(pk):
+    return await get_cache().aget(DETAIL_KEY.format(pk))
+
+
+async def aset_detail(pk, data):
+    await get_cache().aset(DETAIL_KEY.format(pk), data, settings.CHAIN_CACHE_TIMEOUT)
+
+
+async def aget_list_key(full_path):
+    cache = get_cache()
+    generation = await cache.aget(LIST_GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        await cache.aadd(LIST_GENERATION_KEY, generation, None)
+    digest = hashlib.md5(full_path.encode()).hexdigest()
+    return LIST_KEY.format(generation, digest)
+
+
+async def aget_list(key):
+    return await get_cache().aget(key)
+
+
+async def aset_list(key, data):
+    await get_cache().aset(key, data, settings.CHAIN_CACHE_TIMEOUT)
+
+
+def invalidate_links(link_ids):
+    """Удаляет из кэша данные звеньев и сбрасывает все закэшированные списки.
+    Повторяется после фиксации транзакции, чтобы в кэш не попали данные,
+    прочитанные до коммита.
+    """
+    keys = [DETAIL_KEY.format(pk) for pk in set(link_ids)]
+
+    def invalidate():
+        cache = get_cache()
+        if keys:
+            cache.delete_many(keys)
+        try:
+            cache.incr(LIST_GENERATION_KEY)
+        except ValueError:
+            cache.set(LIST_GENERATION_KEY, time.time_ns(), None)
+
+    invalidate()
+    transaction.on_commit(invalidate)
@@ -0,0 +1,80 @@
+from django.db.models import Q
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from chain.models import NetworkLink
+
+
+class QueryParamFilterBackend(BaseFilterBackend):
+    """Фильтрация по параметрам запроса из `filters` с проверкой значений."""
+
+    # Параметр запроса -> (lookup в ORM, поле для проверки значения)
+    filters = {}
+
+    def get_filter_kwargs(self, request):
+        lookups = {}
+        errors = {}
+        for param, (lookup, field) in self.filters.items():
+            value = request.query_params.get(param)
+            if value in (None, ""):
+                continue
+            try:
+                lookups[lookup] = field.run_validation(value)
+            except ValidationError as exc:
+                errors[param] = exc.detail
+        if errors:
+            raise ValidationError(errors)
+        return lookups
+
+    def filter_queryset(self, request, queryset, view):
+        return queryset.filter(**self.get_filter_kwargs(request))
+
+
+class NetworkLinkFilterBackend(QueryParamFilterBackend):
+    """Фильтрация звеньев сети по параметрам запроса.
+    Каждый параметр соответствует индексированному полю `Address` или `NetworkLink`.
+    """
+
+    filters = {
+        "country": ("address__country", serializers.CharField()),
+        "city": ("address__city", serializers.CharField()),
+        "network_type": (
+            "network_type",
+            serializers.ChoiceField(choices=NetworkLink.TYPE_CHOICES),
+        ),
+        "supplier": ("supplier_id", serializers.IntegerField(min_value=1)),
+        "level_min": ("level__gte", serializers.IntegerField(min_value=0)),
+        "level_max": ("level__lte", serializers.IntegerField(min_value=0)),
+        "debt_min": (
+            "debt_to_supplier__gte",
+            serializers.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        "debt_max": (
+            "debt_to_supplier__lte",
+            serializers.DecimalField(max_digits=10, decimal_places=2),
+        ),
+    }
+
+
+class ProductFilterBackend(QueryParamFilterBackend):
+    """Фильтрация каталога продуктов: диапазон даты выхода, звено сети и
+    `?search=` - подстрока в названии или модели. Поиск строит UPPER(...) LIKE,
+    который обслуживают триграммные индексы продуктов.
+    """
+
+    search_param = "search"
+    filters = {
+        "release_date_from": ("release_date__gte", serializers.DateField()),
+        "release_date_to": ("release_date__lte", serializers.DateField()),
+        "network_link": ("network_links", serializers.IntegerField(min_value=1)),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        queryset = super().filter_queryset(request, queryset, view)
+        search = request.query_params.get(self.search_param, "").strip()
+        if search:
+            queryset = queryset.filter(
+                Q(name__icontains=search) | Q(model__icontains=search)
+            )
+        return queryset
@@ -0,0 +1,259 @@
+import csv
+import io
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from chain import cache, reports
+from chain.models import (Address, DebtLevelTotal, DebtTransaction,
+                          NetworkLink, Product)
+from chain.utils import normalize_address, reset_sequences
+
+# Модели, записи которых можно загрузить (метка - как в выгрузке dumpdata)
+MODELS = {"address": Address, "networklink": NetworkLink, "product": Product}
+# Журнал и итоги задолженности строятся заново по загруженным звеньям
+DERIVED_MODELS = {"debttransaction", "debtleveltotal"}
+
+
+class ChainLoader:
+    """Потоковая загрузка адресов, звеньев сети и продуктов.
+
+    Записи (метка модели, pk, поля) обрабатываются по одной и пишутся пачками
+    по `batch_size`: в PostgreSQL через COPY, в остальных БД - пакетными INSERT.
+    Как и loaddata, записи сохраняются с исходными pk и датами, без сигналов,
+    в одной транзакции. Звено записывается, как только известен путь его
+    поставщика, поэтому клиенты могут идти в файле раньше поставщиков;
+    поставщики, которых нет в файле, ищутся в БД. path, level, счетчики,
+    итоги по уровням и начальные проводки журнала считаются во время загрузки.
+    """
+
+    def __init__(self, batch_size=5000, use_copy=None):
+        self.batch_size = batch_size
+        if use_copy is None:
+            use_copy = connection.vendor == "postgresql"
+        self.use_copy = use_copy
+
+        self.buffers = defaultdict(list)
+        self.loaded = Counter()
+        # Путь и уровень размещенных звеньев: {id: (path, level)}
+        self.paths = {}
+        # Звенья, ожидающие своего поставщика: {id поставщика: [звенья]}
+        self.waiting = defaultdict(list)
+
+        self.client_count = Counter()
+        self.product_count = Counter()
+        self.subtree_debt = defaultdict(Decimal)
+        self.level_debt = defaultdict(Decimal)
+
+    def load(self, records):
+        """Загружает записи и возвращает число загруженных объектов по моделям."""
+        with transaction.atomic():
+            for label, pk, fields in records:
+                self.add(label, pk, fields)
+            self.place_waiting()
+            self.flush()
+            self.apply_counters()
+            DebtLevelTotal.objects.add(self.level_debt)
+            reset_sequences(*MODELS.values())
+            if connection.vendor == "postgresql":
+                # Пачки моделей пишутся в порядке файла (ссылки проверяются
+                # при коммите), и триггеры не могут отнести к городам звенья
+                # и связи, записанные раньше их адресов и звеньев
+                reports.rebuild_reports()
+        # Записи добавлены в обход save(), поэтому закэшированные данные устарели
+        cache.get_cache().clear()
+        return dict(self.loaded)
+
+    def add(self, label, pk, fields):
+        name = label.rsplit(".", 1)[-1].lower()
+        if name in DERIVED_MODELS:
+            return
+        if name not in MODELS:
+            raise ValueError(f"Неизвестная модель: {label}.")
+        if pk in (None, ""):
+            raise ValueError(f"У записи {label} не указан pk.")
+
+        model = MODELS[name]
+        instance, relations = self.build(model, pk, fields)
+        if model is Address:
+            for field, value in normalize_address(instance.__dict__).items():
+                setattr(instance, field, value)
+            self.append(instance)
+        elif model is NetworkLink:
+            self.add_link(instance)
+        else:
+            self.append(instance)
+            through = Product.network_links.through
+            for link_id in set(relations.get("network_links", [])):
+                self.product_count[link_id] += 1
+                self.append(through(product_id=instance.pk, networklink_id=link_id))
+
+    @staticmethod
+    def build(model, pk, fields):
+        """Создает объект модели из значений полей (строк или JSON-значений)."""
+        instance = model(pk=model._meta.pk.to_python(pk))
+        relations = {}
+        for name, value in fields.items():
+            field = model._meta.get_field(name)
+            if field.many_to_many:
+                if isinstance(value, str):
+                    value = value.split()
+                relations[name] = [field.target_field.to_python(pk) for pk in value]
+            elif field.is_relation:
+                setattr(
+                    instance,
+                    field.attname,
+                    (
+                        None
+                        if value in (None, "")
+                        else field.target_field.to_python(value)
+                    ),
+                )
+            elif not (model is NetworkLink and name in model.MAINTAINED_FIELDS):
+                # path, level и счетчики звеньев считаются при загрузке
+                setattr(instance, field.attname, field.to_python(value))
+        # Записи вставляются без pre_save, как в loaddata, поэтому даты
+        # auto_now/auto_now_add, которых нет в записи, проставляются здесь
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            auto = getattr(field, "auto_now", False) or getattr(
+                field, "auto_now_add", False
+            )
+            if auto and getattr(instance, field.attname) is None:
+                setattr(instance, field.attname, now)
+        return instance, relations
+
+    def add_link(self, link):
+        if link.supplier_id is None:
+            self.place(link, "", -1)
+        elif link.supplier_id in self.paths:
+            self.place(link, *self.paths[link.supplier_id])
+        else:
+            self.waiting[link.supplier_id].append(link)
+
+    def place(self, link, parent_path, parent_level):
+        """Проставляет path и level звену и всем ожидавшим его клиентам."""
+        stack = [(link, parent_path, parent_level)]
+        while stack:
+            link, parent_path, parent_level = stack.pop()
+            link.path = f"{parent_path}{link.pk}{NetworkLink.PATH_SEPARATOR}"
+            link.level = parent_level + 1
+            self.paths[link.pk] = (link.path, link.level)
+
+            debt = link.get_debt()
+            link.debt_to_supplier = debt
+            self.level_debt[link.level] += debt
+            self.client_count[link.supplier_id] += 1
+            for ancestor_id in link.ancestor_ids:
+                self.subtree_debt[ancestor_id] += debt
+            if debt:
+                self.append(
+                    DebtTransaction(
+                        link_id=link.pk,
+                        amount=debt,
+                        balance=debt,
+                        kind=DebtTransaction.ADJUSTMENT,
+                        comment="Начальный остаток",
+                    )
+                )
+            self.append(link)
+            stack.extend(
+                (client, link.path, link.level)
+                for client in self.waiting.pop(link.pk, [])
+            )
+
+    def place_waiting(self):
+        """Размещает звенья, чьи поставщики не были в загрузке, по путям из БД."""
+        supplier_ids = list(self.waiting)
+        for start in range(0, len(supplier_ids), self.batch_size):
+            for pk, path, level in NetworkLink.objects.filter(
+                pk__in=supplier_ids[start : start + self.batch_size]
+            ).values_list("pk", "path", "level"):
+                for client in self.waiting.pop(pk, []):
+                    self.place(client, path, level)
+        if self.waiting:
+            raise ValueError(
+                "Поставщики не найдены или образуют цикл: "
+                f"{sorted(self.waiting)[:20]}."
+            )
+
+    def append(self, instance):
+        buffer = self.buffers[type(instance)]
+        buffer.append(instance)
+        if len(buffer) >= self.batch_size:
+            self.flush(type(instance))
+
+    def flush(self, model=None):
+        for model in [model] if model else list(self.buffers):
+            instances, self.buffers[model] = self.buffers[model], []
+            if not instances:
+                continue
+            if model in MODELS.values():
+                self.insert(model, instances)
+            else:
+                model.objects.bulk_create(instances, batch_size=self.batch_size)
+            self.loaded[model._meta.label] += len(instances)
+
+    def insert(self, model, instances):
+        """Вставляет объекты с их pk и всеми полями как есть (raw, как в loaddata)."""
+        fields = model._meta.concrete_fields
+        with connection.cursor() as cursor:
+            if self.use_copy and hasattr(cursor, "copy_expert"):
+                return self.copy(cursor, model, fields, instances)
+        batch_size = max(1, connection.ops.bulk_batch_size(fields, instances))
+        for start in range(0, len(instances), batch_size):
+            model._base_manager._insert(
+                instances[start : start + batch_size], fields=fields, raw=True
+            )
+
+    @staticmethod
+    def copy(cursor, model, fields, instances):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for instance in instances:
+            row = []
+            for field in fields:
+                value = field.get_db_prep_save(
+                    getattr(instance, field.attname), connection
+                )
+                row.append(r"\N" if value is None else value)
+            writer.writerow(row)
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        columns = ", ".join(quote(field.column) for field in fields)
+        cursor.copy_expert(
+            f"COPY {quote(model._meta.db_table)} ({columns}) "
+            r"FROM STDIN WITH (FORMAT csv, NULL '\N')",
+            buffer,
+        )
+
+    def apply_counters(self):
+        """Записывает счетчики загруженных звеньев и прибавляет вклад загрузки
+        к счетчикам звеньев, которые уже были в БД."""
+        self.client_count.pop(None, None)
+        counters = {
+            "product_count": self.product_count,
+            "client_count": self.client_count,
+            "subtree_debt": self.subtree_debt,
+        }
+        loaded_ids = {pk for values in counters.values() for pk in values} & set(
+            self.paths
+        )
+        NetworkLink.objects.bulk_update(
+            [
+                NetworkLink(
+                    pk=pk,
+                    **{field: values.get(pk, 0) for field, values in counters.items()},
+                )
+                for pk in loaded_ids
+            ],
+            list(counters),
+            batch_size=self.batch_size,
+        )
+        for field, values in counters.items():
+            NetworkLink.objects.increment(
+                field,
+                {pk: value for pk, value in values.items() if pk not in loaded_ids},
+            )
@@ -0,0 +1,332 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from chain.benchmark import SupplyChainGenerator, measure
+from chain.models import NetworkLink, Product
+from users.models import User
+from users.serializers import EmployeeTokenObtainPairSerializer
+
+API_PREFIX = "api"
+ADMIN_PREFIX = "admin"
+# Модели с changelist в админке
+ADMIN_MODELS = (
+    "networklink",
+    "product",
+    "address",
+    "debtclearance",
+    "debttransaction",
+    "debtleveltotal",
+)
+# Метрика времени, рост которой больше --threshold считается регрессией
+TIMING_METRIC = "p50_ms"
+
+
+class Command(BaseCommand):
+    help = (
+        "Набор нагрузочных замеров: генерирует синтетическую сеть поставок и "
+        "замеряет число запросов к БД, время (p50/p90/p99) и пиковую память "
+        "для всех действий NetworkLinkViewSet и changelist-страниц админки. "
+        "Результаты пишутся в JSON (--output) и сравниваются с прошлым прогоном "
+        "(--compare). Запускать только на тестовой БД!"
+    )
+
+    def add_arguments(self, parser):
+        generator = parser.add_argument_group("генератор данных")
+        generator.add_argument("--links", type=int, default=10_000)
+        generator.add_argument("--depth", type=int, default=5)
+        generator.add_argument("--fan-out", type=int, default=10)
+        generator.add_argument("--products", type=int, default=500)
+        generator.add_argument("--products-per-link", type=int, default=5)
+        generator.add_argument("--cities", type=int, default=200)
+        generator.add_argument(
+            "--address-skew",
+            type=float,
+            default=1.0,
+            help="Показатель распределения Ципфа по городам (0 - равномерно)",
+        )
+        generator.add_argument("--seed", type=int, default=42)
+        generator.add_argument(
+            "--no-generate",
+            action="store_true",
+            help="Замерять на уже заполненной БД",
+        )
+
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Оставить кэш ответов из CHAIN_CACHE_BACKEND (по умолчанию каждый "
+            "запрос идет в БД)",
+        )
+        parser.add_argument("--output", help="Файл для результатов в формате JSON")
+        parser.add_argument("--compare", help="Результаты прошлого прогона (JSON)")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Допустимый относительный рост p50 при сравнении",
+        )
+
+    def handle(self, *args, **options):
+        parameters = {
+            name: options[name]
+            for name in (
+                "links",
+                "depth",
+                "fan_out",
+                "products",
+                "products_per_link",
+                "cities",
+                "address_skew",
+                "seed",
+                "repeat",
+                "page_size",
+                "cache",
+            )
+        }
+        dataset = None
+        if not options["no_generate"]:
+            dataset = SupplyChainGenerator(
+                links=options["links"],
+                depth=options["depth"],
+                fan_out=options["fan_out"],
+                products=options["products"],
+                products_per_link=options["products_per_link"],
+                cities=options["cities"],
+                address_skew=options["address_skew"],
+                seed=options["seed"],
+            ).generate()
+            self.stdout.write(f"Создано: {dataset}")
+        if not NetworkLink.objects.exists():
+            raise CommandError("В БД нет звеньев сети.")
+
+        overrides = {"DEBUG": False, "ALLOWED_HOSTS": ["testserver"]}
+        if not options["cache"]:
+            overrides["CACHES"] = {
+                **settings.CACHES,
+                settings.CHAIN_CACHE_ALIAS: {
+                    "BACKEND": "django.core.cache.backends.dummy.DummyCache"
+                },
+            }
+
+        results = {}
+        with override_settings(**overrides):
+            for name, request, rollback in self.get_scenarios(options["page_size"]):
+                results[name] = measure(
+                    request,
+                    repeat=options["repeat"],
+                    warmup=options["warmup"],
+                    rollback=rollback,
+                )
+                self.report(name, results[name])
+
+        report = {
+            "meta": {
+                "commit": self.get_commit(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "parameters": parameters,
+                "dataset": dataset,
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                baseline = json.load(file)
+            self.compare(baseline["results"], results, options["threshold"])
+
+    def get_scenarios(self, page_size):
+        """Сценарии (название, запрос, откатывать ли изменения) на звеньях,
+        выбранных из существующих данных: корень, звено середины иерархии и лист.
+        """
+        user, _ = User.objects.get_or_create(
+            email="benchmark-admin@example.com",
+            defaults={"is_active": True, "is_staff": True, "is_superuser": True},
+        )
+        # Токен такой же, как при входе через users:login
+        token = EmployeeTokenObtainPairSerializer.get_token(user).access_token
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+        admin_client = Client()
+        admin_client.force_login(user)
+
+        links = NetworkLink.objects.order_by("level", "id")
+        root = links.first()
+        leaf = links.order_by("-level", "-id").first()
+        middle = links.filter(level=max(1, leaf.level // 2)).first() or root
+        other = links.filter(level=0).exclude(pk=root.pk).first() or root
+        product_ids = list(Product.objects.values_list("id", flat=True)[:3])
+        country = (
+            links.filter(address__isnull=False)
+            .values_list("address__country", flat=True)
+            .first()
+        ) or ""
+
+        list_url = reverse("chain:network_link-list")
+        page = {"page_size": page_size}
+
+        def detail(link, action="detail"):
+            return reverse(f"chain:network_link-{action}", args=[link.pk])
+
+        def link_data(n):
+            return {
+                "name": f"Benchmark new {n}",
+                "network_type": "retail",
+                "email": f"benchmark-new{n}@example.com",
+                "address": {
+                    "country": "Россия",
+                    "city": "Москва",
+                    "street": "Benchmark new",
+                    "house_number": str(n),
+                },
+                "supplier": middle.pk,
+                "products": product_ids,
+            }
+
+        first_page = client.get(list_url, page).json()
+        next_url = first_page.get("next") or list_url
+
+        read = [
+            ("list", lambda: client.get(list_url, page)),
+            ("list.next_page", lambda: client.get(next_url)),
+            (
+                "list.filtered",
+                lambda: client.get(
+                    list_url, {**page, "country": country, "level_min": 1}
+                ),
+            ),
+            (
+                "list.ordered",
+                lambda: client.get(list_url, {**page, "ordering": "-subtree_debt"}),
+            ),
+            (
+                "list.sparse",
+                lambda: client.get(list_url, {**page, "fields": "id,name,level"}),
+            ),
+            ("list.stream", lambda: client.get(list_url, {"stream": "ndjson"})),
+            ("retrieve", lambda: client.get(detail(middle))),
+            ("descendants", lambda: client.get(detail(root, "descendants"), page)),
+            ("ancestors", lambda: client.get(detail(leaf, "ancestors"), page)),
+            ("reports", lambda: client.get(reverse("chain:report-list"))),
+        ]
+        write = [
+            (
+                "create",
+                lambda: client.post(
+                    list_url, link_data(1), content_type="application/json"
+                ),
+            ),
+            (
+                "update",
+                lambda: client.put(
+                    detail(middle),
+                    {**link_data(2), "supplier": root.pk},
+                    content_type="application/json",
+                ),
+            ),
+            (
+                "partial_update",
+                lambda: client.patch(
+                    detail(middle),
+                    {"name": "Benchmark renamed"},
+                    content_type="application/json",
+                ),
+            ),
+            (
+                "partial_update.move",
+                lambda: client.patch(
+                    detail(middle),
+                    {"supplier": other.pk},
+                    content_type="application/json",
+                ),
+            ),
+            ("destroy", lambda: client.delete(detail(middle))),
+            (
+                "bulk",
+                lambda: client.post(
+                    reverse("chain:network_link-bulk"),
+                    [link_data(n) for n in range(100, 200)],
+                    content_type="application/json",
+                ),
+            ),
+        ]
+        admin = [
+            (
+                model,
+                lambda model=model: admin_client.get(
+                    reverse(f"admin:chain_{model}_changelist")
+                ),
+            )
+            for model in ADMIN_MODELS
+        ]
+        admin.append(
+            (
+                "networklink.search",
+                lambda: admin_client.get(
+                    reverse("admin:chain_networklink_changelist"), {"q": "Link 1"}
+                ),
+            )
+        )
+
+        for name, request in read:
+            yield f"{API_PREFIX}.{name}", request, False
+        for name, request in write:
+            yield f"{API_PREFIX}.{name}", request, True
+        for name, request in admin:
+            yield f"{ADMIN_PREFIX}.{name}", request, False
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<28} | {result['status']:>3} | {result['queries']:>3} запр. | "
+            f"p50 {result['p50_ms']:>9.2f} ms | p99 {result['p99_ms']:>9.2f} ms | "
+            f"{result['peak_memory_kib']:>9.1f} KiB"
+        )
+
+    def compare(self, baseline, results, threshold):
+        """Сравнивает с прошлым прогоном; при регрессиях завершается с ошибкой."""
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result["queries"] > before["queries"]:
+                regressions.append(
+                    f"{name}: запросов {before['queries']} -> {result['queries']}"
+                )
+            if result[TIMING_METRIC] > before[TIMING_METRIC] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {TIMING_METRIC} {before[TIMING_METRIC]} -> "
+                    f"{result[TIMING_METRIC]}"
+                )
+        if regressions:
+            raise CommandError("Регрессии:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Регрессий нет"))
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
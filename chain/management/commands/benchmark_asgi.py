@@ -0,0 +1,151 @@
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+
+HOST = "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный замер чтения звеньев сети: WSGI с синхронным API против "
+        "ASGI с синхронным и асинхронным API на одних и тех же данных "
+        "(заполнить БД можно командой benchmark_filters). Запросы подаются "
+        "в обработчики Django напрямую, без сетевого сервера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Отключить кэш ответов, чтобы каждый запрос шел в БД",
+        )
+        parser.add_argument("--email", default="benchmark@example.com")
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(
+            email=options["email"], defaults={"is_active": True}
+        )
+        self.authorization = f"Bearer {AccessToken.for_user(user)}"
+        self.query = f"page_size={options['page_size']}"
+
+        overrides = {"DEBUG": False}
+        if options["no_cache"]:
+            overrides.update(
+                CACHES={
+                    "default": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+                    },
+                    "chain": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+                }
+            )
+
+        modes = [
+            ("wsgi", "chain:network_link-list", self.run_wsgi),
+            ("asgi", "chain:network_link-list", self.run_asgi),
+            ("asgi-async", "chain:async_network_link-list", self.run_asgi),
+        ]
+        self.stdout.write(
+            f"{'mode':>10} | {'rps':>8} | {'p50, ms':>8} | {'p99, ms':>8} | errors"
+        )
+        with override_settings(**overrides):
+            for mode, url_name, run in modes:
+                started = time.perf_counter()
+                results = run(
+                    reverse(url_name), options["requests"], options["concurrency"]
+                )
+                elapsed = time.perf_counter() - started
+                self.report(mode, results, elapsed)
+
+    def report(self, mode, results, elapsed):
+        timings = sorted(timing for _, timing in results)
+        errors = sum(1 for status, _ in results if status != 200)
+        p50 = statistics.median(timings) * 1000
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+        self.stdout.write(
+            f"{mode:>10} | {len(results) / elapsed:>8.1f} | {p50:>8.2f} | "
+            f"{p99:>8.2f} | {errors}"
+        )
+
+    def run_wsgi(self, path, requests, concurrency):
+        """Пул потоков, как у многопоточного WSGI-сервера (gunicorn --threads)."""
+        handler = WSGIHandler()
+
+        def request(_):
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": path,
+                "QUERY_STRING": self.query,
+                "SERVER_NAME": HOST,
+                "SERVER_PORT": "80",
+                "HTTP_HOST": HOST,
+                "HTTP_AUTHORIZATION": self.authorization,
+                "wsgi.url_scheme": "http",
+                "wsgi.input": io.BytesIO(),
+                "wsgi.errors": sys.stderr,
+            }
+            statuses = []
+            started = time.perf_counter()
+            b"".join(handler(environ, lambda status, headers: statuses.append(status)))
+            return int(statuses[0].split()[0]), time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(request, range(requests)))
+            # Каждый поток открывал свое соединение с БД
+            executor.map(lambda _: connections.close_all(), range(concurrency))
+        return results
+
+    def run_asgi(self, path, requests, concurrency):
+        """Один цикл событий с ограничением числа одновременных запросов."""
+        handler = ASGIHandler()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": self.query.encode(),
+            "headers": [
+                (b"host", HOST.encode()),
+                (b"authorization", self.authorization.encode()),
+            ],
+            "server": (HOST, 80),
+            "client": ("127.0.0.1", 0),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def request(semaphore):
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            async with semaphore:
+                started = time.perf_counter()
+                await handler(dict(scope), receive, send)
+                return messages[0]["status"], time.perf_counter() - started
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(request(semaphore) for _ in range(requests)))
+
+        return asyncio.run(run())
@@ -0,0 +1,97 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management import BaseCommand
+from django.db import connection
+
+from chain.benchmark import COUNTRIES, SupplyChainGenerator
+from chain.models import NetworkLink
+
+CITIES_PER_COUNTRY = 50
+
+# Фильтры в том же виде, в каком их строит NetworkLinkFilterBackend
+LOOKUPS = {
+    "country": {"address__country": "Germany"},
+    "city": {"address__city": "Germany 3"},
+    "network_type+level": {"network_type": "individual", "level__gte": 3},
+    "level range": {"level__gte": 2, "level__lte": 2},
+    "debt range": {"debt_to_supplier__gte": Decimal("9990.00")},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет БД синтетическими звеньями сети и замеряет время фильтрации "
+        "на нескольких размерах таблицы. Запускать только на тестовой БД!"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--links", type=int, default=1_000_000)
+        parser.add_argument("--checkpoints", type=int, default=3)
+        parser.add_argument("--depth", type=int, default=5)
+        parser.add_argument("--fan-out", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        total = options["links"]
+        checkpoints = options["checkpoints"]
+        # Размеры таблицы, на которых делаются замеры: 1M, 100k, 10k ...
+        sizes = sorted({max(1, total // 10**i) for i in range(checkpoints)})
+
+        lookups = None
+        created = 0
+        for n, size in enumerate(sizes):
+            dataset = self.seed_links(size - created, options, seed=options["seed"] + n)
+            created = size
+            if lookups is None:
+                # Клиенты первого сгенерированного звена (завода)
+                lookups = {**LOOKUPS, "supplier": {"supplier_id": dataset["first_id"]}}
+                self.stdout.write(
+                    f"{'links':>10} | " + " | ".join(f"{name:>18}" for name in lookups)
+                )
+            self.analyze()
+            timings = [
+                self.measure(lookup, options["repeat"]) for lookup in lookups.values()
+            ]
+            self.stdout.write(
+                f"{size:>10} | " + " | ".join(f"{t * 1000:>15.2f} ms" for t in timings)
+            )
+
+    @staticmethod
+    def seed_links(links, options, seed):
+        """Добавляет `links` звеньев с адресами генератором SupplyChainGenerator:
+        path, level, счетчики, итоги по уровням и журнал согласованы так же,
+        как после создания звеньев через API. Города равновероятны.
+        """
+        return SupplyChainGenerator(
+            links=links,
+            depth=options["depth"],
+            fan_out=options["fan_out"],
+            products=0,
+            products_per_link=0,
+            cities=len(COUNTRIES) * CITIES_PER_COUNTRY,
+            address_skew=0,
+            seed=seed,
+            batch_size=options["batch_size"],
+        ).generate()
+
+    @staticmethod
+    def analyze():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    @staticmethod
+    def measure(lookup, repeat):
+        """Медианное время выборки первой страницы (100 звеньев) по фильтру."""
+        queryset = NetworkLink.objects.select_related("address").filter(**lookup)
+        queryset = queryset.order_by("created_at", "id")[:100]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from chain.benchmark import SupplyChainGenerator
+from chain.models import NetworkLink
+from chain.renderers import FastJSONRenderer, orjson
+from chain.serializers import (NetworkLinkSerializer,
+                               get_compiled_network_link_serializer)
+from chain.views import NetworkLinkViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Микробенчмарк сериализации звеньев сети: время на строку у "
+        "NetworkLinkSerializer и скомпилированного сериализатора, рендеринга "
+        "JSONRenderer и FastJSONRenderer. Данные генерируются в транзакции, "
+        "которая затем откатывается."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--links", type=int, default=1000)
+        parser.add_argument("--products-per-link", type=int, default=5)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            SupplyChainGenerator(
+                links=options["links"],
+                products=max(1, options["links"] // 10),
+                products_per_link=options["products_per_link"],
+                seed=options["seed"],
+            ).generate()
+            # Звенья с адресами и продуктами, как их загружает NetworkLinkViewSet
+            links = list(
+                NetworkLink.objects.select_related("address")
+                .prefetch_related(
+                    *NetworkLinkViewSet(request=None).get_prefetch_lookups()
+                )
+                .order_by("-id")[: options["links"]]
+            )
+            transaction.set_rollback(True)
+
+        compiled = get_compiled_network_link_serializer()
+        data = NetworkLinkSerializer(links, many=True).data
+        renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        if compiled.many(links) != data or fast_renderer.render(
+            data
+        ) != renderer.render(data):
+            raise CommandError("Вывод быстрого пути отличается от DRF.")
+
+        stages = [
+            ("serialize.drf", lambda: NetworkLinkSerializer(links, many=True).data),
+            ("serialize.compiled", lambda: compiled.many(links)),
+            ("render.json", lambda: renderer.render(data)),
+            ("render.fast", lambda: fast_renderer.render(data)),
+            (
+                "total.drf",
+                lambda: renderer.render(NetworkLinkSerializer(links, many=True).data),
+            ),
+            ("total.fast", lambda: fast_renderer.render(compiled.many(links))),
+        ]
+        self.stdout.write(
+            f"{len(links)} звеньев, orjson: {'да' if orjson else 'нет'}\n"
+            f"{'stage':<20} | {'мкс/строку':>10}"
+        )
+        for name, run in stages:
+            self.stdout.write(
+                f"{name:<20} | {self.measure(run, options['repeat'], len(links)):>10.2f}"
+            )
+
+    @staticmethod
+    def measure(run, repeat, rows):
+        """Медиана времени прогона в микросекундах на строку."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1_000_000 / max(1, rows)
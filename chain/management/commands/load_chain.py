@@ -0,0 +1,80 @@
+import csv
+import gzip
+import json
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from chain.loader import ChainLoader
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоковая загрузка адресов, звеньев сети и продуктов вместо loaddata "
+        "для больших объемов. Форматы: JSON Lines в формате "
+        "`dumpdata --format jsonl` и CSV с заголовком (файл <модель>.csv, "
+        "например networklink.csv; колонка pk, продукты звена - id через пробел). "
+        "Поддерживаются файлы .gz. path, level и счетчики звеньев вычисляются "
+        "при загрузке, журнал и итоги задолженности строятся заново."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Не использовать COPY в PostgreSQL (пакетные INSERT)",
+        )
+
+    def handle(self, *args, **options):
+        loader = ChainLoader(
+            batch_size=options["batch_size"],
+            use_copy=False if options["no_copy"] else None,
+        )
+        paths = [Path(path) for path in options["paths"]]
+        try:
+            loaded = loader.load(
+                record for path in paths for record in self.read_records(path)
+            )
+        except (ValueError, ValidationError, DatabaseError) as exc:
+            raise CommandError(f"Ничего не загружено: {exc}")
+        for label, count in sorted(loaded.items()):
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(self.style.SUCCESS("Готово"))
+
+    def read_records(self, path):
+        """Читает файл построчно и отдает записи (метка модели, pk, поля)."""
+        suffixes = [suffix.lower() for suffix in path.suffixes]
+        compressed = suffixes[-1:] == [".gz"]
+        if compressed:
+            suffixes.pop()
+        opener = gzip.open if compressed else open
+        with opener(path, "rt", encoding="utf-8", newline="") as file:
+            if suffixes[-1:] == [".csv"]:
+                yield from self.read_csv(path, file)
+            else:
+                yield from self.read_jsonl(path, file)
+
+    @staticmethod
+    def read_csv(path, file):
+        label = path.name.split(".csv")[0]
+        for row in csv.DictReader(file):
+            pk = row.pop("pk", None) or row.pop("id", None)
+            # Пустые ячейки CSV - незаданные поля
+            yield label, pk, {key: value for key, value in row.items() if value != ""}
+
+    @staticmethod
+    def read_jsonl(path, file):
+        for number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                label = record["model"]
+            except (ValueError, KeyError, TypeError) as exc:
+                raise CommandError(f"{path}, строка {number}: {exc!r}")
+            yield label, record.get("pk"), record.get("fields", {})
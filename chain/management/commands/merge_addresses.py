@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+
+from chain.models import Address, NetworkLink
+from chain.utils import merge_duplicate_addresses
+
+
+class Command(BaseCommand):
+    help = "Объединяет дубликаты адресов порциями, переводя звенья сети на один адрес."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        merged = merge_duplicate_addresses(
+            Address,
+            NetworkLink,
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Готово, удалено дубликатов: {merged}"))
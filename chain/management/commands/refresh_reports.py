@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from chain.reports import rebuild_reports
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает таблицы отчетов /chain/reports/ целиком. Обычно они "
+        "обновляются триггерами при каждой записи; пересчет нужен после изменения "
+        "данных в обход триггеров (TRUNCATE, отключенные триггеры) и для сверки."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Таблицы отчетов есть только в PostgreSQL.")
+        rebuild_reports()
+        self.stdout.write(self.style.SUCCESS("Отчеты пересчитаны"))
@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+def fill_path_and_level(apps, schema_editor):
+    NetworkLink = apps.get_model("chain", "NetworkLink")
+    suppliers = dict(NetworkLink.objects.values_list("id", "supplier_id"))
+    paths = {}
+
+    def build(pk):
+        chain = []
+        seen = set()
+        current = pk
+        while current is not None and current not in paths and current not in seen:
+            seen.add(current)
+            chain.append(current)
+            current = suppliers.get(current)
+        prefix = paths.get(current, "")
+        for node in reversed(chain):
+            prefix = f"{prefix}{node}/"
+            paths[node] = prefix
+
+    for pk in suppliers:
+        build(pk)
+
+    links = list(NetworkLink.objects.only("id"))
+    for link in links:
+        link.path = paths[link.id]
+        link.level = link.path.count("/") - 1
+    NetworkLink.objects.bulk_update(links, ["path", "level"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0010_alter_address_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networklink",
+            name="level",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Уровень иерархии"
+            ),
+        ),
+        migrations.AddField(
+            model_name="networklink",
+            name="path",
+            field=models.CharField(
+                db_index=True,
+                default="",
+                editable=False,
+                max_length=1024,
+                verbose_name="Путь",
+            ),
+        ),
+        migrations.RunPython(fill_path_and_level, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0011_networklink_path_level"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="networklink",
+            index=models.Index(
+                fields=["created_at", "id"], name="networklink_created_id_idx"
+            ),
+        ),
+    ]
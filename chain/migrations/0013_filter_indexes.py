@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0012_networklink_created_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="address",
+            index=models.Index(
+                fields=["country", "city"], name="address_country_city_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="address",
+            index=models.Index(fields=["city"], name="address_city_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="networklink",
+            index=models.Index(
+                fields=["network_type", "level"], name="networklink_type_level_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networklink",
+            index=models.Index(fields=["level"], name="networklink_level_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="networklink",
+            index=models.Index(
+                fields=["debt_to_supplier"], name="networklink_debt_idx"
+            ),
+        ),
+    ]
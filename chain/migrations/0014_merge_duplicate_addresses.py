@@ -0,0 +1,67 @@
+# Generated by Django 4.2 on 2026-10-18 11:10
+
+from django.db import migrations
+from django.db.models import Case, Value, When
+
+ADDRESS_FIELDS = ("country", "city", "street", "house_number")
+BATCH_SIZE = 1000
+
+
+def normalize(value):
+    return " ".join(str(value).split())
+
+
+def merge_addresses(apps, schema_editor):
+    """Копия chain.utils.merge_duplicate_addresses на момент миграции."""
+    Address = apps.get_model("chain", "Address")
+    NetworkLink = apps.get_model("chain", "NetworkLink")
+    canonical = {}  # нормализованный адрес -> id основного адреса
+    duplicates = {}  # id дубликата -> id основного адреса
+    to_normalize = []
+
+    def flush():
+        if not duplicates:
+            return
+        NetworkLink.objects.filter(address_id__in=duplicates).update(
+            address_id=Case(
+                *[
+                    When(address_id=duplicate_id, then=Value(canonical_id))
+                    for duplicate_id, canonical_id in duplicates.items()
+                ]
+            )
+        )
+        Address.objects.filter(pk__in=duplicates).delete()
+        duplicates.clear()
+
+    rows = Address.objects.order_by("pk").values_list("pk", *ADDRESS_FIELDS)
+    for pk, *values in rows.iterator(chunk_size=BATCH_SIZE):
+        key = tuple(normalize(value) for value in values)
+        if key in canonical:
+            duplicates[pk] = canonical[key]
+            if len(duplicates) >= BATCH_SIZE:
+                flush()
+        else:
+            canonical[key] = pk
+            if key != tuple(values):
+                to_normalize.append(pk)
+    flush()
+
+    for start in range(0, len(to_normalize), BATCH_SIZE):
+        addresses = list(
+            Address.objects.filter(pk__in=to_normalize[start : start + BATCH_SIZE])
+        )
+        for address in addresses:
+            for field in ADDRESS_FIELDS:
+                setattr(address, field, normalize(getattr(address, field)))
+        Address.objects.bulk_update(addresses, ADDRESS_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0013_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_addresses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0014_merge_duplicate_addresses"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="address",
+            name="address_country_city_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="address",
+            constraint=models.UniqueConstraint(
+                fields=("country", "city", "street", "house_number"),
+                name="unique_address",
+            ),
+        ),
+    ]
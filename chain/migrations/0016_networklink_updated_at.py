@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0015_address_unique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networklink",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+        ),
+    ]
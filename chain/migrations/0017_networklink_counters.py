@@ -0,0 +1,90 @@
+# Generated by Django 4.2 on 2026-10-18 11:16
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    NetworkLink = apps.get_model("chain", "NetworkLink")
+    Product = apps.get_model("chain", "Product")
+    through = Product.network_links.through
+
+    product_counts = dict(
+        through.objects.values_list("networklink_id").annotate(count=Count("*"))
+    )
+    client_counts = dict(
+        NetworkLink.objects.exclude(supplier=None)
+        .values_list("supplier_id")
+        .annotate(count=Count("*"))
+    )
+    subtree_debts = defaultdict(int)
+    for path, debt in NetworkLink.objects.filter(debt_to_supplier__gt=0).values_list(
+        "path", "debt_to_supplier"
+    ):
+        for pk in path.split("/")[:-2]:
+            subtree_debts[int(pk)] += debt
+
+    links = list(NetworkLink.objects.only("id"))
+    for link in links:
+        link.product_count = product_counts.get(link.id, 0)
+        link.client_count = client_counts.get(link.id, 0)
+        link.subtree_debt = subtree_debts.get(link.id, 0)
+    NetworkLink.objects.bulk_update(
+        links, ["product_count", "client_count", "subtree_debt"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0016_networklink_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="networklink",
+            name="client_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество клиентов"
+            ),
+        ),
+        migrations.AddField(
+            model_name="networklink",
+            name="product_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Количество продуктов"
+            ),
+        ),
+        migrations.AddField(
+            model_name="networklink",
+            name="subtree_debt",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                max_digits=14,
+                verbose_name="Задолженность клиентов",
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="networklink",
+            index=models.Index(
+                fields=["product_count", "id"], name="networklink_products_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networklink",
+            index=models.Index(
+                fields=["client_count", "id"], name="networklink_clients_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="networklink",
+            index=models.Index(
+                fields=["subtree_debt", "id"], name="networklink_subtree_debt_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,158 @@
+# Generated by Django 4.2 on 2026-10-18 11:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_ledger(apps, schema_editor):
+    """Начальные остатки: по проводке на каждое звено с задолженностью
+    и итоги по уровням."""
+    NetworkLink = apps.get_model("chain", "NetworkLink")
+    DebtTransaction = apps.get_model("chain", "DebtTransaction")
+    DebtLevelTotal = apps.get_model("chain", "DebtLevelTotal")
+
+    links = NetworkLink.objects.filter(debt_to_supplier__gt=0)
+    DebtTransaction.objects.bulk_create(
+        (
+            DebtTransaction(
+                link_id=pk,
+                amount=debt,
+                balance=debt,
+                kind="adjustment",
+                comment="Начальный остаток",
+            )
+            for pk, debt in links.values_list("pk", "debt_to_supplier").iterator()
+        ),
+        batch_size=1000,
+    )
+    DebtLevelTotal.objects.bulk_create(
+        DebtLevelTotal(level=level, debt=debt)
+        for level, debt in links.order_by()
+        .values_list("level")
+        .annotate(debt=Sum("debt_to_supplier"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0019_debt_clearance"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DebtLevelTotal",
+            fields=[
+                (
+                    "level",
+                    models.PositiveIntegerField(
+                        primary_key=True, serialize=False, verbose_name="Уровень"
+                    ),
+                ),
+                (
+                    "debt",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=16,
+                        verbose_name="Задолженность",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Задолженность уровня",
+                "verbose_name_plural": "Задолженность по уровням",
+                "ordering": ("level",),
+            },
+        ),
+        migrations.CreateModel(
+            name="DebtTransaction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=10, verbose_name="Сумма изменения"
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=10,
+                        verbose_name="Остаток после проводки",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("ingest", "Проводка"),
+                            ("adjustment", "Корректировка"),
+                            ("clearance", "Очистка задолженности"),
+                            ("closing", "Удаление звена"),
+                        ],
+                        default="ingest",
+                        max_length=10,
+                        verbose_name="Тип",
+                    ),
+                ),
+                (
+                    "external_id",
+                    models.CharField(
+                        blank=True,
+                        max_length=64,
+                        null=True,
+                        unique=True,
+                        verbose_name="Внешний идентификатор",
+                    ),
+                ),
+                (
+                    "comment",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Комментарий"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата проводки"
+                    ),
+                ),
+                (
+                    "link",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="debt_transactions",
+                        to="chain.networklink",
+                        verbose_name="Звено сети",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Проводка задолженности",
+                "verbose_name_plural": "Журнал задолженности",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="debttransaction",
+            index=models.Index(fields=["link", "id"], name="debttransaction_link_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="debttransaction",
+            index=models.Index(
+                fields=["created_at", "id"], name="debttransaction_created_idx"
+            ),
+        ),
+        migrations.RunPython(fill_ledger, migrations.RunPython.noop),
+    ]
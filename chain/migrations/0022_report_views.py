@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-18 12:30
+
+from django.db import migrations
+
+LINKS = "chain_networklink l LEFT JOIN chain_address a ON a.id = l.address_id"
+DEBT = "COUNT(*) AS links, COALESCE(SUM(l.debt_to_supplier), 0) AS debt"
+
+# Представления отчетов на момент миграции: имя, ключи, запрос
+VIEWS = [
+    (
+        "chain_report_debt_by_country",
+        "country",
+        f"SELECT COALESCE(a.country, '') AS country, {DEBT} "
+        f"FROM {LINKS} GROUP BY COALESCE(a.country, '')",
+    ),
+    (
+        "chain_report_debt_by_network_type",
+        "network_type",
+        f"SELECT l.network_type AS network_type, {DEBT} "
+        "FROM chain_networklink l GROUP BY l.network_type",
+    ),
+    (
+        "chain_report_debt_by_level",
+        "level",
+        f"SELECT l.level AS level, {DEBT} FROM chain_networklink l GROUP BY l.level",
+    ),
+    (
+        "chain_report_product_coverage_by_city",
+        "country, city",
+        "SELECT COALESCE(a.country, '') AS country, COALESCE(a.city, '') AS city, "
+        "COUNT(DISTINCT l.id) AS links, COUNT(DISTINCT pl.product_id) AS products "
+        f"FROM {LINKS} LEFT JOIN chain_product_network_links pl "
+        "ON pl.networklink_id = l.id "
+        "GROUP BY COALESCE(a.country, ''), COALESCE(a.city, '')",
+    ),
+]
+
+
+def create_views(apps, schema_editor):
+    """Материализованные представления отчетов (только PostgreSQL).
+    Создаются пустыми и заполняются при первом чтении или refresh_reports.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for view, keys, sql in VIEWS:
+        schema_editor.execute(f"CREATE MATERIALIZED VIEW {view} AS {sql} WITH NO DATA")
+        # Уникальный индекс нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+        schema_editor.execute(f"CREATE UNIQUE INDEX {view}_key ON {view} ({keys})")
+
+
+def drop_views(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for view, _, _ in VIEWS:
+        schema_editor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0021_product_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_views, drop_views),
+    ]
@@ -0,0 +1,420 @@
+# Generated by Django 4.2 on 2026-10-18 13:40
+
+from importlib import import_module
+
+from django.db import migrations
+
+# Материализованные представления 0022, которые заменяют таблицы этой миграции
+VIEWS = import_module("chain.migrations.0022_report_views").VIEWS
+
+# Таблицы отчетов, которые поддерживаются триггерами инкрементально: каждая
+# запись в звенья, адреса и связи продуктов переносит в них только приращения.
+# Строки с нулевым числом звеньев удаляются (частичные индексы links = 0).
+TABLES = """
+CREATE TABLE chain_report_debt_by_country (
+    country varchar(100) PRIMARY KEY,
+    links bigint NOT NULL,
+    debt numeric NOT NULL
+);
+CREATE INDEX chain_report_debt_by_country_empty
+    ON chain_report_debt_by_country (country) WHERE links = 0;
+
+CREATE TABLE chain_report_debt_by_network_type (
+    network_type varchar(10) PRIMARY KEY,
+    links bigint NOT NULL,
+    debt numeric NOT NULL
+);
+CREATE INDEX chain_report_debt_by_network_type_empty
+    ON chain_report_debt_by_network_type (network_type) WHERE links = 0;
+
+CREATE TABLE chain_report_product_coverage_by_city (
+    country varchar(100) NOT NULL,
+    city varchar(100) NOT NULL,
+    links bigint NOT NULL,
+    products bigint NOT NULL,
+    PRIMARY KEY (country, city)
+);
+CREATE INDEX chain_report_product_coverage_by_city_empty
+    ON chain_report_product_coverage_by_city (country, city) WHERE links = 0;
+
+-- Число звеньев города, продающих продукт: products города - число его строк
+CREATE TABLE chain_report_city_products (
+    country varchar(100) NOT NULL,
+    city varchar(100) NOT NULL,
+    product_id integer NOT NULL,
+    links bigint NOT NULL,
+    PRIMARY KEY (country, city, product_id)
+);
+CREATE INDEX chain_report_city_products_empty
+    ON chain_report_city_products (country, city, product_id) WHERE links = 0;
+"""
+
+FUNCTIONS = """
+-- Приращения звеньев {страна, город, тип: число звеньев, задолженность}
+CREATE FUNCTION chain_report_add_links(
+    p_countries varchar[], p_cities varchar[], p_types varchar[],
+    p_links bigint[], p_debts numeric[]
+) RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+    -- Строки итогов обновляются в порядке ключей, чтобы параллельные
+    -- транзакции блокировали их в одном порядке
+    INSERT INTO chain_report_debt_by_country AS t (country, links, debt)
+    SELECT d.country, SUM(d.links), SUM(d.debt)
+    FROM unnest(p_countries, p_links, p_debts) AS d(country, links, debt)
+    GROUP BY d.country HAVING SUM(d.links) <> 0 OR SUM(d.debt) <> 0
+    ORDER BY d.country
+    ON CONFLICT (country) DO UPDATE
+    SET links = t.links + EXCLUDED.links, debt = t.debt + EXCLUDED.debt;
+
+    INSERT INTO chain_report_debt_by_network_type AS t (network_type, links, debt)
+    SELECT d.network_type, SUM(d.links), SUM(d.debt)
+    FROM unnest(p_types, p_links, p_debts) AS d(network_type, links, debt)
+    GROUP BY d.network_type HAVING SUM(d.links) <> 0 OR SUM(d.debt) <> 0
+    ORDER BY d.network_type
+    ON CONFLICT (network_type) DO UPDATE
+    SET links = t.links + EXCLUDED.links, debt = t.debt + EXCLUDED.debt;
+
+    INSERT INTO chain_report_product_coverage_by_city AS t (
+        country, city, links, products
+    )
+    SELECT d.country, d.city, SUM(d.links), 0
+    FROM unnest(p_countries, p_cities, p_links) AS d(country, city, links)
+    GROUP BY d.country, d.city HAVING SUM(d.links) <> 0
+    ORDER BY d.country, d.city
+    ON CONFLICT (country, city) DO UPDATE SET links = t.links + EXCLUDED.links;
+END
+$$;
+
+-- Приращения связей продуктов {страна, город, продукт: число звеньев}
+CREATE FUNCTION chain_report_add_products(
+    p_countries varchar[], p_cities varchar[], p_products integer[],
+    p_links bigint[]
+) RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+    WITH d AS (
+        SELECT d.country, d.city, d.product_id, SUM(d.links) AS links
+        FROM unnest(p_countries, p_cities, p_products, p_links)
+            AS d(country, city, product_id, links)
+        GROUP BY d.country, d.city, d.product_id HAVING SUM(d.links) <> 0
+    ), changed AS (
+        INSERT INTO chain_report_city_products AS t (
+            country, city, product_id, links
+        )
+        SELECT d.country, d.city, d.product_id, d.links FROM d
+        ORDER BY d.country, d.city, d.product_id
+        ON CONFLICT (country, city, product_id) DO UPDATE
+        SET links = t.links + EXCLUDED.links
+        RETURNING t.country, t.city, t.product_id, t.links
+    )
+    -- Продукт появился в городе (0 -> n звеньев) или пропал из него (n -> 0)
+    INSERT INTO chain_report_product_coverage_by_city AS t (
+        country, city, links, products
+    )
+    SELECT c.country, c.city, 0,
+        SUM((c.links > 0)::integer - (c.links - d.links > 0)::integer)
+    FROM changed c JOIN d USING (country, city, product_id)
+    GROUP BY c.country, c.city
+    HAVING SUM((c.links > 0)::integer - (c.links - d.links > 0)::integer) <> 0
+    ORDER BY c.country, c.city
+    ON CONFLICT (country, city) DO UPDATE SET products = t.products + EXCLUDED.products;
+END
+$$;
+
+CREATE FUNCTION chain_report_delete_empty() RETURNS void LANGUAGE sql AS $$
+    DELETE FROM chain_report_city_products WHERE links = 0;
+    DELETE FROM chain_report_product_coverage_by_city WHERE links = 0;
+    DELETE FROM chain_report_debt_by_country WHERE links = 0;
+    DELETE FROM chain_report_debt_by_network_type WHERE links = 0;
+$$;
+
+-- Звенья: вставка, удаление, смена адреса, типа или задолженности
+CREATE FUNCTION chain_report_networklink_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    countries varchar[]; cities varchar[]; types varchar[];
+    links bigint[]; debts numeric[];
+    p_countries varchar[]; p_cities varchar[]; products integer[];
+    p_links bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(COALESCE(a.country, '')), array_agg(COALESCE(a.city, '')),
+            array_agg(r.network_type), array_agg(1::bigint),
+            array_agg(r.debt_to_supplier)
+        INTO countries, cities, types, links, debts
+        FROM new_rows r LEFT JOIN chain_address a ON a.id = r.address_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        -- Связи с продуктами Django удаляет раньше звена (их учел другой триггер)
+        SELECT array_agg(COALESCE(a.country, '')), array_agg(COALESCE(a.city, '')),
+            array_agg(r.network_type), array_agg(-1::bigint),
+            array_agg(-r.debt_to_supplier)
+        INTO countries, cities, types, links, debts
+        FROM old_rows r LEFT JOIN chain_address a ON a.id = r.address_id;
+    ELSE
+        WITH changed AS (
+            SELECT o.address_id AS old_address_id, o.network_type AS old_type,
+                o.debt_to_supplier AS old_debt, n.address_id, n.network_type,
+                n.debt_to_supplier
+            FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE (o.address_id, o.network_type, o.debt_to_supplier)
+                IS DISTINCT FROM (n.address_id, n.network_type, n.debt_to_supplier)
+        )
+        SELECT array_agg(COALESCE(a.country, '')), array_agg(COALESCE(a.city, '')),
+            array_agg(r.network_type), array_agg(r.links), array_agg(r.debt)
+        INTO countries, cities, types, links, debts
+        FROM (
+            SELECT old_address_id AS address_id, old_type AS network_type,
+                -1::bigint AS links, -old_debt AS debt
+            FROM changed
+            UNION ALL
+            SELECT address_id, network_type, 1::bigint, debt_to_supplier
+            FROM changed
+        ) r LEFT JOIN chain_address a ON a.id = r.address_id;
+
+        -- Продукты звена со сменой адреса переходят в другой город
+        WITH moved AS (
+            SELECT n.id, o.address_id AS old_address_id, n.address_id
+            FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE o.address_id IS DISTINCT FROM n.address_id
+        )
+        SELECT array_agg(COALESCE(a.country, '')), array_agg(COALESCE(a.city, '')),
+            array_agg(r.product_id), array_agg(r.links)
+        INTO p_countries, p_cities, products, p_links
+        FROM (
+            SELECT m.old_address_id AS address_id, pl.product_id, -1::bigint AS links
+            FROM moved m
+            JOIN chain_product_network_links pl ON pl.networklink_id = m.id
+            UNION ALL
+            SELECT m.address_id, pl.product_id, 1::bigint
+            FROM moved m
+            JOIN chain_product_network_links pl ON pl.networklink_id = m.id
+        ) r LEFT JOIN chain_address a ON a.id = r.address_id;
+        PERFORM chain_report_add_products(p_countries, p_cities, products, p_links);
+    END IF;
+    PERFORM chain_report_add_links(countries, cities, types, links, debts);
+    PERFORM chain_report_delete_empty();
+    RETURN NULL;
+END
+$$;
+
+-- Адреса: смена страны или города переносит звенья адреса и их продукты.
+-- Удаленный адрес Django может удалить раньше его звеньев (внешний ключ
+-- допускает NULL), поэтому звенья переносятся в группу без адреса ('')
+CREATE FUNCTION chain_report_address_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    ids integer[]; old_countries varchar[]; old_cities varchar[];
+    new_countries varchar[]; new_cities varchar[];
+    countries varchar[]; cities varchar[]; types varchar[];
+    links bigint[]; debts numeric[];
+    p_countries varchar[]; p_cities varchar[]; products integer[];
+    p_links bigint[];
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT array_agg(o.id), array_agg(o.country), array_agg(o.city),
+            array_agg(''::varchar), array_agg(''::varchar)
+        INTO ids, old_countries, old_cities, new_countries, new_cities
+        FROM old_rows o;
+    ELSE
+        SELECT array_agg(n.id), array_agg(o.country), array_agg(o.city),
+            array_agg(n.country), array_agg(n.city)
+        INTO ids, old_countries, old_cities, new_countries, new_cities
+        FROM old_rows o JOIN new_rows n ON n.id = o.id
+        WHERE (o.country, o.city) IS DISTINCT FROM (n.country, n.city);
+    END IF;
+
+    WITH moved AS (
+        SELECT l.network_type, l.debt_to_supplier, m.old_country,
+            m.old_city, m.country, m.city
+        FROM unnest(ids, old_countries, old_cities, new_countries, new_cities)
+            AS m(id, old_country, old_city, country, city)
+        JOIN chain_networklink l ON l.address_id = m.id
+    )
+    SELECT array_agg(r.country), array_agg(r.city), array_agg(r.network_type),
+        array_agg(r.links), array_agg(r.debt)
+    INTO countries, cities, types, links, debts
+    FROM (
+        SELECT old_country AS country, old_city AS city, network_type,
+            -1::bigint AS links, -debt_to_supplier AS debt
+        FROM moved
+        UNION ALL
+        SELECT country, city, network_type, 1::bigint, debt_to_supplier FROM moved
+    ) r;
+
+    WITH moved AS (
+        SELECT pl.product_id, m.old_country, m.old_city, m.country, m.city
+        FROM unnest(ids, old_countries, old_cities, new_countries, new_cities)
+            AS m(id, old_country, old_city, country, city)
+        JOIN chain_networklink l ON l.address_id = m.id
+        JOIN chain_product_network_links pl ON pl.networklink_id = l.id
+    )
+    SELECT array_agg(r.country), array_agg(r.city), array_agg(r.product_id),
+        array_agg(r.links)
+    INTO p_countries, p_cities, products, p_links
+    FROM (
+        SELECT old_country AS country, old_city AS city, product_id,
+            -1::bigint AS links
+        FROM moved
+        UNION ALL
+        SELECT country, city, product_id, 1::bigint FROM moved
+    ) r;
+
+    PERFORM chain_report_add_products(p_countries, p_cities, products, p_links);
+    PERFORM chain_report_add_links(countries, cities, types, links, debts);
+    PERFORM chain_report_delete_empty();
+    RETURN NULL;
+END
+$$;
+
+-- Связи продуктов со звеньями: добавление и удаление
+CREATE FUNCTION chain_report_product_links_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    p_countries varchar[]; p_cities varchar[]; products integer[];
+    p_links bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(COALESCE(a.country, '')), array_agg(COALESCE(a.city, '')),
+            array_agg(r.product_id), array_agg(1::bigint)
+        INTO p_countries, p_cities, products, p_links
+        FROM new_rows r
+        JOIN chain_networklink l ON l.id = r.networklink_id
+        LEFT JOIN chain_address a ON a.id = l.address_id;
+    ELSE
+        SELECT array_agg(COALESCE(a.country, '')), array_agg(COALESCE(a.city, '')),
+            array_agg(r.product_id), array_agg(-1::bigint)
+        INTO p_countries, p_cities, products, p_links
+        FROM old_rows r
+        JOIN chain_networklink l ON l.id = r.networklink_id
+        LEFT JOIN chain_address a ON a.id = l.address_id;
+    END IF;
+    PERFORM chain_report_add_products(p_countries, p_cities, products, p_links);
+    PERFORM chain_report_delete_empty();
+    RETURN NULL;
+END
+$$;
+
+-- Полный пересчет таблиц (заполнение после миграции и восстановление)
+CREATE FUNCTION chain_report_rebuild() RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+    LOCK TABLE chain_networklink, chain_address, chain_product_network_links
+        IN SHARE MODE;
+    DELETE FROM chain_report_debt_by_country;
+    DELETE FROM chain_report_debt_by_network_type;
+    DELETE FROM chain_report_product_coverage_by_city;
+    DELETE FROM chain_report_city_products;
+
+    INSERT INTO chain_report_debt_by_country (country, links, debt)
+    SELECT COALESCE(a.country, ''), COUNT(*), SUM(l.debt_to_supplier)
+    FROM chain_networklink l LEFT JOIN chain_address a ON a.id = l.address_id
+    GROUP BY COALESCE(a.country, '');
+
+    INSERT INTO chain_report_debt_by_network_type (network_type, links, debt)
+    SELECT l.network_type, COUNT(*), SUM(l.debt_to_supplier)
+    FROM chain_networklink l GROUP BY l.network_type;
+
+    INSERT INTO chain_report_city_products (country, city, product_id, links)
+    SELECT COALESCE(a.country, ''), COALESCE(a.city, ''), pl.product_id, COUNT(*)
+    FROM chain_product_network_links pl
+    JOIN chain_networklink l ON l.id = pl.networklink_id
+    LEFT JOIN chain_address a ON a.id = l.address_id
+    GROUP BY COALESCE(a.country, ''), COALESCE(a.city, ''), pl.product_id;
+
+    INSERT INTO chain_report_product_coverage_by_city (country, city, links, products)
+    SELECT COALESCE(a.country, ''), COALESCE(a.city, ''), COUNT(*), 0
+    FROM chain_networklink l LEFT JOIN chain_address a ON a.id = l.address_id
+    GROUP BY COALESCE(a.country, ''), COALESCE(a.city, '');
+
+    UPDATE chain_report_product_coverage_by_city t SET products = p.products
+    FROM (
+        SELECT country, city, COUNT(*) AS products
+        FROM chain_report_city_products GROUP BY country, city
+    ) p
+    WHERE t.country = p.country AND t.city = p.city;
+END
+$$;
+"""
+
+# Триггеры уровня оператора с таблицами переходов: один вызов на запрос
+# (в том числе на bulk_create, UPDATE многих строк и COPY)
+TRIGGERS = """
+CREATE TRIGGER chain_report_networklink_insert AFTER INSERT ON chain_networklink
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chain_report_networklink_changed();
+CREATE TRIGGER chain_report_networklink_update AFTER UPDATE ON chain_networklink
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chain_report_networklink_changed();
+CREATE TRIGGER chain_report_networklink_delete AFTER DELETE ON chain_networklink
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chain_report_networklink_changed();
+CREATE TRIGGER chain_report_address_update AFTER UPDATE ON chain_address
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chain_report_address_changed();
+CREATE TRIGGER chain_report_address_delete AFTER DELETE ON chain_address
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chain_report_address_changed();
+CREATE TRIGGER chain_report_product_links_insert
+    AFTER INSERT ON chain_product_network_links
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chain_report_product_links_changed();
+CREATE TRIGGER chain_report_product_links_delete
+    AFTER DELETE ON chain_product_network_links
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chain_report_product_links_changed();
+"""
+
+DROP = """
+DROP TRIGGER chain_report_networklink_insert ON chain_networklink;
+DROP TRIGGER chain_report_networklink_update ON chain_networklink;
+DROP TRIGGER chain_report_networklink_delete ON chain_networklink;
+DROP TRIGGER chain_report_address_update ON chain_address;
+DROP TRIGGER chain_report_address_delete ON chain_address;
+DROP TRIGGER chain_report_product_links_insert ON chain_product_network_links;
+DROP TRIGGER chain_report_product_links_delete ON chain_product_network_links;
+DROP FUNCTION chain_report_networklink_changed();
+DROP FUNCTION chain_report_address_changed();
+DROP FUNCTION chain_report_product_links_changed();
+DROP FUNCTION chain_report_rebuild();
+DROP FUNCTION chain_report_delete_empty();
+DROP FUNCTION chain_report_add_products(varchar[], varchar[], integer[], bigint[]);
+DROP FUNCTION chain_report_add_links(
+    varchar[], varchar[], varchar[], bigint[], numeric[]
+);
+DROP TABLE chain_report_city_products;
+DROP TABLE chain_report_product_coverage_by_city;
+DROP TABLE chain_report_debt_by_network_type;
+DROP TABLE chain_report_debt_by_country;
+"""
+
+
+def create_tables(apps, schema_editor):
+    """Таблицы отчетов вместо материализованных представлений (только PostgreSQL).
+    Заполняются здесь же, дальше их поддерживают триггеры.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for view, _, _ in VIEWS:
+        schema_editor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view}")
+    schema_editor.execute(TABLES)
+    schema_editor.execute(FUNCTIONS)
+    schema_editor.execute(TRIGGERS)
+    schema_editor.execute("SELECT chain_report_rebuild()")
+
+
+def drop_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(DROP)
+    for view, keys, sql in VIEWS:
+        schema_editor.execute(f"CREATE MATERIALIZED VIEW {view} AS {sql} WITH NO DATA")
+        schema_editor.execute(f"CREATE UNIQUE INDEX {view}_key ON {view} ({keys})")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chain", "0022_report_views"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_tables, drop_tables),
+    ]
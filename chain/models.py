@@ -1,22 +1,189 @@
-from django.contrib import admin
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import (Case, Count, F, OuterRef, Q, Subquery, Sum,
+                              Value, When)
+from django.db.models.functions import Coalesce, Concat, Substr, Upper
+from django.utils import timezone
+
+from chain.cache import invalidate_links
+from chain.utils import ADDRESS_FIELDS, normalize_address
 
 NULLABLE = {"null": True, "blank": True}
 
 
+class AddressQuerySet(models.QuerySet):
+    def intern(self, **fields):
+        """Возвращает существующий адрес с такими же (нормализованными) полями
+        или создает новый. Безопасно при параллельной записи благодаря
+        уникальному ограничению: get_or_create повторяет выборку после конфликта.
+        """
+        address, _ = self.get_or_create(**normalize_address(fields))
+        return address
+
+    def intern_many(self, items):
+        """То же, что intern, для списка адресов: одна вставка с пропуском
+        конфликтов и одна выборка. Возвращает адреса в порядке `items`.
+        """
+        keys = [tuple(normalize_address(item).values()) for item in items]
+        unique_keys = set(keys)
+        self.bulk_create(
+            [self.model(**dict(zip(ADDRESS_FIELDS, key))) for key in unique_keys],
+            ignore_conflicts=True,
+        )
+        lookup = {
+            f"{field}__in": {key[index] for key in unique_keys}
+            for index, field in enumerate(ADDRESS_FIELDS)
+        }
+        addresses = {address.key: address for address in self.filter(**lookup)}
+        return [addresses[key] for key in keys]
+
+
 class Address(models.Model):
     country = models.CharField(max_length=100, verbose_name="Страна")
     city = models.CharField(max_length=100, verbose_name="Город")
     street = models.CharField(max_length=255, verbose_name="Улица")
     house_number = models.CharField(max_length=10, verbose_name="Номер дома")
 
+    objects = AddressQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.country}, {self.city}, {self.street} {self.house_number}"
 
+    @property
+    def key(self):
+        return tuple(getattr(self, field) for field in ADDRESS_FIELDS)
+
+    def save(self, *args, **kwargs):
+        for field, value in normalize_address(self.__dict__).items():
+            setattr(self, field, value)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Адрес"
         verbose_name_plural = "Адреса"
+        constraints = [
+            # Индекс ограничения также покрывает фильтрацию по (country, city)
+            models.UniqueConstraint(fields=ADDRESS_FIELDS, name="unique_address"),
+        ]
+        indexes = [
+            models.Index(fields=["city"], name="address_city_idx"),
+        ]
+
+
+class NetworkLinkQuerySet(models.QuerySet):
+    def touch(self):
+        """Обновляет updated_at у звеньев, чьи выводимые данные изменились
+        из-за связанных объектов (адреса, продуктов, уровня)."""
+        return self.update(updated_at=timezone.now())
+
+    def update_tracked(self, link_ids, **updates):
+        """UPDATE звеньев по id с отметкой изменения (updated_at) и сбросом кэша."""
+        link_ids = set(link_ids) - {None}
+        if not link_ids:
+            return 0
+        updated = self.filter(pk__in=link_ids).update(
+            updated_at=timezone.now(), **updates
+        )
+        invalidate_links(link_ids)
+        return updated
+
+    def increment(self, field, deltas):
+        """Прибавляет к полю `field` приращения из словаря {id звена: приращение}
+        одним UPDATE.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and delta}
+        if not deltas:
+            return 0
+        values = set(deltas.values())
+        if len(values) == 1:
+            delta = Value(values.pop())
+        else:
+            delta = Case(
+                *[When(pk=pk, then=Value(value)) for pk, value in deltas.items()],
+                output_field=self.model._meta.get_field(field),
+            )
+        return self.update_tracked(deltas, **{field: F(field) + delta})
+
+    def clear_debt(self):
+        """Обнуляет задолженность звеньев и вычитает ее из subtree_debt их предков.
+        Возвращает прежнюю задолженность очищенных звеньев: {id звена: сумма}.
+        """
+        with transaction.atomic():
+            rows = list(
+                self.select_for_update()
+                .filter(debt_to_supplier__gt=0)
+                .values_list("pk", "path", "level", "debt_to_supplier")
+            )
+            deltas = defaultdict(Decimal)
+            level_deltas = defaultdict(Decimal)
+            for _, path, level, debt in rows:
+                level_deltas[level] -= debt
+                for ancestor_id in self.model.parse_ancestor_ids(path):
+                    deltas[ancestor_id] -= debt
+            self.model.objects.update_tracked(
+                [pk for pk, _, _, _ in rows], debt_to_supplier=0
+            )
+            self.model.objects.increment("subtree_debt", deltas)
+            DebtLevelTotal.objects.add(level_deltas)
+            DebtTransaction.objects.bulk_create(
+                [
+                    DebtTransaction(
+                        link_id=pk,
+                        amount=-debt,
+                        balance=0,
+                        kind=DebtTransaction.CLEARANCE,
+                    )
+                    for pk, _, _, debt in rows
+                ]
+            )
+        return {pk: debt for pk, _, _, debt in rows}
+
+    def debt_by_level(self):
+        """Суммарная задолженность звеньев по уровням: {уровень: сумма}."""
+        return dict(
+            self.order_by()
+            .filter(debt_to_supplier__gt=0)
+            .values_list("level")
+            .annotate(debt=Sum("debt_to_supplier"))
+        )
+
+    def refresh_product_count(self):
+        """Пересчитывает product_count по таблице связей одним UPDATE."""
+        through = Product.network_links.through
+        count = (
+            through.objects.filter(networklink_id=OuterRef("pk"))
+            .order_by()
+            .values("networklink_id")
+            .annotate(count=Count("*"))
+            .values("count")
+        )
+        return self.update(
+            product_count=Coalesce(Subquery(count), 0), updated_at=timezone.now()
+        )
+
+    def descendants_of(self, link, depth=None):
+        """Все клиенты звена (прямые и косвенные) - один запрос по префиксу пути.
+        `depth` ограничивает глубину относительно звена.
+        """
+        queryset = self.filter(path__startswith=link.path).exclude(pk=link.pk)
+        if depth is not None:
+            queryset = queryset.filter(level__lte=link.level + depth)
+        return queryset
+
+    def ancestors_of(self, link, depth=None):
+        """Цепочка поставщиков звена - один запрос по id из пути.
+        `depth` ограничивает число ближайших поставщиков.
+        """
+        ancestor_ids = link.ancestor_ids
+        if depth is not None:
+            ancestor_ids = ancestor_ids[len(ancestor_ids) - depth :] if depth else []
+        return self.filter(pk__in=ancestor_ids)
 
 
 class NetworkLink(models.Model):
@@ -60,32 +227,270 @@ class NetworkLink(models.Model):
     # Время создания
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
 
+    # Время последнего изменения данных звена (для ETag и Last-Modified)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    # Счетчики, которые поддерживаются при изменении связей
+    product_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество продуктов"
+    )
+    client_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество клиентов"
+    )
+    # Суммарная задолженность всех клиентов звена (прямых и косвенных)
+    subtree_debt = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Задолженность клиентов",
+    )
+
+    # Материализованный путь: id всех предков и самого звена через "/", например "1/2/5/"
+    path = models.CharField(
+        max_length=1024, default="", editable=False, db_index=True, verbose_name="Путь"
+    )
+
+    # Уровень иерархии (хранится в БД и пересчитывается при смене поставщика)
+    level = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Уровень иерархии"
+    )
+
+    PATH_SEPARATOR = "/"
+
+    # Поля, которые обновляются только отдельными UPDATE и не перезаписываются
+    # при save() существующего звена значениями из памяти
+    MAINTAINED_FIELDS = (
+        "path",
+        "level",
+        "product_count",
+        "client_count",
+        "subtree_debt",
+    )
+    # Остаток по журналу задолженности: save() существующего звена меняет его
+    # только при явном update_fields=["debt_to_supplier"], проводкой журнала
+    LEDGER_FIELDS = ("debt_to_supplier",)
+
+    objects = NetworkLinkQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} (уровень - {self.level}) - создан {self.created_at}"
 
-    @property
-    @admin.display(description="Уровень иерархии")
-    def level(self):
+    def save(self, *args, **kwargs):
+        """Сохраняет звено сети и поддерживает актуальными path, level и счетчики.
+        При смене поставщика пересчитываются path и level всего поддерева,
+        client_count старого и нового поставщика и subtree_debt их предков.
+        Остаток задолженности существующего звена не перезаписывается из памяти;
+        его изменение с update_fields=["debt_to_supplier"] проводится через журнал,
+        а измененный остаток при save() без update_fields вызывает ValueError.
         """
-        Рассчитывает уровень объекта в иерархии:
-        - Завод (уровень 0) - фиксированный уровень.
-        - Розница и ИП могут иметь разные уровни
-        в зависимости от возможных взаимных поставок.
+        update_fields = kwargs.get("update_fields")
+        if update_fields:
+            # auto_now пишется только если поле есть в update_fields: без него
+            # частичное сохранение не сдвигает updated_at (ETag, Last-Modified)
+            update_fields = kwargs["update_fields"] = {*update_fields, "updated_at"}
+        if update_fields is not None and not {"supplier", "debt_to_supplier"} & set(
+            update_fields
+        ):
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic(using=kwargs.get("using")):
+            rows = self._lock_rows()
+            stored = None
+            if not self._state.adding:
+                stored = rows.get(self.pk)
+            debt = self.get_debt()
+            debt_delta = debt
+            if stored is not None:
+                # Остаток в памяти мог устареть после проводок журнала, поэтому
+                # звено сохраняется с остатком из БД, а изменение явно
+                # переданного остатка проводится через журнал ниже
+                debt_delta = 0
+                if update_fields is not None and "debt_to_supplier" in update_fields:
+                    debt_delta = debt - stored["debt_to_supplier"]
+                elif update_fields is None and debt not in (
+                    stored["debt_to_supplier"],
+                    getattr(self, "_loaded_debt", stored["debt_to_supplier"]),
+                ):
+                    # Остаток изменен в памяти: молча отбросить его нельзя
+                    raise ValueError(
+                        "Задолженность существующего звена меняется только "
+                        'с update_fields=["debt_to_supplier"].'
+                    )
+                self.debt_to_supplier = stored["debt_to_supplier"]
+                kwargs["update_fields"] = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key
+                    and field.name not in self.MAINTAINED_FIELDS
+                    and field.name not in self.LEDGER_FIELDS
+                    and (update_fields is None or field.name in update_fields)
+                ]
+
+            supplier_changed = (
+                stored is not None and stored["supplier_id"] != self.supplier_id
+            )
+            if supplier_changed and self.supplier_id in rows:
+                self.check_supplier(
+                    self.pk, self.supplier_id, rows[self.supplier_id]["path"]
+                )
+            # Флаг для обработчиков post_save: поддерево сменило уровень
+            self._subtree_moved = bool(supplier_changed and stored["path"])
+            if supplier_changed:
+                self._detach_from_supplier(stored)
+            if self._subtree_moved:
+                self._rebuild_path(stored, rows.get(self.supplier_id))
+            super().save(*args, **kwargs)
+            if stored is None or not stored["path"]:
+                self._rebuild_path(stored, rows.get(self.supplier_id))
+
+            if stored is None or supplier_changed:
+                self._attach_to_supplier(stored)
+            if stored is None and debt_delta:
+                # Начальная задолженность нового звена тоже попадает в журнал
+                DebtLevelTotal.objects.add({self.level: debt_delta})
+                DebtTransaction.objects.create(
+                    link=self,
+                    amount=debt_delta,
+                    balance=debt,
+                    kind=DebtTransaction.ADJUSTMENT,
+                )
+            elif debt_delta:
+                # Явное изменение остатка (ORM) - корректировка через журнал
+                DebtTransaction.objects.post(
+                    [
+                        DebtTransaction(
+                            link_id=self.pk,
+                            amount=debt_delta,
+                            kind=DebtTransaction.ADJUSTMENT,
+                        )
+                    ]
+                )
+                self.debt_to_supplier = debt
+            self._loaded_debt = self.get_debt()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает загруженный остаток задолженности: save() отличает
+        изменение остатка в памяти от устаревшего после проводок значения.
         """
-        current_level = 0
-        current_supplier = self.supplier
-        current_object = self  # Сохраняем ссылку на текущее звено сети
-
-        # Рекурсивно проверяем наличие поставщиков у звена
-        while current_supplier:
-            # В данной версии приложения реализован запрет на самопоставку через метод clean.
-            # Но данная проверка все равно может быть полезна в некоторых ситуациях.
-            # Например, временное изменение бизнес-логики и отмена валидации на самопоставку.
-            if current_supplier == current_object:
-                break  # Исключаем запуск бесконечного цикла при самопоставке
-            current_level += 1
-            current_supplier = current_supplier.supplier
-        return current_level
+        instance = super().from_db(db, field_names, values)
+        if "debt_to_supplier" in instance.__dict__:
+            instance._loaded_debt = instance.debt_to_supplier
+        return instance
+
+    def _lock_rows(self):
+        """Блокирует одним запросом в порядке id звено, нового поставщика и его
+        предков, а при переносе - еще прежних предков и поддерево звена.
+        Параллельные переносы на одной ветке выполняются по очереди без взаимных
+        блокировок, и проверка цикла видит актуальные пути.
+        Набор строк вычисляется по путям, прочитанным без блокировки; если под
+        блокировкой пути оказались другими, набор блокируется заново.
+        Возвращает {id: строка} для звена, поставщика и их предков.
+        """
+        fields = (
+            "pk",
+            "supplier_id",
+            "path",
+            "level",
+            "debt_to_supplier",
+            "subtree_debt",
+        )
+        locked, subtree_path = None, None
+        rows = NetworkLink.objects.filter(
+            pk__in={self.pk, self.supplier_id} - {None}
+        ).values(*fields)
+        while True:
+            rows = {row["pk"]: row for row in rows}
+            ids = {self.pk, self.supplier_id} - {None}
+            if self.supplier_id in rows:
+                ids.update(self.parse_ancestor_ids(rows[self.supplier_id]["path"]))
+            stored = None if self._state.adding else rows.get(self.pk)
+            moved_path = None
+            if stored is not None and stored["supplier_id"] != self.supplier_id:
+                ids.update(self.parse_ancestor_ids(stored["path"]))
+                moved_path = stored["path"] or None
+            if locked is not None and ids <= locked and moved_path == subtree_path:
+                return {pk: rows[pk] for pk in ids if pk in rows}
+            locked = ids | (locked or set())
+            subtree_path = moved_path
+            query = Q(pk__in=locked)
+            if subtree_path:
+                query |= Q(path__startswith=subtree_path)
+            rows = (
+                NetworkLink.objects.select_for_update()
+                .filter(query)
+                .order_by("pk")
+                .values(*fields)
+            )
+
+    def get_debt(self):
+        """Задолженность перед поставщиком в виде Decimal (поле может хранить float)."""
+        return self._meta.get_field("debt_to_supplier").to_python(self.debt_to_supplier)
+
+    def _detach_from_supplier(self, stored):
+        """Убирает звено (с поддеревом) из счетчиков старого поставщика и его предков."""
+        NetworkLink.objects.increment("client_count", {stored["supplier_id"]: -1})
+        debt = stored["debt_to_supplier"] + stored["subtree_debt"]
+        NetworkLink.objects.increment(
+            "subtree_debt",
+            dict.fromkeys(self.parse_ancestor_ids(stored["path"]), -debt),
+        )
+
+    def _attach_to_supplier(self, stored):
+        """Добавляет звено (с поддеревом) в счетчики нового поставщика и его предков."""
+        NetworkLink.objects.increment("client_count", {self.supplier_id: 1})
+        debt = self.get_debt() + (stored["subtree_debt"] if stored else 0)
+        NetworkLink.objects.increment(
+            "subtree_debt", dict.fromkeys(self.ancestor_ids, debt)
+        )
+
+    def _rebuild_path(self, stored=None, supplier=None):
+        """Пересчитывает path и level звена и всех его потомков одним UPDATE.
+        `supplier` - уже прочитанные path и level поставщика.
+        """
+        if self.supplier_id is None:
+            parent_path, parent_level = "", -1
+        elif supplier is not None:
+            parent_path, parent_level = supplier["path"], supplier["level"]
+        else:
+            parent_path, parent_level = NetworkLink.objects.values_list(
+                "path", "level"
+            ).get(pk=self.supplier_id)
+        new_path = f"{parent_path}{self.pk}{self.PATH_SEPARATOR}"
+        new_level = parent_level + 1
+
+        old_path = stored["path"] if stored else ""
+        if old_path:
+            # Переносим всё поддерево: заменяем префикс пути и сдвигаем уровень
+            subtree = NetworkLink.objects.filter(path__startswith=old_path)
+            shift = new_level - stored["level"]
+            DebtLevelTotal.objects.shift(subtree.debt_by_level(), shift)
+            subtree.update(
+                path=Concat(Value(new_path), Substr("path", len(old_path) + 1)),
+                level=F("level") + shift,
+                updated_at=timezone.now(),
+            )
+        else:
+            NetworkLink.objects.filter(pk=self.pk).update(
+                path=new_path, level=new_level
+            )
+        self.path, self.level = new_path, new_level
+
+    @property
+    def ancestor_ids(self):
+        """Возвращает id предков звена (от завода к ближайшему поставщику) без запросов к БД."""
+        return self.parse_ancestor_ids(self.path)
+
+    @classmethod
+    def parse_ancestor_ids(cls, path):
+        return [int(pk) for pk in path.split(cls.PATH_SEPARATOR)[:-2]]
+
+    def get_descendants(self, depth=None):
+        return NetworkLink.objects.descendants_of(self, depth=depth)
+
+    def get_ancestors(self, depth=None):
+        return NetworkLink.objects.ancestors_of(self, depth=depth)
 
     def clean(self):
         super().clean()
@@ -94,13 +499,223 @@ class NetworkLink(models.Model):
             raise ValidationError(
                 {"debt_to_supplier": "Задолженность не может быть отрицательной."}
             )
-        # Проверка на самопоставку
-        if self.supplier == self:
-            raise ValidationError("Нельзя выбрать себя в качестве поставщика.")
+        # Проверка на самопоставку и циклы в цепочке поставок
+        if self.supplier is not None:
+            self.check_supplier(self.pk, self.supplier.pk, self.supplier.path)
+
+    @classmethod
+    def check_supplier(cls, link_id, supplier_id, supplier_path):
+        """Запрещает поставщика, который является самим звеном или его клиентом
+        (прямым или косвенным). Проверка по пути поставщика - без запросов к БД.
+        """
+        if link_id is None:
+            return
+        if supplier_id == link_id:
+            raise ValidationError(
+                {"supplier": "Нельзя выбрать себя в качестве поставщика."}
+            )
+        if link_id in cls.parse_ancestor_ids(supplier_path):
+            raise ValidationError(
+                {"supplier": "Нельзя выбрать своего клиента в качестве поставщика."}
+            )
 
     class Meta:
         verbose_name = "Звено сети"
         verbose_name_plural = "Звенья сети"
+        indexes = [
+            # Индекс для курсорной пагинации по (created_at, id)
+            models.Index(
+                fields=["created_at", "id"], name="networklink_created_id_idx"
+            ),
+            # Индексы для фильтрации списка звеньев
+            models.Index(
+                fields=["network_type", "level"], name="networklink_type_level_idx"
+            ),
+            models.Index(fields=["level"], name="networklink_level_idx"),
+            models.Index(fields=["debt_to_supplier"], name="networklink_debt_idx"),
+            # Индексы для сортировки по счетчикам с курсорной пагинацией
+            models.Index(
+                fields=["product_count", "id"], name="networklink_products_idx"
+            ),
+            models.Index(fields=["client_count", "id"], name="networklink_clients_idx"),
+            models.Index(
+                fields=["subtree_debt", "id"], name="networklink_subtree_debt_idx"
+            ),
+            # Триграммные индексы для поиска по подстроке в админке (icontains
+            # строит UPPER(...) LIKE, поэтому индексируется выражение UPPER)
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="networklink_name_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("email"), name="gin_trgm_ops"),
+                name="networklink_email_trgm_idx",
+            ),
+        ]
+
+
+class DebtTransactionQuerySet(models.QuerySet):
+    def post(self, entries, batch_size=1000):
+        """Проводит пачку проводок одной транзакцией фиксированным числом запросов:
+        блокирует звенья, считает остаток после каждой проводки и переносит
+        изменения в задолженность звеньев, subtree_debt предков и итоги по уровням.
+        Если остаток какого-либо звена становится отрицательным, не проводится ничего.
+        """
+        with transaction.atomic():
+            link_ids = {entry.link_id for entry in entries}
+            # Блокировка в порядке id исключает взаимоблокировки параллельных пачек
+            links = {
+                pk: (path, level, debt)
+                for pk, path, level, debt in NetworkLink.objects.select_for_update()
+                .filter(pk__in=link_ids)
+                .order_by("pk")
+                .values_list("pk", "path", "level", "debt_to_supplier")
+            }
+            balances = {pk: debt for pk, (_, _, debt) in links.items()}
+            for entry in entries:
+                if entry.link_id not in links:
+                    raise ValidationError(f"Звено сети {entry.link_id} не существует.")
+                entry.balance = balances[entry.link_id] + entry.amount
+                if entry.balance < 0:
+                    raise ValidationError(
+                        f"Задолженность звена {entry.link_id} не может стать "
+                        f"отрицательной ({entry.balance})."
+                    )
+                balances[entry.link_id] = entry.balance
+
+            link_deltas = {}
+            subtree_deltas = defaultdict(Decimal)
+            level_deltas = defaultdict(Decimal)
+            for pk, (path, level, debt) in links.items():
+                delta = balances[pk] - debt
+                link_deltas[pk] = delta
+                level_deltas[level] += delta
+                for ancestor_id in NetworkLink.parse_ancestor_ids(path):
+                    subtree_deltas[ancestor_id] += delta
+
+            created = self.bulk_create(entries, batch_size=batch_size)
+            NetworkLink.objects.increment("debt_to_supplier", link_deltas)
+            NetworkLink.objects.increment("subtree_debt", subtree_deltas)
+            DebtLevelTotal.objects.add(level_deltas)
+        return created
+
+
+class DebtTransaction(models.Model):
+    """Проводка журнала задолженности звена перед поставщиком.
+    Журнал только дополняется; debt_to_supplier звена - остаток по журналу.
+    """
+
+    INGEST = "ingest"
+    ADJUSTMENT = "adjustment"
+    CLEARANCE = "clearance"
+    CLOSING = "closing"
+    KIND_CHOICES = (
+        (INGEST, "Проводка"),
+        (ADJUSTMENT, "Корректировка"),
+        (CLEARANCE, "Очистка задолженности"),
+        (CLOSING, "Удаление звена"),
+    )
+
+    # Без ограничения внешнего ключа: история сохраняется и после удаления звена
+    link = models.ForeignKey(
+        NetworkLink,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="debt_transactions",
+        verbose_name="Звено сети",
+    )
+    amount = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Сумма изменения"
+    )
+    balance = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Остаток после проводки"
+    )
+    kind = models.CharField(
+        max_length=10, choices=KIND_CHOICES, default=INGEST, verbose_name="Тип"
+    )
+    # Идентификатор во внешней системе (ERP) для защиты от повторной загрузки
+    external_id = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="Внешний идентификатор",
+    )
+    comment = models.CharField(max_length=255, blank=True, verbose_name="Комментарий")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата проводки")
+
+    objects = DebtTransactionQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.amount:+} (остаток {self.balance}) - звено {self.link_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Проводки журнала задолженности не изменяются.")
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Проводка задолженности"
+        verbose_name_plural = "Журнал задолженности"
+        indexes = [
+            # История проводок звена и курсорная пагинация по (created_at, id)
+            models.Index(fields=["link", "id"], name="debttransaction_link_idx"),
+            models.Index(
+                fields=["created_at", "id"], name="debttransaction_created_idx"
+            ),
+        ]
+
+
+class DebtLevelTotalQuerySet(models.QuerySet):
+    def add(self, deltas):
+        """Прибавляет к итогам приращения {уровень: сумма}, создавая нужные строки."""
+        deltas = {level: delta for level, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+        self.bulk_create(
+            [self.model(level=level) for level in deltas], ignore_conflicts=True
+        )
+        return self.filter(level__in=deltas).update(
+            debt=F("debt")
+            + Case(
+                *[
+                    When(level=level, then=Value(delta))
+                    for level, delta in deltas.items()
+                ],
+                output_field=self.model._meta.get_field("debt"),
+            )
+        )
+
+    def shift(self, debts, shift):
+        """Переносит задолженность {уровень: сумма} на `shift` уровней."""
+        if not shift:
+            return 0
+        deltas = defaultdict(Decimal)
+        for level, debt in debts.items():
+            deltas[level] -= debt
+            deltas[level + shift] += debt
+        return self.add(deltas)
+
+
+class DebtLevelTotal(models.Model):
+    """Суммарная задолженность звеньев одного уровня иерархии.
+    Поддерживается инкрементально, поэтому чтение итогов не сканирует звенья.
+    """
+
+    level = models.PositiveIntegerField(primary_key=True, verbose_name="Уровень")
+    debt = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0, verbose_name="Задолженность"
+    )
+
+    objects = DebtLevelTotalQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Уровень {self.level}: {self.debt}"
+
+    class Meta:
+        verbose_name = "Задолженность уровня"
+        verbose_name_plural = "Задолженность по уровням"
+        ordering = ("level",)
 
 
 class Product(models.Model):
@@ -119,3 +734,151 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Продукт"
         verbose_name_plural = "Продукты"
+        indexes = [
+            # Фильтр по дате выхода и курсорная пагинация по (release_date, id)
+            models.Index(fields=["release_date", "id"], name="product_release_idx"),
+            # Триграммные индексы для поиска по подстроке в API и админке
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="product_name_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("model"), name="gin_trgm_ops"),
+                name="product_model_trgm_idx",
+            ),
+        ]
+
+
+class DebtClearance(models.Model):
+    """Очистка задолженности перед поставщиком, запущенная из админки.
+    Выполняется пакетами по CHAIN_CLEAR_DEBT_BATCH_SIZE звеньев, каждый пакет -
+    в отдельной транзакции, поэтому блокировки строк держатся недолго.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Завершена"),
+        (FAILED, "Ошибка"),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Пользователь",
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Статус"
+    )
+    total = models.PositiveIntegerField(default=0, verbose_name="Звеньев с долгом")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Обработано")
+    cleared_debt = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0, verbose_name="Списано"
+    )
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата запуска")
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Дата завершения"
+    )
+
+    def __str__(self):
+        return f"Очистка задолженности №{self.pk} ({self.get_status_display()})"
+
+    def run(self, queryset, batch_size=None):
+        """Очищает задолженность звеньев из queryset пакетами по возрастанию id.
+        Каждый пакет записывает одну строку аудита с прежними суммами долга.
+        """
+        batch_size = batch_size or settings.CHAIN_CLEAR_DEBT_BATCH_SIZE
+        queryset = queryset.filter(debt_to_supplier__gt=0).order_by("pk")
+        self.set_status(self.RUNNING)
+        last_pk = 0
+        try:
+            while True:
+                pks = list(
+                    queryset.filter(pk__gt=last_pk).values_list("pk", flat=True)[
+                        :batch_size
+                    ]
+                )
+                if not pks:
+                    break
+                with transaction.atomic():
+                    previous = NetworkLink.objects.filter(pk__in=pks).clear_debt()
+                    self.add_batch(previous)
+                last_pk = pks[-1]
+        except Exception as error:
+            self.set_status(self.FAILED, error=str(error))
+            raise
+        self.set_status(self.DONE)
+
+    def run_in_background(self, queryset, batch_size=None):
+        """Запускает run() в отдельном потоке после фиксации текущей транзакции."""
+
+        def target():
+            try:
+                self.run(queryset, batch_size)
+            finally:
+                connection.close()
+
+        transaction.on_commit(
+            lambda: threading.Thread(target=target, daemon=True).start()
+        )
+
+    def add_batch(self, previous):
+        """Сохраняет аудит пакета и продвигает счетчики прогресса."""
+        total_debt = sum(previous.values(), Decimal(0))
+        DebtClearanceBatch.objects.create(
+            clearance=self,
+            link_count=len(previous),
+            total_debt=total_debt,
+            previous_debts={str(pk): str(debt) for pk, debt in previous.items()},
+        )
+        DebtClearance.objects.filter(pk=self.pk).update(
+            processed=F("processed") + len(previous),
+            cleared_debt=F("cleared_debt") + total_debt,
+        )
+        self.processed += len(previous)
+        self.cleared_debt += total_debt
+
+    def set_status(self, status, error=""):
+        self.status, self.error = status, error
+        if status in (self.DONE, self.FAILED):
+            self.finished_at = timezone.now()
+        DebtClearance.objects.filter(pk=self.pk).update(
+            status=self.status, error=self.error, finished_at=self.finished_at
+        )
+
+    class Meta:
+        verbose_name = "Очистка задолженности"
+        verbose_name_plural = "Очистки задолженности"
+        ordering = ("-created_at",)
+
+
+class DebtClearanceBatch(models.Model):
+    """Аудит одного пакета очистки: прежний долг всех звеньев пакета
+    одной записью в формате {id звена: сумма}."""
+
+    clearance = models.ForeignKey(
+        DebtClearance,
+        on_delete=models.CASCADE,
+        related_name="batches",
+        verbose_name="Очистка задолженности",
+    )
+    link_count = models.PositiveIntegerField(verbose_name="Количество звеньев")
+    total_debt = models.DecimalField(
+        max_digits=16, decimal_places=2, verbose_name="Сумма задолженности"
+    )
+    previous_debts = models.JSONField(verbose_name="Прежняя задолженность")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+
+    def __str__(self):
+        return f"{self.link_count} звеньев на сумму {self.total_debt}"
+
+    class Meta:
+        verbose_name = "Пакет очистки задолженности"
+        verbose_name_plural = "Пакеты очистки задолженности"
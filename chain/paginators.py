@@ -0,0 +1,175 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная (keyset) пагинация по уникальной паре полей (created_at, id).
+    Следующая страница выбирается условием `(created_at, id) > курсор`,
+    поэтому скорость не зависит от глубины листания (нет OFFSET и COUNT).
+    Параметр `?ordering=` позволяет сортировать по полям из `ordering_fields`
+    представления (с `-` - по убыванию), тогда ключом служит пара (поле, id).
+    Сортировку по умолчанию представление может задать в `pagination_ordering`.
+    """
+
+    ordering = ("created_at", "id")
+    ordering_query_param = "ordering"
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Некорректный курсор."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """То же, что paginate_queryset, но страница читается асинхронным ORM."""
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page([instance async for instance in page_queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, view)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, request, view):
+        ordering = request.query_params.get(self.ordering_query_param, "")
+        if ordering.lstrip("-") in getattr(view, "ordering_fields", ()):
+            direction = "-" if ordering.startswith("-") else ""
+            return (ordering, f"{direction}id")
+        return getattr(view, "pagination_ordering", type(self).ordering)
+
+    def get_keyset_filter(self, position):
+        """Строит условие `(a, b) > (x, y)` в виде `a > x OR (a = x AND b > y)`
+        (для сортировки по убыванию - с `<`).
+        """
+        condition = Q()
+        fields = [field.lstrip("-") for field in self.ordering]
+        for index, field in enumerate(self.ordering):
+            lookup = "lt" if field.startswith("-") else "gt"
+            step = Q(**{f"{fields[index]}__{lookup}": position[index]})
+            for prev_field, prev_value in zip(fields[:index], position[:index]):
+                step &= Q(**{prev_field: prev_value})
+            condition |= step
+        return condition
+
+    def encode_cursor(self, instance):
+        """Курсор хранит сортировку и значения ее полей у последней записи."""
+        position = [getattr(instance, field.lstrip("-")) for field in self.ordering]
+        # str() сохраняет микросекунды created_at, иначе курсор будет неточным
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(
+                {"ordering": list(self.ordering), "position": position}, default=str
+            ).encode()
+        ).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        """Проверяет курсор: он построен для той же сортировки, а значения
+        приводятся к типам полей модели. Некорректный курсор - ответ 404.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if (
+                not isinstance(cursor, dict)
+                or cursor.get("ordering") != list(self.ordering)
+                or not isinstance(cursor.get("position"), list)
+                or len(cursor["position"]) != len(self.ordering)
+                or None in cursor["position"]
+            ):
+                raise ValueError(self.invalid_cursor_message)
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, cursor["position"])
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки: для таблицы без фильтров берет оценку числа строк
+    из статистики PostgreSQL (pg_class.reltuples) вместо полного COUNT(*).
+    Для небольших таблиц, отфильтрованных списков и других СУБД - точный COUNT.
+    """
+
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        estimate = self.get_estimated_count()
+        if estimate is not None and estimate > self.estimate_threshold:
+            return estimate
+        return super().count
+
+    def get_estimated_count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is None or query.where:
+            return None
+        connection = connections[self.object_list.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE relname = %s",
+                [self.object_list.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
@@ -0,0 +1,40 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson (если он установлен) с тем же выводом байт в байт.
+
+    Типы, которых нет в JSON (Decimal, даты, ленивые строки), преобразуются
+    кодировщиком DRF. Ответы с отступами или ASCII-экранированием и данные,
+    которые orjson вывести не может, рендерятся стандартным JSONRenderer.
+    Числа с плавающей точкой orjson записывает иначе, чем json (1e16 вместо
+    1e+16), поэтому рендерер подходит для ответов без float.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME if orjson else None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (
+            orjson is None
+            or data is None
+            or indent is not None
+            or self.ensure_ascii
+            or not self.compact
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=self.options
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем разделители строк для JavaScript
+        return ret.replace("\u2028".encode(), b"\\u2028").replace(
+            "\u2029".encode(), b"\\u2029"
+        )
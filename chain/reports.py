@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+
+from chain import cache
+from chain.models import DebtLevelTotal, NetworkLink
+
+DEBT_FIELD = serializers.DecimalField(max_digits=20, decimal_places=2)
+
+
+def debt_by(*fields, **expressions):
+    """Число звеньев и их задолженность по группам (GROUP BY в БД)."""
+    return (
+        NetworkLink.objects.values(*fields, **expressions)
+        .annotate(
+            links=Count("id"),
+            debt=Coalesce(
+                Sum("debt_to_supplier"), Value(Decimal(0)), output_field=DecimalField()
+            ),
+        )
+        .order_by(*fields, *expressions)
+    )
+
+
+def product_coverage_by_city():
+    """Число звеньев и разных продуктов, которые они продают, по городам."""
+    return (
+        NetworkLink.objects.values(
+            country=Coalesce("address__country", Value("")),
+            city=Coalesce("address__city", Value("")),
+        )
+        .annotate(
+            links=Count("id", distinct=True),
+            products=Count("products", distinct=True),
+        )
+        .order_by("country", "city")
+    )
+
+
+def debt_by_level():
+    """Задолженность по уровням иерархии из итогов журнала (DebtLevelTotal)."""
+    return DebtLevelTotal.objects.order_by("level").values("level", "debt")
+
+
+# Отчеты: запрос к таблицам и таблица PostgreSQL с тем же отчетом, которую
+# триггеры поддерживают инкрементально (миграция 0023_report_tables), с ее ключами.
+# Отчет по уровням всегда читается из итогов DebtLevelTotal
+REPORTS = {
+    "debt_by_country": {
+        "query": lambda: debt_by(country=Coalesce("address__country", Value(""))),
+        "table": "chain_report_debt_by_country",
+        "keys": ("country",),
+    },
+    "debt_by_network_type": {
+        "query": lambda: debt_by("network_type"),
+        "table": "chain_report_debt_by_network_type",
+        "keys": ("network_type",),
+    },
+    "debt_by_level": {"query": debt_by_level, "table": None},
+    "product_coverage_by_city": {
+        "query": product_coverage_by_city,
+        "table": "chain_report_product_coverage_by_city",
+        "keys": ("country", "city"),
+    },
+}
+
+
+def use_materialized():
+    """Отчеты читаются из таблиц, поддерживаемых триггерами (только PostgreSQL)."""
+    return settings.CHAIN_REPORTS_MATERIALIZED and connection.vendor == "postgresql"
+
+
+def get_report(name):
+    """Отчет `name`. Без таблиц отчетов он считается запросом к таблицам звеньев
+    и кэшируется до следующего изменения звеньев.
+    """
+    if use_materialized() and REPORTS[name]["table"]:
+        return build_report(name, "materialized", read_table(name))
+    key = cache.get_list_key(f"reports/{name}")
+    entry = cache.get_list(key)
+    if entry is None:
+        entry = build_report(name, "live", REPORTS[name]["query"]())
+        cache.set_list(key, entry)
+    return entry
+
+
+def build_report(name, source, rows):
+    results = []
+    for row in rows:
+        row = dict(row)
+        if "debt" in row:
+            row["debt"] = DEBT_FIELD.to_representation(row["debt"])
+        results.append(row)
+    return {"report": name, "source": source, "results": results}
+
+
+def read_table(name):
+    report = REPORTS[name]
+    quote = connection.ops.quote_name
+    keys = ", ".join(quote(key) for key in report["keys"])
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM {quote(report['table'])} ORDER BY {keys}")
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def rebuild_reports():
+    """Пересчитывает таблицы отчетов целиком (после загрузки в обход триггеров,
+    например TRUNCATE, или для сверки). Запись в звенья на это время блокируется.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT chain_report_rebuild()")
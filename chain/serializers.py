@@ -1,7 +1,19 @@
+from collections import Counter
+from functools import lru_cache
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework.exceptions import ValidationError
-from rest_framework.serializers import ModelSerializer
+from rest_framework.relations import ManyRelatedField, PKOnlyObject
+from rest_framework.serializers import (CharField, IntegerField, ListField,
+                                        ListSerializer, ModelSerializer,
+                                        PrimaryKeyRelatedField, Serializer)
 
-from chain.models import Address, NetworkLink, Product
+from chain.cache import invalidate_links
+from chain.models import (Address, DebtLevelTotal, DebtTransaction,
+                          NetworkLink, Product)
+from chain.utils import ADDRESS_FIELDS
 from chain.validators import validate_debt_update
 
 
@@ -9,6 +21,8 @@ class AddressSerializer(ModelSerializer):
     class Meta:
         model = Address
         fields = ["country", "city", "street", "house_number"]
+        # Одинаковые адреса не ошибка: звено получает уже существующий адрес
+        validators = []
 
 
 class ProductSerializer(ModelSerializer):
@@ -17,10 +31,163 @@ class ProductSerializer(ModelSerializer):
         fields = ["id", "name", "model", "release_date", "network_links"]
 
 
+class ProductAssignSerializer(Serializer):
+    """Связывает каждый продукт из `products` с каждым звеном из `network_links`.
+    Существование объектов проверяется двумя запросами, новые связи пишутся
+    одним пакетным INSERT (уже существующие пропускаются).
+    """
+
+    max_items = 1000
+    # Связи создаются для всех пар продукт-звено: ограничено и их число,
+    # иначе два списка по max_items дали бы миллион строк
+    max_pairs = max_items
+
+    products = ListField(
+        child=IntegerField(min_value=1), allow_empty=False, max_length=max_items
+    )
+    network_links = ListField(
+        child=IntegerField(min_value=1), allow_empty=False, max_length=max_items
+    )
+
+    def validate(self, attrs):
+        pairs = len(set(attrs["products"])) * len(set(attrs["network_links"]))
+        if pairs > self.max_pairs:
+            raise ValidationError(
+                f"Слишком много пар продукт-звено: {pairs}, допустимо "
+                f"не более {self.max_pairs}."
+            )
+        errors = {}
+        for field, model in (("products", Product), ("network_links", NetworkLink)):
+            ids = set(attrs[field])
+            missing = ids - set(
+                model.objects.filter(pk__in=ids).values_list("pk", flat=True)
+            )
+            if missing:
+                errors[field] = [f"Объекты не существуют: {sorted(missing)}."]
+        if errors:
+            raise ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        """Возвращает число созданных связей."""
+        product_ids = set(validated_data["products"])
+        link_ids = set(validated_data["network_links"])
+        through = Product.network_links.through
+        with transaction.atomic():
+            existing = set(
+                through.objects.filter(
+                    product_id__in=product_ids, networklink_id__in=link_ids
+                ).values_list("product_id", "networklink_id")
+            )
+            pairs = [
+                (product_id, link_id)
+                for product_id in product_ids
+                for link_id in link_ids
+                if (product_id, link_id) not in existing
+            ]
+            if not pairs:
+                return 0
+            # Конфликты возможны только с параллельной записью тех же связей
+            through.objects.bulk_create(
+                [
+                    through(product_id=product_id, networklink_id=link_id)
+                    for product_id, link_id in pairs
+                ],
+                batch_size=self.max_items,
+                ignore_conflicts=True,
+            )
+            # bulk_create не отправляет m2m_changed: пересчитываем product_count
+            # и сбрасываем кэш звеньев, в чьих данных выводятся эти продукты
+            NetworkLink.objects.filter(
+                pk__in={link_id for _, link_id in pairs}
+            ).refresh_product_count()
+            product_links_changed(product_ids)
+        return len(pairs)
+
+
+def product_links_changed(product_ids, link_ids=()):
+    """Отмечает изменение и сбрасывает кэш звеньев `link_ids` и всех звеньев,
+    в чьих данных выводятся продукты `product_ids` (со списком их звеньев)."""
+    affected = set(link_ids) | set(
+        NetworkLink.objects.filter(products__in=product_ids).values_list(
+            "id", flat=True
+        )
+    )
+    NetworkLink.objects.filter(pk__in=affected).touch()
+    invalidate_links(affected)
+
+
+def set_link_products(link, product_ids):
+    """Приводит набор продуктов звена к `product_ids` по разнице множеств:
+    удаляются и добавляются только изменившиеся связи, одним запросом каждое.
+    Число запросов не зависит от числа продуктов; m2m_changed не отправляется,
+    product_count и кэш обновляются здесь же.
+    """
+    through = Product.network_links.through
+    product_ids = set(product_ids)
+    with transaction.atomic():
+        # Параллельные изменения продуктов одного звена выполняются по очереди
+        links = NetworkLink.objects.filter(pk=link.pk)
+        links.select_for_update().values_list("pk").get()
+        current = set(
+            through.objects.filter(networklink_id=link.pk).values_list(
+                "product_id", flat=True
+            )
+        )
+        removed = current - product_ids
+        added = product_ids - current
+        if not removed and not added:
+            return
+        if removed:
+            through.objects.filter(
+                networklink_id=link.pk, product_id__in=removed
+            ).delete()
+        if added:
+            through.objects.bulk_create(
+                [through(networklink_id=link.pk, product_id=pk) for pk in added],
+                ignore_conflicts=True,
+            )
+        links.refresh_product_count()
+        link.product_count = links.values_list("product_count", flat=True).get()
+        # Звенья удаленных продуктов находятся и после удаления связей:
+        # у этих продуктов из списка звеньев пропало только само звено
+        product_links_changed(removed | added, [link.pk])
+
+
+class ProductIdListField(ListField):
+    """Продукты звена: на запись - список id, на чтение - вложенные продукты."""
+
+    child = IntegerField(min_value=1)
+
+    def to_representation(self, data):
+        return ProductSerializer(many=True).to_representation(data)
+
+
 class NetworkLinkSerializer(ModelSerializer):
-    products = ProductSerializer(many=True, read_only=True)
+    """Звено сети. `fields` - выводимые поля (None - все), `expand` - вложенные
+    объекты: при выборе полей адрес и продукты, которых нет в `expand`,
+    выводятся своими id.
+    """
+
+    products = ProductIdListField(required=False)
     address = AddressSerializer()
 
+    # Поля вложенных объектов и их вид без раскрытия
+    expandable_fields = {
+        "address": lambda: PrimaryKeyRelatedField(read_only=True),
+        "products": lambda: PrimaryKeyRelatedField(many=True, read_only=True),
+    }
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            return
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+        for name, flat_field in self.expandable_fields.items():
+            if name in self.fields and name not in expand:
+                self.fields[name] = flat_field()
+
     class Meta:
         model = NetworkLink
         fields = [
@@ -33,34 +200,49 @@ class NetworkLinkSerializer(ModelSerializer):
             "supplier",
             "debt_to_supplier",
             "created_at",
+            "product_count",
+            "client_count",
+            "subtree_debt",
             "products",
         ]
-        read_only_fields = ["products"]
+
+    def validate_products(self, value):
+        # Существование всех продуктов проверяется одним запросом
+        missing = set(value) - set(
+            Product.objects.filter(pk__in=value).values_list("pk", flat=True)
+        )
+        if missing:
+            raise ValidationError(f"Продукты не существуют: {sorted(missing)}.")
+        return value
 
     def create(self, validated_data):
         address_data = validated_data.pop("address")
-        address = Address.objects.create(**address_data)
+        address = Address.objects.intern(**address_data)
         products_data = validated_data.pop("products", [])
 
         instance = NetworkLink.objects.create(address=address, **validated_data)
-        instance.products.set(products_data)
+        if products_data:
+            set_link_products(instance, products_data)
         return instance
 
     def update(self, instance, validated_data):
-        address_data = validated_data.pop("address")
-        address = instance.address
-        address.country = address_data.get("country", address.country)
-        address.city = address_data.get("city", address.city)
-        address.street = address_data.get("street", address.street)
-        address.house_number = address_data.get("house_number", address.house_number)
-        address.save()
+        address_data = validated_data.pop("address", None)
+        if address_data is not None:
+            # Адрес может быть общим для нескольких звеньев, поэтому не изменяем
+            # его, а переключаем звено на адрес с новыми данными
+            address = instance.address
+            instance.address = Address.objects.intern(
+                **{
+                    field: address_data.get(field, getattr(address, field, None))
+                    for field in ADDRESS_FIELDS
+                }
+            )
 
         products_data = validated_data.pop("products", None)
         if products_data is not None:
             if not products_data:
                 raise ValidationError({"products": "This field cannot be empty"})
-            instance.products.clear()
-            instance.products.add(*products_data)
+            set_link_products(instance, products_data)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -71,4 +253,349 @@ class NetworkLinkSerializer(ModelSerializer):
     def validate(self, attrs):
         # Проверяем обновление поля задолженности
         validate_debt_update(attrs)
+        # Частичный адрес дополняется текущим, поэтому у звена без адреса
+        # нужны все поля адреса
+        address = attrs.get("address")
+        if (
+            address is not None
+            and self.instance is not None
+            and self.instance.address is None
+        ):
+            missing = [field for field in ADDRESS_FIELDS if field not in address]
+            if missing:
+                raise ValidationError(
+                    {"address": {field: ["Обязательное поле."] for field in missing}}
+                )
+        # Проверяем самопоставку и циклы по пути уже загруженного поставщика
+        supplier = attrs.get("supplier")
+        if self.instance is not None and supplier is not None:
+            try:
+                NetworkLink.check_supplier(self.instance.pk, supplier.pk, supplier.path)
+            except DjangoValidationError as exc:
+                raise ValidationError(exc.message_dict)
         return attrs
+
+    def save(self, **kwargs):
+        # Повторная проверка цикла идет в NetworkLink.save() под блокировкой строк
+        # и ловит параллельные переносы, прошедшие validate()
+        try:
+            return super().save(**kwargs)
+        except DjangoValidationError as exc:
+            raise ValidationError(exc.message_dict)
+
+
+class CompiledSerializer:
+    """Сериализатор только для чтения, собранный из полей DRF-сериализатора.
+
+    Для каждого поля один раз выбирается, как прочитать значение и как его
+    преобразовать, поэтому на строку не тратятся get_attribute, проверки полей
+    DRF и создание вложенных сериализаторов. Вывод совпадает с `.data`
+    исходного сериализатора; поля других типов выводятся методами самого поля.
+    """
+
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        self.fields = [
+            (name, self.compile_field(model, field))
+            for name, field in serializer.fields.items()
+            if not field.write_only
+        ]
+
+    def __call__(self, instance):
+        return {name: represent(instance) for name, represent in self.fields}
+
+    def many(self, instances):
+        return [self(instance) for instance in instances]
+
+    @classmethod
+    def compile_field(cls, model, field):
+        concrete = {f.name: f.attname for f in model._meta.concrete_fields}
+        if isinstance(field, ProductIdListField):
+            child = cls(ProductSerializer())
+            return lambda instance: [
+                child(item) for item in related_items(instance, field.source)
+            ]
+        if isinstance(field, ModelSerializer):
+            child = cls(field)
+            getter = attrgetter(field.source)
+            return lambda instance: nullable(getter(instance), child)
+        if (
+            isinstance(field, ManyRelatedField)
+            and type(field.child_relation) is PrimaryKeyRelatedField
+            and field.child_relation.pk_field is None
+        ):
+            return lambda instance: [
+                item.pk for item in related_items(instance, field.source)
+            ]
+        if field.source in concrete:
+            # У внешнего ключа выводится id без загрузки связанного объекта
+            getter = attrgetter(concrete[field.source])
+            if isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+                return getter
+            convert = field.to_representation
+            if type(field).to_representation is CharField.to_representation:
+                convert = str
+            elif type(field).to_representation is IntegerField.to_representation:
+                convert = int
+            return lambda instance: nullable(getter(instance), convert)
+
+        def represent(instance):
+            value = field.get_attribute(instance)
+            check = value.pk if isinstance(value, PKOnlyObject) else value
+            return None if check is None else field.to_representation(value)
+
+        return represent
+
+
+def nullable(value, convert):
+    return None if value is None else convert(value)
+
+
+def related_items(instance, name):
+    """Связанные объекты M2M: из кэша предвыборки без создания менеджера."""
+    try:
+        return instance._prefetched_objects_cache[name]
+    except (AttributeError, KeyError):
+        return getattr(instance, name).all()
+
+
+@lru_cache(maxsize=128)
+def get_compiled_network_link_serializer(fields=None, expand=frozenset()):
+    """Скомпилированный NetworkLinkSerializer для набора полей (см. ?fields=)."""
+    return CompiledSerializer(NetworkLinkSerializer(fields=fields, expand=expand))
+
+
+class NetworkLinkBulkListSerializer(ListSerializer):
+    """Массовое создание звеньев сети.
+    Уникальность почты, поставщики и продукты проверяются для всего списка
+    несколькими запросами, а запись идет через bulk_create в одной транзакции.
+    """
+
+    batch_size = 1000
+
+    def to_internal_value(self, data):
+        # Ошибки возвращаются списком по позициям, как и ошибки самих элементов
+        attrs = super().to_internal_value(data)
+        errors = [{} for _ in attrs]
+
+        emails = [item["email"] for item in attrs]
+        existing_emails = set(
+            NetworkLink.objects.filter(email__in=emails).values_list("email", flat=True)
+        )
+        seen_emails = set()
+        for index, email in enumerate(emails):
+            if email in existing_emails or email in seen_emails:
+                errors[index]["email"] = [
+                    "Звено сети с таким значением поля Почта уже существует."
+                ]
+            seen_emails.add(email)
+
+        # Поставщиками могут быть только уже существующие звенья
+        supplier_ids = {item["supplier"] for item in attrs if item.get("supplier")}
+        self.suppliers = {
+            pk: (path, level)
+            for pk, path, level in NetworkLink.objects.filter(
+                pk__in=supplier_ids
+            ).values_list("pk", "path", "level")
+        }
+        product_ids = {pk for item in attrs for pk in item.get("products", [])}
+        existing_products = set(
+            Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True)
+        )
+        for index, item in enumerate(attrs):
+            if item.get("supplier") and item["supplier"] not in self.suppliers:
+                errors[index]["supplier"] = [
+                    f"Недопустимый первичный ключ \"{item['supplier']}\" - объект не существует."
+                ]
+            missing = set(item.get("products", [])) - existing_products
+            if missing:
+                errors[index]["products"] = [
+                    f"Продукты не существуют: {sorted(missing)}."
+                ]
+
+        if any(errors):
+            raise ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            # Пути поставщиков перечитываются под блокировкой: перенос поставщика
+            # в параллельной транзакции не оставит новым звеньям устаревший path
+            self.suppliers = {
+                pk: (path, level)
+                for pk, path, level in NetworkLink.objects.select_for_update()
+                .filter(pk__in=self.suppliers)
+                .order_by("pk")
+                .values_list("pk", "path", "level")
+            }
+            addresses = Address.objects.intern_many(
+                [item["address"] for item in validated_data]
+            )
+            links = NetworkLink.objects.bulk_create(
+                [
+                    NetworkLink(
+                        address=address,
+                        supplier_id=item.get("supplier"),
+                        product_count=len(set(item.get("products", []))),
+                        **{
+                            field: value
+                            for field, value in item.items()
+                            if field not in ("address", "supplier", "products")
+                        },
+                    )
+                    for item, address in zip(validated_data, addresses)
+                ],
+                batch_size=self.batch_size,
+            )
+
+            # path и level зависят от id, поэтому проставляются после вставки
+            for link in links:
+                parent_path, parent_level = self.suppliers.get(
+                    link.supplier_id, ("", -1)
+                )
+                link.path = f"{parent_path}{link.pk}{NetworkLink.PATH_SEPARATOR}"
+                link.level = parent_level + 1
+            NetworkLink.objects.bulk_update(
+                links, ["path", "level"], batch_size=self.batch_size
+            )
+            # Задолженность через API не передается, поэтому subtree_debt
+            # поставщиков не меняется - обновляется только число клиентов
+            NetworkLink.objects.increment(
+                "client_count", Counter(link.supplier_id for link in links)
+            )
+
+            through = Product.network_links.through
+            through.objects.bulk_create(
+                [
+                    through(product_id=product_id, networklink_id=link.pk)
+                    for item, link in zip(validated_data, links)
+                    for product_id in set(item.get("products", []))
+                ],
+                batch_size=self.batch_size,
+            )
+
+            # bulk_create не отправляет сигналы, поэтому сбрасываем кэш вручную:
+            # новые звенья и звенья, у чьих продуктов появились новые связи
+            product_ids = {
+                pk for item in validated_data for pk in item.get("products", [])
+            }
+            link_ids = {link.pk for link in links}
+            neighbour_ids = (
+                set(
+                    NetworkLink.objects.filter(products__in=product_ids).values_list(
+                        "id", flat=True
+                    )
+                )
+                - link_ids
+            )
+            if neighbour_ids:
+                NetworkLink.objects.filter(pk__in=neighbour_ids).touch()
+            invalidate_links(link_ids | neighbour_ids)
+        return links
+
+
+class NetworkLinkBulkSerializer(ModelSerializer):
+    """Элемент массового создания звеньев сети (см. NetworkLinkBulkListSerializer)."""
+
+    address = AddressSerializer()
+    supplier = IntegerField(min_value=1, required=False, allow_null=True)
+    products = ListField(child=IntegerField(min_value=1), required=False)
+
+    class Meta:
+        model = NetworkLink
+        list_serializer_class = NetworkLinkBulkListSerializer
+        fields = [
+            "name",
+            "network_type",
+            "email",
+            "address",
+            "supplier",
+            "debt_to_supplier",
+            "products",
+        ]
+        # Уникальность почты проверяется одним запросом для всего списка
+        extra_kwargs = {"email": {"validators": []}}
+
+    def validate(self, attrs):
+        validate_debt_update(attrs)
+        return attrs
+
+
+def post_debt_transactions(validated_data):
+    """Проводит проводки журнала; ошибки остатка возвращаются как ошибки API."""
+    try:
+        return DebtTransaction.objects.post(
+            [DebtTransaction(**item) for item in validated_data]
+        )
+    except DjangoValidationError as exc:
+        raise ValidationError(exc.messages)
+
+
+class DebtTransactionListSerializer(ListSerializer):
+    """Пакетная загрузка проводок (например, из ERP) одной транзакцией.
+    Повторы внешних идентификаторов проверяются для всего списка одним запросом.
+    """
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        errors = [{} for _ in attrs]
+
+        external_ids = [item.get("external_id") for item in attrs]
+        existing = set(
+            DebtTransaction.objects.filter(
+                external_id__in=[pk for pk in external_ids if pk]
+            ).values_list("external_id", flat=True)
+        )
+        seen = set()
+        for index, external_id in enumerate(external_ids):
+            if external_id and (external_id in existing or external_id in seen):
+                errors[index]["external_id"] = ["Проводка уже загружена."]
+            seen.add(external_id)
+
+        if any(errors):
+            raise ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        return post_debt_transactions(validated_data)
+
+
+class DebtTransactionSerializer(ModelSerializer):
+    link = IntegerField(source="link_id", min_value=1)
+
+    class Meta:
+        model = DebtTransaction
+        list_serializer_class = DebtTransactionListSerializer
+        fields = [
+            "id",
+            "link",
+            "amount",
+            "balance",
+            "kind",
+            "external_id",
+            "comment",
+            "created_at",
+        ]
+        read_only_fields = ["balance", "kind", "created_at"]
+        # Уникальность external_id проверяется пакетно в DebtTransactionListSerializer
+        extra_kwargs = {"external_id": {"validators": []}}
+
+    def validate_amount(self, value):
+        if not value:
+            raise ValidationError("Сумма проводки не может быть нулевой.")
+        return value
+
+    def create(self, validated_data):
+        external_id = validated_data.get("external_id")
+        if (
+            external_id
+            and DebtTransaction.objects.filter(external_id=external_id).exists()
+        ):
+            raise ValidationError({"external_id": ["Проводка уже загружена."]})
+        return post_debt_transactions([validated_data])[0]
+
+
+class DebtLevelTotalSerializer(ModelSerializer):
+    class Meta:
+        model = DebtLevelTotal
+        fields = ["level", "debt"]
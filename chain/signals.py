@@ -0,0 +1,138 @@
+from django.db.models import F
+from django.db.models.functions import Substr
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from chain.cache import invalidate_links
+from chain.models import (Address, DebtLevelTotal, DebtTransaction,
+                          NetworkLink, Product)
+
+
+def get_product_link_ids(product_ids):
+    """id звеньев, в чьих данных выводятся указанные продукты."""
+    return NetworkLink.objects.filter(products__in=product_ids).values_list(
+        "id", flat=True
+    )
+
+
+def links_changed(link_ids):
+    """Отмечает изменение данных звеньев из-за связанных объектов."""
+    link_ids = set(link_ids)
+    NetworkLink.objects.filter(pk__in=link_ids).touch()
+    invalidate_links(link_ids)
+
+
+@receiver(pre_delete, sender=NetworkLink)
+def detach_clients_subtree(sender, instance, **kwargs):
+    """Перед удалением звена делает его клиентов корнями их поддеревьев
+    (поставщик у клиентов обнуляется через on_delete=SET_NULL).
+    """
+    # Продукты звена выводят id своих звеньев, поэтому меняются и соседние звенья
+    links_changed(get_product_link_ids(instance.products.all()).exclude(pk=instance.pk))
+    affected = [instance.pk]
+
+    stored = (
+        NetworkLink.objects.filter(pk=instance.pk)
+        .values_list("path", "level", "supplier_id", "debt_to_supplier", "subtree_debt")
+        .first()
+    )
+    if not stored:
+        return invalidate_links(affected)
+    path, level, supplier_id, debt, subtree_debt = stored
+
+    # Поддерево уходит от поставщика и его предков вместе со своей задолженностью
+    NetworkLink.objects.increment("client_count", {supplier_id: -1})
+    NetworkLink.objects.increment(
+        "subtree_debt",
+        dict.fromkeys(NetworkLink.parse_ancestor_ids(path), -(debt + subtree_debt)),
+    )
+    if debt:
+        # Закрывающая проводка: остаток по журналу удаленного звена равен нулю
+        DebtLevelTotal.objects.add({level: -debt})
+        DebtTransaction.objects.create(
+            link_id=instance.pk, amount=-debt, balance=0, kind=DebtTransaction.CLOSING
+        )
+
+    if path:
+        clients = NetworkLink.objects.filter(path__startswith=path).exclude(
+            pk=instance.pk
+        )
+        affected.extend(clients.values_list("id", flat=True))
+        DebtLevelTotal.objects.shift(clients.debt_by_level(), -(level + 1))
+        clients.update(
+            path=Substr("path", len(path) + 1),
+            level=F("level") - (level + 1),
+            updated_at=timezone.now(),
+        )
+    invalidate_links(affected)
+
+
+@receiver(post_save, sender=NetworkLink)
+def invalidate_network_link(sender, instance, **kwargs):
+    affected = [instance.pk]
+    if getattr(instance, "_subtree_moved", False):
+        # Уровень (и updated_at) изменился у всего поддерева
+        affected.extend(
+            NetworkLink.objects.descendants_of(instance).values_list("id", flat=True)
+        )
+    invalidate_links(affected)
+
+
+@receiver(post_save, sender=Address)
+def invalidate_address(sender, instance, **kwargs):
+    links_changed(instance.networklink_set.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    link_ids = list(get_product_link_ids([instance.pk]))
+    # Связи удаляемого продукта удаляются каскадно без m2m_changed,
+    # поэтому product_count его звеньев пересчитывается в post_delete
+    instance._link_ids = link_ids
+    links_changed(link_ids)
+
+
+@receiver(post_delete, sender=Product)
+def refresh_deleted_product_counts(sender, instance, **kwargs):
+    NetworkLink.objects.filter(pk__in=instance._link_ids).refresh_product_count()
+
+
+@receiver(m2m_changed, sender=Product.network_links.through)
+def invalidate_product_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кэш всех звеньев продуктов, у которых меняется набор звеньев.
+    При удалении связи обработка идет до изменения (pre_*), чтобы учесть
+    звенья, которые еще связаны с продуктом, при добавлении - после (post_add).
+    """
+    if action in ("post_add", "post_remove", "post_clear"):
+        refresh_product_count(instance, action, reverse, pk_set)
+    if action not in ("pre_remove", "pre_clear", "post_add"):
+        return
+    if reverse:
+        # link.products.add/remove/clear
+        product_ids = pk_set if pk_set is not None else instance.products.all()
+        affected = [instance.pk]
+    else:
+        # product.network_links.add/remove/clear
+        product_ids = [instance.pk]
+        affected = list(pk_set or [])
+        if action == "pre_clear":
+            # Запоминаем звенья до очистки для пересчета product_count в post_clear
+            instance._cleared_link_ids = list(
+                instance.network_links.values_list("id", flat=True)
+            )
+    affected.extend(get_product_link_ids(product_ids))
+    links_changed(affected)
+
+
+def refresh_product_count(instance, action, reverse, pk_set):
+    """Пересчитывает product_count звеньев, у которых изменился набор продуктов."""
+    if reverse:
+        link_ids = [instance.pk]
+    elif action == "post_clear":
+        link_ids = getattr(instance, "_cleared_link_ids", [])
+    else:
+        link_ids = pk_set
+    NetworkLink.objects.filter(pk__in=link_ids).refresh_product_count()
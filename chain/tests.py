@@ -1,11 +1,42 @@
+import base64
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
 from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-from chain.models import Address, NetworkLink, Product
+from chain import cache, reports
+from chain.admin import NetworkLinkAdmin
+from chain.benchmark import SupplyChainGenerator
+from chain.models import (Address, DebtClearance, DebtClearanceBatch,
+                          DebtLevelTotal, DebtTransaction, NetworkLink,
+                          Product)
+from chain.renderers import FastJSONRenderer
+from chain.serializers import (NetworkLinkSerializer,
+                               get_compiled_network_link_serializer)
 from users.models import User
 
+# Кэш звеньев в памяти процесса для тестов кэширования (по умолчанию он выключен)
+CHAIN_LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "chain": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+
 
 class NetworkLinkTest(APITestCase):
     def setUp(self):
@@ -155,3 +186,1861 @@ class NetworkLinkTest(APITestCase):
         self.assertEqual(
             NetworkLink.objects.count(), 0
         )  # Проверяем, что объект был удален
+
+
+class NetworkLinkHierarchyTest(APITestCase):
+    def setUp(self):
+        self.factory = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com", network_type="factory"
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail", email="retail@example.com", supplier=self.factory
+        )
+        self.individual = NetworkLink.objects.create(
+            name="Individual",
+            email="individual@example.com",
+            network_type="individual",
+            supplier=self.retail,
+        )
+
+    def test_level_and_path_on_create(self):
+        """Тестируем расчет уровня и пути при создании звеньев."""
+        self.assertEqual(self.factory.level, 0)
+        self.assertEqual(self.retail.level, 1)
+        self.assertEqual(self.individual.level, 2)
+        self.assertEqual(
+            self.individual.path,
+            f"{self.factory.id}/{self.retail.id}/{self.individual.id}/",
+        )
+        self.assertEqual(
+            self.individual.ancestor_ids, [self.factory.id, self.retail.id]
+        )
+
+    def test_level_read_without_queries(self):
+        """Тестируем, что чтение уровня не обращается к базе данных."""
+        link = NetworkLink.objects.get(pk=self.individual.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(link.level, 2)
+
+    def test_move_subtree_relevels_descendants(self):
+        """Тестируем пересчет уровня поддерева при смене поставщика."""
+        new_factory = NetworkLink.objects.create(
+            name="New Factory", email="new_factory@example.com"
+        )
+        middle = NetworkLink.objects.create(
+            name="Middle", email="middle@example.com", supplier=new_factory
+        )
+        self.retail.supplier = middle
+        self.retail.save()
+
+        self.individual.refresh_from_db()
+        self.assertEqual(self.retail.level, 2)
+        self.assertEqual(self.individual.level, 3)
+        self.assertEqual(
+            self.individual.path,
+            f"{new_factory.id}/{middle.id}/{self.retail.id}/{self.individual.id}/",
+        )
+
+        self.retail.supplier = None
+        self.retail.save()
+        self.individual.refresh_from_db()
+        self.assertEqual(self.retail.level, 0)
+        self.assertEqual(self.individual.level, 1)
+
+    def test_move_locks_branch(self):
+        """Тестируем блокировку при переносе: предки нового и прежнего
+        поставщика и поддерево звена блокируются одним запросом."""
+        new_factory = NetworkLink.objects.create(
+            name="New Factory", email="new_factory@example.com"
+        )
+        middle = NetworkLink.objects.create(
+            name="Middle", email="middle@example.com", supplier=new_factory
+        )
+        self.retail.supplier = middle
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.retail._lock_rows()
+        self.assertEqual(
+            set(rows), {self.factory.id, self.retail.id, new_factory.id, middle.id}
+        )
+        self.assertEqual(len(queries), 2)
+        if connection.vendor == "postgresql":
+            sql = queries[1]["sql"]
+            self.assertIn("FOR UPDATE", sql)
+            self.assertIn("ORDER BY", sql)
+            self.assertIn("LIKE", sql)
+
+    def test_delete_supplier_relevels_clients(self):
+        """Тестируем пересчет уровня клиентов при удалении поставщика."""
+        self.factory.delete()
+        self.retail.refresh_from_db()
+        self.individual.refresh_from_db()
+        self.assertIsNone(self.retail.supplier)
+        self.assertEqual(self.retail.level, 0)
+        self.assertEqual(self.individual.level, 1)
+        self.assertEqual(
+            self.individual.path, f"{self.retail.id}/{self.individual.id}/"
+        )
+
+    def test_cycle_is_rejected(self):
+        """Тестируем запрет цикла в цепочке поставок (клиент как поставщик)."""
+        self.factory.supplier = self.individual
+        with self.assertRaises(ValidationError):
+            self.factory.clean()
+        with self.assertRaises(ValidationError):
+            self.factory.save()
+
+        self.factory.refresh_from_db()
+        self.assertIsNone(self.factory.supplier_id)
+        self.assertEqual(self.factory.level, 0)
+
+    def test_cycle_is_rejected_by_api(self):
+        """Тестируем ответ API на попытку создать цикл поставок."""
+        user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=user)
+        url = reverse("chain:network_link-detail", args=[self.retail.id])
+        response = self.client.patch(url, {"supplier": self.individual.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("supplier", response.data)
+
+
+class NetworkLinkQueryCountTest(APITestCase):
+    # Звенья + продукты + звенья продуктов
+    QUERY_BUDGET = 3
+
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.products = [
+            Product.objects.create(
+                name=f"Product {i}", model=f"Model {i}", release_date="2020-10-01"
+            )
+            for i in range(3)
+        ]
+        supplier = None
+        for i in range(10):
+            address = Address.objects.create(
+                country="Country",
+                city=f"City {i}",
+                street="Street",
+                house_number=str(i),
+            )
+            supplier = NetworkLink.objects.create(
+                name=f"Link {i}",
+                email=f"link{i}@example.com",
+                address=address,
+                supplier=supplier,
+            )
+            supplier.products.set(self.products)
+        self.last_link = supplier
+
+    def test_list_query_budget(self):
+        """Тестируем, что список звеньев загружается фиксированным числом запросов."""
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(reverse("chain:network_link-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(len(response.data["results"][0]["products"]), 3)
+
+    def test_retrieve_query_budget(self):
+        """Тестируем, что детальная информация о звене загружается фиксированным числом запросов."""
+        url = reverse("chain:network_link-detail", args=[self.last_link.id])
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["level"], 9)
+
+
+class NetworkLinkPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.links = [
+            NetworkLink.objects.create(name=f"Link {i}", email=f"link{i}@example.com")
+            for i in range(5)
+        ]
+        self.url = reverse("chain:network_link-list")
+
+    def test_keyset_pagination(self):
+        """Тестируем постраничный обход звеньев по курсору."""
+        response = self.client.get(self.url, {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        ids = []
+        while True:
+            ids.extend(item["id"] for item in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(ids, [link.id for link in self.links])
+
+    def test_invalid_cursor(self):
+        """Тестируем ответ на некорректный курсор."""
+        response = self.client.get(self.url, {"cursor": "broken"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        created_at = self.links[0].created_at.isoformat()
+        default = ["created_at", "id"]
+        for cursor in (
+            {"ordering": default, "position": ["not-a-date", 1]},
+            {"ordering": default, "position": [{"a": 1}, 1]},
+            {"ordering": default, "position": [created_at, "x"]},
+            {"ordering": default, "position": [created_at, None]},
+            [created_at, 1],
+        ):
+            encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+            response = self.client.get(self.url, {"cursor": encoded})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, cursor)
+
+    def test_cursor_of_other_ordering(self):
+        """Тестируем отказ в курсоре, построенном для другой сортировки."""
+        next_url = self.client.get(self.url, {"page_size": 2}).data["next"]
+        response = self.client.get(f"{next_url}&ordering=product_count")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stream_ndjson(self):
+        """Тестируем потоковую выгрузку звеньев в формате NDJSON."""
+        response = self.client.get(self.url, {"stream": "ndjson"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)["id"] for line in lines],
+            [link.id for link in self.links],
+        )
+
+
+class NetworkLinkFilterTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        moscow = Address.objects.create(
+            country="Россия", city="Москва", street="Ленина", house_number="1"
+        )
+        new_york = Address.objects.create(
+            country="USA", city="New York", street="Main street", house_number="99"
+        )
+        self.factory = NetworkLink.objects.create(
+            name="Factory",
+            email="factory@example.com",
+            network_type="factory",
+            address=moscow,
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail",
+            email="retail@example.com",
+            address=new_york,
+            supplier=self.factory,
+            debt_to_supplier=500,
+        )
+        self.url = reverse("chain:network_link-list")
+
+    def get_ids(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_filter_by_address(self):
+        """Тестируем фильтрацию по стране и городу адреса."""
+        self.assertEqual(self.get_ids({"country": "Россия"}), [self.factory.id])
+        self.assertEqual(self.get_ids({"city": "New York"}), [self.retail.id])
+        self.assertEqual(self.get_ids({"country": "USA", "city": "Москва"}), [])
+
+    def test_filter_by_link_fields(self):
+        """Тестируем фильтрацию по типу, уровню, задолженности и поставщику."""
+        self.assertEqual(self.get_ids({"network_type": "factory"}), [self.factory.id])
+        self.assertEqual(self.get_ids({"level_min": 1}), [self.retail.id])
+        self.assertEqual(self.get_ids({"level_max": 0}), [self.factory.id])
+        self.assertEqual(self.get_ids({"debt_min": "100.00"}), [self.retail.id])
+        self.assertEqual(self.get_ids({"debt_max": "100"}), [self.factory.id])
+        self.assertEqual(self.get_ids({"supplier": self.factory.id}), [self.retail.id])
+
+    def test_invalid_filter_value(self):
+        """Тестируем ответ на некорректное значение фильтра."""
+        response = self.client.get(self.url, {"level_min": "abc", "network_type": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("level_min", response.data)
+        self.assertIn("network_type", response.data)
+
+
+class NetworkLinkHierarchyAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.factory = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com", network_type="factory"
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail", email="retail@example.com", supplier=self.factory
+        )
+        self.individual = NetworkLink.objects.create(
+            name="Individual",
+            email="individual@example.com",
+            network_type="individual",
+            supplier=self.retail,
+        )
+        self.other = NetworkLink.objects.create(name="Other", email="other@example.com")
+
+    def get_ids(self, link, action, params=None):
+        url = reverse(f"chain:network_link-{action}", args=[link.id])
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_descendants(self):
+        """Тестируем получение всех клиентов звена."""
+        self.assertEqual(
+            self.get_ids(self.factory, "descendants"),
+            [self.retail.id, self.individual.id],
+        )
+        self.assertEqual(
+            self.get_ids(self.factory, "descendants", {"depth": 1}), [self.retail.id]
+        )
+        self.assertEqual(
+            self.get_ids(self.factory, "descendants", {"network_type": "individual"}),
+            [self.individual.id],
+        )
+        self.assertEqual(self.get_ids(self.individual, "descendants"), [])
+
+    def test_ancestors(self):
+        """Тестируем получение цепочки поставщиков звена."""
+        self.assertEqual(
+            self.get_ids(self.individual, "ancestors"),
+            [self.factory.id, self.retail.id],
+        )
+        self.assertEqual(
+            self.get_ids(self.individual, "ancestors", {"depth": 1}), [self.retail.id]
+        )
+        self.assertEqual(self.get_ids(self.factory, "ancestors"), [])
+
+    def test_descendants_query_budget(self):
+        """Тестируем, что поддерево загружается фиксированным числом запросов."""
+        product = Product.objects.create(
+            name="Product", model="Model", release_date="2020-10-01"
+        )
+        product.network_links.set([self.retail, self.individual])
+        url = reverse("chain:network_link-descendants", args=[self.factory.id])
+        # Корень + поддерево + продукты + звенья продуктов
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+    def test_invalid_depth(self):
+        """Тестируем ответ на некорректную глубину."""
+        url = reverse("chain:network_link-descendants", args=[self.factory.id])
+        response = self.client.get(url, {"depth": -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("depth", response.data)
+
+
+class NetworkLinkBulkCreateTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.supplier = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com", network_type="factory"
+        )
+        self.product = Product.objects.create(
+            name="Test Product", model="Test Model", release_date="2020-10-01"
+        )
+        self.url = reverse("chain:network_link-bulk")
+
+    def get_items(self, count):
+        return [
+            {
+                "name": f"Store {i}",
+                "email": f"store{i}@example.com",
+                "address": {
+                    "country": "Россия",
+                    "city": "Москва",
+                    "street": "Ленина",
+                    "house_number": str(i),
+                },
+                "supplier": self.supplier.id,
+                "products": [self.product.id],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        """Тестируем массовое создание звеньев фиксированным числом запросов."""
+        # Почта + поставщики + продукты, затем SAVEPOINT, блокировка поставщиков,
+        # адреса (вставка и выборка), звенья, path/level, клиенты поставщиков,
+        # продукты звеньев, звенья для сброса кэша и RELEASE SAVEPOINT
+        with self.assertNumQueries(13):
+            response = self.client.post(self.url, self.get_items(20), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 20)
+
+        link = NetworkLink.objects.get(email="store5@example.com")
+        self.assertEqual(link.level, 1)
+        self.assertEqual(link.path, f"{self.supplier.id}/{link.id}/")
+        self.assertEqual(link.address.house_number, "5")
+        self.assertEqual(list(link.products.all()), [self.product])
+
+    def test_bulk_create_ndjson(self):
+        """Тестируем массовое создание звеньев из NDJSON."""
+        body = "\n".join(json.dumps(item) for item in self.get_items(3))
+        response = self.client.post(self.url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(NetworkLink.objects.count(), 4)
+
+    def test_bulk_create_errors_per_item(self):
+        """Тестируем, что ошибки возвращаются по позициям и ничего не создается."""
+        items = self.get_items(3)
+        items[1]["email"] = self.supplier.email
+        items[2]["supplier"] = 999
+        response = self.client.post(self.url, items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("email", response.data[1])
+        self.assertIn("supplier", response.data[2])
+        self.assertEqual(NetworkLink.objects.count(), 1)
+
+
+class AddressDeduplicationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("chain:network_link-list")
+        self.address_data = {
+            "country": "Россия",
+            "city": "Москва",
+            "street": "Ленина",
+            "house_number": "1",
+        }
+
+    def create_link(self, email, address_data):
+        response = self.client.post(
+            self.url,
+            {"name": "Link", "email": email, "address": address_data},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return NetworkLink.objects.get(pk=response.data["id"])
+
+    def test_same_address_is_reused(self):
+        """Тестируем, что одинаковые (после нормализации) адреса не дублируются."""
+        first = self.create_link("first@example.com", self.address_data)
+        second = self.create_link(
+            "second@example.com", {**self.address_data, "street": "  Ленина "}
+        )
+        self.assertEqual(first.address_id, second.address_id)
+        self.assertEqual(Address.objects.count(), 1)
+
+    def test_update_does_not_change_shared_address(self):
+        """Тестируем, что обновление адреса звена не затрагивает другие звенья."""
+        first = self.create_link("first@example.com", self.address_data)
+        second = self.create_link("second@example.com", self.address_data)
+        url = reverse("chain:network_link-detail", args=[first.id])
+        response = self.client.patch(
+            url, {"address": {"house_number": "2"}}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.address.house_number, "2")
+        self.assertEqual(second.address.house_number, "1")
+
+    def test_update_link_without_address(self):
+        """Тестируем, что звену без адреса нужен полный адрес."""
+        link = NetworkLink.objects.create(name="Link", email="link@example.com")
+        url = reverse("chain:network_link-detail", args=[link.id])
+        response = self.client.patch(
+            url, {"address": {"house_number": "2"}}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            sorted(response.data["address"]), ["city", "country", "street"]
+        )
+        self.assertFalse(Address.objects.exists())
+
+        response = self.client.patch(url, {"address": self.address_data}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        link.refresh_from_db()
+        self.assertEqual(link.address.street, "Ленина")
+
+    def test_merge_duplicate_addresses(self):
+        """Тестируем объединение дубликатов адресов командой merge_addresses."""
+        Address.objects.bulk_create(
+            [
+                Address(**self.address_data),
+                Address(**{**self.address_data, "city": "Москва "}),
+                Address(**{**self.address_data, "street": "Ленина  "}),
+            ]
+        )
+        first, *duplicates = Address.objects.order_by("pk")
+        link = NetworkLink.objects.create(
+            name="Link", email="link@example.com", address=duplicates[-1]
+        )
+
+        call_command("merge_addresses", batch_size=1, stdout=StringIO())
+
+        link.refresh_from_db()
+        self.assertEqual(Address.objects.count(), 1)
+        self.assertEqual(link.address_id, first.id)
+
+
+@override_settings(CACHES=CHAIN_LOCMEM_CACHES)
+class NetworkLinkCacheTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.factory = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com", network_type="factory"
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail", email="retail@example.com", supplier=self.factory
+        )
+        self.product = Product.objects.create(
+            name="Test Product", model="Test Model", release_date="2020-10-01"
+        )
+        self.product.network_links.add(self.retail)
+        self.list_url = reverse("chain:network_link-list")
+        self.detail_url = reverse("chain:network_link-detail", args=[self.retail.id])
+
+    def test_cached_reads_skip_database(self):
+        """Тестируем, что повторное чтение не обращается к базе данных."""
+        first = self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.detail_url)
+        self.assertEqual(first.data, second.data)
+
+        first = self.client.get(self.list_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.list_url)
+        self.assertEqual(first.data, second.data)
+
+    def test_invalidation_on_save(self):
+        """Тестируем сброс кэша при изменении звена."""
+        self.client.get(self.detail_url)
+        self.client.get(self.list_url)
+        self.retail.name = "Renamed"
+        self.retail.save()
+        self.assertEqual(self.client.get(self.detail_url).data["name"], "Renamed")
+        self.assertEqual(
+            self.client.get(self.list_url).data["results"][1]["name"], "Renamed"
+        )
+
+    def test_invalidation_on_product_change(self):
+        """Тестируем сброс кэша при изменении продукта и его звеньев."""
+        self.client.get(self.detail_url)
+        self.product.network_links.add(self.factory)
+        products = self.client.get(self.detail_url).data["products"]
+        self.assertEqual(
+            products[0]["network_links"], [self.factory.id, self.retail.id]
+        )
+
+        self.product.name = "Renamed"
+        self.product.save()
+        products = self.client.get(self.detail_url).data["products"]
+        self.assertEqual(products[0]["name"], "Renamed")
+
+    def test_invalidation_on_supplier_change(self):
+        """Тестируем сброс кэша уровня у потомков при смене поставщика."""
+        individual = NetworkLink.objects.create(
+            name="Individual", email="individual@example.com", supplier=self.retail
+        )
+        url = reverse("chain:network_link-detail", args=[individual.id])
+        self.assertEqual(self.client.get(url).data["level"], 2)
+        self.retail.supplier = None
+        self.retail.save()
+        self.assertEqual(self.client.get(url).data["level"], 1)
+
+    def test_non_canonical_pk(self):
+        """Тестируем, что id с ведущими нулями не читается из кэша в обход сброса."""
+        self.client.get(self.detail_url)
+        url = f"{self.list_url}0{self.retail.id}/"
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.retail.name = "Renamed"
+        self.retail.save()
+        self.assertEqual(self.client.get(self.detail_url).data["name"], "Renamed")
+
+
+@override_settings(CACHES=CHAIN_LOCMEM_CACHES)
+class NetworkLinkConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.address = Address.objects.create(
+            country="Россия", city="Москва", street="Ленина", house_number="1"
+        )
+        self.link = NetworkLink.objects.create(
+            name="Link", email="link@example.com", address=self.address
+        )
+        self.list_url = reverse("chain:network_link-list")
+        self.detail_url = reverse("chain:network_link-detail", args=[self.link.id])
+
+    def test_etag_not_modified(self):
+        """Тестируем ответ 304 при совпадении ETag."""
+        for url in (self.detail_url, self.list_url):
+            response = self.client.get(url)
+            self.assertIn("ETag", response)
+            self.assertIn("Last-Modified", response)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_with_next_page(self):
+        """Тестируем смену ETag страницы, у которой появилась следующая."""
+        NetworkLink.objects.create(name="Second", email="second@example.com")
+        data = {"page_size": 2}
+        response = self.client.get(self.list_url, data)
+        self.assertIsNone(response.data["next"])
+        NetworkLink.objects.create(name="Third", email="third@example.com")
+        response = self.client.get(
+            self.list_url, data, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_if_modified_since(self):
+        """Тестируем ответ 304 по If-Modified-Since."""
+        response = self.client.get(self.detail_url)
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_not_modified_skips_serialization(self):
+        """Тестируем, что ответ 304 без кэша не загружает продукты."""
+        etag = self.client.get(self.detail_url)["ETag"]
+        cache.get_cache().clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_partial_save_changes_etag(self):
+        """Тестируем смену ETag после save() с update_fields без updated_at."""
+        etag = self.client.get(self.detail_url)["ETag"]
+        updated_at = self.link.updated_at
+        self.link.name = "Renamed"
+        self.link.save(update_fields=["name"])
+        self.link.refresh_from_db()
+        self.assertGreater(self.link.updated_at, updated_at)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_changes_with_related_objects(self):
+        """Тестируем смену ETag при изменении адреса звена."""
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.address.street = "Тверская"
+        self.address.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class NetworkLinkCountersTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.factory = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com"
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail",
+            email="retail@example.com",
+            supplier=self.factory,
+            debt_to_supplier="100.00",
+        )
+        self.individual = NetworkLink.objects.create(
+            name="Individual",
+            email="individual@example.com",
+            network_type="individual",
+            supplier=self.retail,
+            debt_to_supplier="10.50",
+        )
+        self.products = [
+            Product.objects.create(
+                name=f"Product {i}", model="Model", release_date="2020-10-01"
+            )
+            for i in range(3)
+        ]
+        self.url = reverse("chain:network_link-list")
+
+    def assertCounters(self, link, product_count, client_count, subtree_debt):
+        link.refresh_from_db()
+        self.assertEqual(
+            (link.product_count, link.client_count, link.subtree_debt),
+            (product_count, client_count, Decimal(subtree_debt)),
+        )
+
+    def test_counters_on_create(self):
+        """Тестируем счетчики клиентов и задолженности поддерева при создании."""
+        self.assertCounters(self.factory, 0, 1, "110.50")
+        self.assertCounters(self.retail, 0, 1, "10.50")
+        self.assertCounters(self.individual, 0, 0, "0")
+
+    def test_debt_change_updates_ancestors(self):
+        """Тестируем перенос изменения задолженности на всех предков."""
+        self.individual.debt_to_supplier = Decimal("0.50")
+        self.individual.save(update_fields=["debt_to_supplier"])
+        self.assertCounters(self.factory, 0, 1, "100.50")
+        self.assertCounters(self.retail, 0, 1, "0.50")
+
+    def test_move_and_delete_update_counters(self):
+        """Тестируем счетчики при смене поставщика и удалении звена."""
+        self.individual.supplier = self.factory
+        self.individual.save()
+        self.assertCounters(self.factory, 0, 2, "110.50")
+        self.assertCounters(self.retail, 0, 0, "0")
+
+        self.retail.delete()
+        self.assertCounters(self.factory, 0, 1, "10.50")
+
+    def test_product_count(self):
+        """Тестируем пересчет количества продуктов при изменении связей."""
+        self.retail.products.add(*self.products)
+        self.assertCounters(self.retail, 3, 1, "10.50")
+        self.retail.products.remove(self.products[0])
+        self.assertCounters(self.retail, 2, 1, "10.50")
+        self.products[1].delete()
+        self.assertCounters(self.retail, 1, 1, "10.50")
+        self.retail.products.clear()
+        self.assertCounters(self.retail, 0, 1, "10.50")
+
+    def test_clear_debt(self):
+        """Тестируем очистку задолженности с обновлением предков."""
+        cleared = NetworkLink.objects.filter(pk=self.individual.pk).clear_debt()
+        self.assertEqual(cleared, {self.individual.pk: Decimal("10.50")})
+        self.assertCounters(self.factory, 0, 1, "100.00")
+        self.assertCounters(self.retail, 0, 1, "0")
+
+    def test_ordering_by_counter(self):
+        """Тестируем сортировку списка по счетчику с курсорной пагинацией."""
+        response = self.client.get(
+            self.url, {"ordering": "-subtree_debt", "page_size": 2}
+        )
+        ids = [item["id"] for item in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        ids.extend(item["id"] for item in response.data["results"])
+        self.assertEqual(ids, [self.factory.id, self.retail.id, self.individual.id])
+
+
+class ChainAdminTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            email="admin@test.com", is_active=True, is_staff=True, is_superuser=True
+        )
+        self.client.force_login(self.user)
+        self.address = Address.objects.create(
+            country="Россия", city="Москва", street="Ленина", house_number="1"
+        )
+        self.product = Product.objects.create(
+            name="Product", model="Model", release_date="2020-10-01"
+        )
+
+    def create_links(self, count):
+        supplier = NetworkLink.objects.filter(supplier=None).first()
+        for _ in range(count):
+            index = NetworkLink.objects.count()
+            supplier = NetworkLink.objects.create(
+                name=f"Link {index}",
+                email=f"link{index}@example.com",
+                address=self.address,
+                supplier=supplier,
+            )
+            supplier.products.add(self.product)
+
+    def get_query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow(self):
+        """Тестируем, что число запросов списков админки не зависит от числа строк."""
+        for name in ("chain_networklink_changelist", "chain_product_changelist"):
+            url = reverse(f"admin:{name}")
+            self.create_links(2)
+            expected = self.get_query_count(url)
+            self.create_links(10)
+            self.assertEqual(self.get_query_count(url), expected)
+
+    def test_level_is_sortable(self):
+        """Тестируем сортировку списка звеньев в админке по уровню."""
+        self.create_links(3)
+        url = reverse("admin:chain_networklink_changelist")
+        column = NetworkLinkAdmin.list_display.index("level")
+        response = self.client.get(url, {"o": f"-{column}"})
+        levels = [link.level for link in response.context["cl"].result_list]
+        self.assertEqual(levels, [2, 1, 0])
+
+    def test_autocomplete_widgets(self):
+        """Тестируем выбор звеньев через поиск с подгрузкой вместо списка."""
+        self.create_links(3)
+        link = NetworkLink.objects.get(name="Link 1")
+        NetworkLink.objects.create(name="Unrelated", email="unrelated@example.com")
+        response = self.client.get(
+            reverse("admin:chain_product_change", args=[self.product.id])
+        )
+        self.assertContains(response, "admin-autocomplete")
+        self.assertNotContains(response, "Unrelated")
+
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "term": "link 1",
+                "app_label": "chain",
+                "model_name": "networklink",
+                "field_name": "supplier",
+            },
+        )
+        self.assertEqual(
+            [item["id"] for item in response.json()["results"]], [str(link.id)]
+        )
+
+
+class DebtClearanceAdminTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            email="admin@test.com", is_active=True, is_staff=True, is_superuser=True
+        )
+        self.client.force_login(self.user)
+        self.supplier = NetworkLink.objects.create(
+            name="Supplier", email="supplier@example.com"
+        )
+        self.links = [
+            NetworkLink.objects.create(
+                name=f"Link {i}",
+                email=f"link{i}@example.com",
+                supplier=self.supplier,
+                debt_to_supplier=Decimal(i),
+            )
+            for i in range(6)
+        ]
+        self.url = reverse("admin:chain_networklink_changelist")
+
+    def run_action(self, action):
+        return self.client.post(
+            self.url,
+            {
+                "action": action,
+                "_selected_action": [link.pk for link in self.links],
+            },
+        )
+
+    @override_settings(CHAIN_CLEAR_DEBT_BATCH_SIZE=2)
+    def test_clear_debt_in_batches(self):
+        """Тестируем пакетную очистку задолженности с аудитом прежних сумм."""
+        self.run_action("clear_debt")
+
+        clearance = DebtClearance.objects.get()
+        self.assertEqual(clearance.status, DebtClearance.DONE)
+        self.assertEqual((clearance.total, clearance.processed), (5, 5))
+        self.assertEqual(clearance.cleared_debt, Decimal("15"))
+
+        batches = DebtClearanceBatch.objects.order_by("id")
+        self.assertEqual([batch.link_count for batch in batches], [2, 2, 1])
+        self.assertEqual(
+            batches[0].previous_debts,
+            {str(self.links[1].pk): "1.00", str(self.links[2].pk): "2.00"},
+        )
+        self.assertFalse(NetworkLink.objects.filter(debt_to_supplier__gt=0).exists())
+        self.supplier.refresh_from_db()
+        self.assertEqual(self.supplier.subtree_debt, 0)
+
+    def test_clear_debt_in_background(self):
+        """Тестируем запуск очистки задолженности в фоне после фиксации."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.run_action("clear_debt_in_background")
+        self.assertEqual(len(callbacks), 1)
+        clearance = DebtClearance.objects.get()
+        self.assertEqual(
+            (clearance.status, clearance.total), (DebtClearance.PENDING, 5)
+        )
+
+
+class DebtLedgerTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.factory = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com"
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail",
+            email="retail@example.com",
+            supplier=self.factory,
+            debt_to_supplier="100.00",
+        )
+        self.individual = NetworkLink.objects.create(
+            name="Individual",
+            email="individual@example.com",
+            network_type="individual",
+            supplier=self.retail,
+        )
+        self.url = reverse("chain:debt_transaction-list")
+
+    def get_level_totals(self):
+        return dict(DebtLevelTotal.objects.exclude(debt=0).values_list("level", "debt"))
+
+    def test_bulk_ingest(self):
+        """Тестируем пакетную загрузку проводок с пересчетом остатков и итогов."""
+        data = [
+            {"link": self.individual.id, "amount": "30.00", "external_id": "erp-1"},
+            {"link": self.retail.id, "amount": "-40.00", "external_id": "erp-2"},
+            {"link": self.individual.id, "amount": "-5.00", "external_id": "erp-3"},
+        ]
+        # Внешние id, SAVEPOINT, блокировка звеньев, вставка проводок, остатки
+        # звеньев, subtree_debt предков, итоги уровней (2 запроса), RELEASE SAVEPOINT
+        with self.assertNumQueries(9):
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item["balance"] for item in response.data], ["30.00", "60.00", "25.00"]
+        )
+
+        self.individual.refresh_from_db()
+        self.factory.refresh_from_db()
+        self.assertEqual(self.individual.debt_to_supplier, Decimal("25.00"))
+        self.assertEqual(self.factory.subtree_debt, Decimal("85.00"))
+        self.assertEqual(
+            self.get_level_totals(), {1: Decimal("60.00"), 2: Decimal("25.00")}
+        )
+
+    def test_ingest_errors(self):
+        """Тестируем отказ при повторной проводке и отрицательном остатке."""
+        DebtTransaction.objects.post(
+            [DebtTransaction(link=self.retail, amount=1, external_id="erp-1")]
+        )
+        data = [
+            {"link": self.retail.id, "amount": "1.00", "external_id": "erp-1"},
+            {"link": self.retail.id, "amount": "1.00", "external_id": "erp-2"},
+        ]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("external_id", response.data[0])
+
+        response = self.client.post(
+            self.url, {"link": self.retail.id, "amount": "-500.00"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.retail.refresh_from_db()
+        self.assertEqual(self.retail.debt_to_supplier, Decimal("101.00"))
+
+    def test_stale_save_keeps_ledger_balance(self):
+        """Тестируем, что сохранение ранее загруженного звена не отменяет проводки."""
+        stale = NetworkLink.objects.get(pk=self.individual.pk)
+        DebtTransaction.objects.post(
+            [DebtTransaction(link_id=self.individual.id, amount=Decimal("50.00"))]
+        )
+        stale.name = "Renamed"
+        stale.save()
+
+        self.individual.refresh_from_db()
+        self.assertEqual(self.individual.name, "Renamed")
+        self.assertEqual(self.individual.debt_to_supplier, Decimal("50.00"))
+        self.assertEqual(stale.debt_to_supplier, Decimal("50.00"))
+        self.assertFalse(
+            DebtTransaction.objects.filter(
+                link=self.individual, kind=DebtTransaction.ADJUSTMENT
+            ).exists()
+        )
+        self.assertEqual(
+            self.get_level_totals(), {1: Decimal("100.00"), 2: Decimal("50.00")}
+        )
+
+    def test_direct_changes_are_journaled(self):
+        """Тестируем журнал и итоги по уровням при изменениях в обход API."""
+        self.individual.debt_to_supplier = Decimal("10.00")
+        self.individual.save(update_fields=["debt_to_supplier"])
+        self.individual.supplier = self.factory
+        self.individual.save()
+        self.assertEqual(self.get_level_totals(), {1: Decimal("110.00")})
+
+        NetworkLink.objects.filter(pk=self.retail.pk).clear_debt()
+        self.assertEqual(self.get_level_totals(), {1: Decimal("10.00")})
+        self.assertEqual(
+            list(
+                DebtTransaction.objects.filter(link=self.retail)
+                .order_by("id")
+                .values_list("kind", "amount", "balance")
+            ),
+            [
+                (DebtTransaction.ADJUSTMENT, Decimal("100.00"), Decimal("100.00")),
+                (DebtTransaction.CLEARANCE, Decimal("-100.00"), Decimal("0.00")),
+            ],
+        )
+
+    def test_plain_save_rejects_debt_change(self):
+        """Тестируем отказ save() без update_fields при измененном остатке."""
+        stale = NetworkLink.objects.get(pk=self.retail.pk)
+        DebtTransaction.objects.post([DebtTransaction(link=self.retail, amount=-30)])
+        # Устаревший после проводки остаток не мешает сохранению
+        stale.name = "Renamed"
+        stale.save()
+        stale.refresh_from_db()
+        stale.save()
+
+        stale.debt_to_supplier = Decimal("5.00")
+        with self.assertRaises(ValueError):
+            stale.save()
+        self.retail.refresh_from_db()
+        self.assertEqual(
+            (self.retail.name, self.retail.debt_to_supplier),
+            ("Renamed", Decimal("70.00")),
+        )
+
+    def test_level_totals_on_delete(self):
+        """Тестируем перенос итогов по уровням при удалении поставщика."""
+        DebtTransaction.objects.post([DebtTransaction(link=self.individual, amount=7)])
+        retail_id = self.retail.id
+        self.retail.delete()
+        self.assertEqual(self.get_level_totals(), {0: Decimal("7.00")})
+
+        response = self.client.get(reverse("chain:debt_level-list"))
+        self.assertEqual(response.data[0], {"level": 0, "debt": "7.00"})
+        response = self.client.get(self.url, {"link": retail_id})
+        self.assertEqual(
+            [item["kind"] for item in response.data["results"]],
+            [DebtTransaction.ADJUSTMENT, DebtTransaction.CLOSING],
+        )
+
+
+class AsyncNetworkLinkViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.address = Address.objects.create(
+            country="Россия", city="Москва", street="Ленина", house_number="1"
+        )
+        self.product = Product.objects.create(
+            name="Product", model="Model", release_date="2020-10-01"
+        )
+        self.factory = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com", address=self.address
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail",
+            email="retail@example.com",
+            address=self.address,
+            supplier=self.factory,
+        )
+        self.retail.products.add(self.product)
+
+    def async_get(self, url, data=None, authenticate=True, **headers):
+        if authenticate:
+            headers.update(self.headers)
+
+        async def get():
+            return await self.async_client.get(url, data, headers=headers)
+
+        return async_to_sync(get)()
+
+    def test_same_responses_as_sync_api(self):
+        """Тестируем совпадение ответов асинхронного и синхронного API."""
+        for name, args, data in (
+            ("network_link-list", [], {"page_size": 1}),
+            ("network_link-list", [], {"city": "Москва"}),
+            ("network_link-detail", [self.retail.id], None),
+            ("network_link-descendants", [self.factory.id], None),
+            ("network_link-ancestors", [self.retail.id], {"depth": 1}),
+        ):
+            sync_response = self.client.get(reverse(f"chain:{name}", args=args), data)
+            response = self.async_get(reverse(f"chain:async_{name}", args=args), data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            if data.get("next"):
+                # Ссылки на следующую страницу указывают на свой путь
+                self.assertIn("/async/", data.pop("next"))
+                sync_response.data.pop("next")
+            self.assertEqual(data, json.loads(json.dumps(sync_response.data)))
+
+    def test_conditional_get(self):
+        """Тестируем ответ 304 асинхронного пути при совпадении ETag."""
+        url = reverse("chain:async_network_link-detail", args=[self.retail.id])
+        etag = self.async_get(url)["ETag"]
+        cache.get_cache().clear()
+        response = self.async_get(url, If_None_Match=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_auth_and_permissions(self):
+        """Тестируем аутентификацию и права в асинхронном пути."""
+        url = reverse("chain:async_network_link-list")
+        response = self.async_get(url, authenticate=False)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.async_get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_not_found(self):
+        """Тестируем ответ 404 для несуществующего звена."""
+        response = self.async_get(
+            reverse("chain:async_network_link-detail", args=[self.retail.id + 100])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BenchmarkTest(APITestCase):
+    def test_generator(self):
+        """Тестируем согласованность счетчиков и итогов в синтетической сети."""
+        dataset = SupplyChainGenerator(
+            links=100, depth=4, fan_out=3, products=20, products_per_link=2, seed=1
+        ).generate()
+        self.assertEqual(dataset["links"], NetworkLink.objects.count())
+        self.assertEqual(dataset["levels"], 4)
+
+        links = NetworkLink.objects.annotate(
+            clients_total=Count("clients", distinct=True),
+            products_total=Count("products", distinct=True),
+        )
+        for link in links:
+            self.assertEqual(link.client_count, link.clients_total)
+            self.assertEqual(link.product_count, link.products_total)
+            debt = link.get_descendants().aggregate(debt=Sum("debt_to_supplier"))
+            self.assertEqual(link.subtree_debt, debt["debt"] or 0)
+            if link.supplier_id:
+                self.assertEqual(link.path, f"{link.supplier.path}{link.id}/")
+        self.assertEqual(
+            dict(DebtLevelTotal.objects.values_list("level", "debt")),
+            NetworkLink.objects.debt_by_level(),
+        )
+
+    def test_benchmark_filters_command(self):
+        """Тестируем согласованность данных, добавленных замером фильтрации."""
+        stdout = StringIO()
+        call_command(
+            "benchmark_filters", links=100, checkpoints=2, repeat=1, stdout=stdout
+        )
+        self.assertEqual(len(stdout.getvalue().splitlines()), 3)
+        self.assertEqual(NetworkLink.objects.count(), 100)
+        self.assertFalse(
+            NetworkLink.objects.annotate(clients_total=Count("clients"))
+            .exclude(client_count=F("clients_total"))
+            .exists()
+        )
+        self.assertEqual(
+            DebtTransaction.objects.aggregate(debt=Sum("amount"))["debt"],
+            NetworkLink.objects.aggregate(debt=Sum("debt_to_supplier"))["debt"],
+        )
+        self.assertEqual(
+            dict(DebtLevelTotal.objects.values_list("level", "debt")),
+            NetworkLink.objects.debt_by_level(),
+        )
+
+    def test_benchmark_command(self):
+        """Тестируем замеры и сравнение с прошлым прогоном."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / "results.json"
+            call_command(
+                "benchmark",
+                links=40,
+                depth=3,
+                fan_out=3,
+                products=10,
+                products_per_link=2,
+                repeat=2,
+                warmup=0,
+                output=str(output),
+                stdout=StringIO(),
+            )
+            report = json.loads(output.read_text())
+            results = report["results"]
+            self.assertEqual(report["meta"]["dataset"]["links"], 40)
+            for name in (
+                "api.list",
+                "api.retrieve",
+                "api.descendants",
+                "api.ancestors",
+                "api.create",
+                "api.destroy",
+                "api.bulk",
+                "admin.networklink",
+                "admin.debtleveltotal",
+            ):
+                self.assertLess(results[name]["status"], 400, name)
+                self.assertGreater(results[name]["queries"], 0, name)
+            # Запросы на запись откатываются
+            self.assertEqual(NetworkLink.objects.count(), 40)
+
+            for result in results.values():
+                result["queries"] -= 1
+            output.write_text(json.dumps(report))
+            with self.assertRaisesMessage(CommandError, "api.list: запросов"):
+                call_command(
+                    "benchmark",
+                    no_generate=True,
+                    repeat=1,
+                    warmup=0,
+                    compare=str(output),
+                    threshold=1000,
+                    stdout=StringIO(),
+                )
+
+
+class ChainLoaderTest(APITestCase):
+    fixture_path = (
+        Path(__file__).resolve().parent.parent / "fixtures/network_links.json"
+    )
+
+    def load(self, *files, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for name, content in files:
+                path = Path(directory) / name
+                path.write_text(content, encoding="utf-8")
+                paths.append(str(path))
+            call_command("load_chain", *paths, stdout=StringIO(), **options)
+
+    def test_load_fixture(self):
+        """Тестируем загрузку фикстуры в JSON Lines: клиенты идут раньше поставщиков."""
+        records = json.loads(self.fixture_path.read_text(encoding="utf-8"))
+        records.sort(key=lambda record: record["model"] != "chain.networklink")
+        links = [r for r in records if r["model"] == "chain.networklink"]
+        for record in links:
+            # Поля, которые загрузчик вычисляет сам
+            for field in ("path", "level", "client_count", "subtree_debt"):
+                record["fields"].pop(field)
+        lines = [json.dumps(record, ensure_ascii=False) for record in reversed(records)]
+        self.load(("network_links.jsonl", "\n".join(lines)), batch_size=2)
+
+        for record in links:
+            link = NetworkLink.objects.get(pk=record["pk"])
+            self.assertEqual(link.name, record["fields"]["name"])
+            self.assertEqual(
+                link.created_at, parse_datetime(record["fields"]["created_at"])
+            )
+        self.assertEqual(
+            list(
+                NetworkLink.objects.order_by("id").values_list(
+                    "id",
+                    "path",
+                    "level",
+                    "product_count",
+                    "client_count",
+                    "subtree_debt",
+                )
+            ),
+            [
+                (1, "1/", 0, 3, 2, Decimal("0.15")),
+                (2, "1/2/", 1, 1, 1, Decimal("0.15")),
+                (3, "1/2/3/", 2, 2, 1, Decimal("0.15")),
+                (4, "1/2/3/4/", 3, 1, 0, Decimal("0.00")),
+                (5, "1/5/", 1, 1, 0, Decimal("0.00")),
+                (6, "6/", 0, 0, 0, Decimal("0.00")),
+                (8, "8/", 0, 0, 0, Decimal("0.00")),
+            ],
+        )
+        self.assertEqual(
+            dict(DebtLevelTotal.objects.values_list("level", "debt")),
+            {3: Decimal("0.15")},
+        )
+        self.assertEqual(DebtTransaction.objects.get().link_id, 4)
+        # Последовательность id сдвинута после вставки с явными ключами
+        link = NetworkLink.objects.create(name="New", email="new@example.com")
+        self.assertGreater(link.id, 8)
+        if connection.vendor == "postgresql":
+            # Таблицы отчетов пересчитаны: связи шли в файле раньше звеньев
+            self.assertEqual(
+                reports.read_table("product_coverage_by_city"),
+                list(reports.product_coverage_by_city()),
+            )
+
+    def test_load_csv_with_existing_supplier(self):
+        """Тестируем загрузку CSV с поставщиком, который уже есть в БД."""
+        supplier = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com", network_type="factory"
+        )
+        retail = NetworkLink.objects.create(
+            name="Retail", email="retail@example.com", supplier=supplier
+        )
+        self.load(
+            (
+                "address.csv",
+                "pk,country,city,street,house_number\n"
+                "100,Россия,  Москва ,Ленина,1\n",
+            ),
+            (
+                "networklink.csv",
+                "pk,name,network_type,email,address,supplier,debt_to_supplier\n"
+                "101,Shop,individual,shop@example.com,100,102,5.50\n"
+                f"102,Store,retail,store@example.com,,{retail.id},10.00\n",
+            ),
+            (
+                "product.csv",
+                "pk,name,model,release_date,network_links\n"
+                f"100,Phone,X,2020-01-01,101 {retail.id}\n",
+            ),
+        )
+        shop = NetworkLink.objects.select_related("address").get(pk=101)
+        self.assertEqual(shop.address.city, "Москва")
+        self.assertEqual(shop.path, f"{supplier.id}/{retail.id}/102/101/")
+        self.assertEqual(shop.product_count, 1)
+        supplier.refresh_from_db()
+        retail.refresh_from_db()
+        self.assertEqual(supplier.subtree_debt, Decimal("15.50"))
+        self.assertEqual(retail.client_count, 1)
+        self.assertEqual(retail.product_count, 1)
+        self.assertEqual(
+            dict(DebtLevelTotal.objects.values_list("level", "debt")),
+            {2: Decimal("10.00"), 3: Decimal("5.50")},
+        )
+
+    def test_load_cycle(self):
+        """Тестируем отказ при цикле поставщиков: ничего не загружается."""
+        lines = [
+            {"model": "chain.networklink", "pk": pk, "fields": fields}
+            for pk, fields in (
+                (1, {"name": "A", "email": "a@example.com", "supplier": 2}),
+                (2, {"name": "B", "email": "b@example.com", "supplier": 1}),
+                (3, {"name": "C", "email": "c@example.com"}),
+            )
+        ]
+        with self.assertRaisesMessage(CommandError, "образуют цикл: [1, 2]"):
+            self.load(("links.jsonl", "\n".join(json.dumps(line) for line in lines)))
+        self.assertFalse(NetworkLink.objects.exists())
+
+
+class ProductCatalogTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("chain:product-list")
+        self.phone = Product.objects.create(
+            name="Смартфон", model="Galaxy S20", release_date="2020-03-01"
+        )
+        self.laptop = Product.objects.create(
+            name="Ноутбук", model="ThinkPad X1", release_date="2021-06-01"
+        )
+        self.tablet = Product.objects.create(
+            name="Планшет", model="Galaxy Tab", release_date="2022-09-01"
+        )
+        self.factory = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com", network_type="factory"
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail", email="retail@example.com", supplier=self.factory
+        )
+        self.shop = NetworkLink.objects.create(
+            name="Shop", email="shop@example.com", supplier=self.retail
+        )
+        self.phone.network_links.add(self.factory)
+
+    def ids(self, response):
+        return [item["id"] for item in response.data["results"]]
+
+    def test_search_and_filters(self):
+        """Тестируем поиск по названию и модели и фильтры по дате выхода."""
+        response = self.client.get(self.url, {"search": "galaxy"})
+        self.assertEqual(self.ids(response), [self.phone.id, self.tablet.id])
+        response = self.client.get(self.url, {"search": "Ноут"})
+        self.assertEqual(self.ids(response), [self.laptop.id])
+        response = self.client.get(
+            self.url,
+            {"release_date_from": "2021-01-01", "release_date_to": "2021-12-31"},
+        )
+        self.assertEqual(self.ids(response), [self.laptop.id])
+        response = self.client.get(self.url, {"network_link": self.factory.id})
+        self.assertEqual(
+            response.data["results"][0]["network_links"], [self.factory.id]
+        )
+        response = self.client.get(self.url, {"release_date_from": "01.01.2021"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pagination(self):
+        """Тестируем курсорную пагинацию по дате выхода."""
+        response = self.client.get(
+            self.url, {"ordering": "-release_date", "page_size": 2}
+        )
+        self.assertEqual(self.ids(response), [self.tablet.id, self.laptop.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(response.data["next"])
+        self.assertEqual(self.ids(response), [self.phone.id])
+        self.assertIsNone(response.data["next"])
+
+    def test_assign(self):
+        """Тестируем массовое связывание продуктов со звеньями сети."""
+        url = reverse("chain:product-assign")
+        data = {
+            "products": [self.phone.id, self.laptop.id],
+            "network_links": [self.retail.id, self.shop.id, self.factory.id],
+        }
+        self.client.get(reverse("chain:network_link-detail", args=[self.factory.id]))
+        with self.assertNumQueries(9):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.data, {"created": 5})
+        self.assertEqual(set(self.retail.products.all()), {self.phone, self.laptop})
+        for link in (self.factory, self.retail, self.shop):
+            link.refresh_from_db()
+            self.assertEqual(link.product_count, 2)
+        # Кэш звена, у продукта которого появились новые звенья, сброшен
+        response = self.client.get(
+            reverse("chain:network_link-detail", args=[self.factory.id])
+        )
+        phone = next(p for p in response.data["products"] if p["id"] == self.phone.id)
+        self.assertEqual(
+            sorted(phone["network_links"]),
+            [self.factory.id, self.retail.id, self.shop.id],
+        )
+
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.data, {"created": 0})
+
+        response = self.client.post(
+            url, {"products": [self.phone.id + 100], "network_links": []}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("network_links", response.data)
+
+        # Число пар ограничено, даже если каждый список в пределах max_items
+        data = {"products": list(range(1, 101)), "network_links": list(range(1, 12))}
+        with self.assertNumQueries(0):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("non_field_errors", response.data)
+
+
+class NetworkLinkProductsUpdateTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.products = Product.objects.bulk_create(
+            Product(name=f"Product {n}", model="Model", release_date="2020-10-01")
+            for n in range(40)
+        )
+        self.link = NetworkLink.objects.create(
+            name="Retail", email="retail@example.com"
+        )
+        self.neighbour = NetworkLink.objects.create(
+            name="Neighbour", email="neighbour@example.com"
+        )
+        self.link.products.add(*self.products[:20])
+        self.neighbour.products.add(self.products[0], self.products[30])
+        self.url = reverse("chain:network_link-detail", args=[self.link.id])
+        self.through = Product.network_links.through
+
+    def patch_products(self, products):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                self.url, {"products": [p.id for p in products]}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(context.captured_queries)
+
+    def test_diff_update(self):
+        """Тестируем изменение продуктов звена только нужными вставками и удалениями."""
+        kept = self.through.objects.get(
+            networklink=self.link, product=self.products[5]
+        ).id
+        response, _ = self.patch_products(self.products[1:10] + self.products[30:35])
+        self.assertEqual(
+            self.through.objects.get(
+                networklink=self.link, product=self.products[5]
+            ).id,
+            kept,
+        )
+        self.assertEqual(
+            sorted(p["id"] for p in response.data["products"]),
+            [p.id for p in self.products[1:10] + self.products[30:35]],
+        )
+        self.assertEqual(response.data["product_count"], 14)
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.product_count, 14)
+
+        # Кэш соседнего звена сброшен: у его продуктов изменились звенья
+        response = self.client.get(
+            reverse("chain:network_link-detail", args=[self.neighbour.id])
+        )
+        products = {p["id"]: p["network_links"] for p in response.data["products"]}
+        self.assertEqual(products[self.products[0].id], [self.neighbour.id])
+        self.assertEqual(
+            sorted(products[self.products[30].id]), [self.link.id, self.neighbour.id]
+        )
+
+    def test_constant_queries(self):
+        """Тестируем, что число запросов не зависит от числа продуктов."""
+        _, few = self.patch_products(self.products[1:3] + self.products[20:22])
+        _, many = self.patch_products(self.products[3:6] + self.products[22:40])
+        self.assertEqual(few, many)
+
+    def test_validation(self):
+        """Тестируем отказ при пустом списке и несуществующих продуктах."""
+        response = self.client.patch(self.url, {"products": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(
+            self.url, {"products": [self.products[-1].id + 1]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("products", response.data)
+        self.assertEqual(self.link.products.count(), 20)
+
+
+class NetworkLinkSparseFieldsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        self.address = Address.objects.create(
+            country="Россия", city="Москва", street="Ленина", house_number="1"
+        )
+        self.products = [
+            Product.objects.create(
+                name=f"Product {i}", model=f"Model {i}", release_date="2020-10-01"
+            )
+            for i in range(3)
+        ]
+        self.factory = NetworkLink.objects.create(
+            name="Factory", email="factory@example.com", address=self.address
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail",
+            email="retail@example.com",
+            address=self.address,
+            supplier=self.factory,
+        )
+        self.retail.products.set(self.products)
+        self.url = reverse("chain:network_link-list")
+
+    def test_lean_list(self):
+        """Тестируем, что выбранные поля читаются одним запросом без JOIN."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {"fields": "id,name,level"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"],
+            [
+                {"id": self.factory.id, "name": "Factory", "level": 0},
+                {"id": self.retail.id, "name": "Retail", "level": 1},
+            ],
+        )
+        self.assertEqual(len(context.captured_queries), 1)
+        sql = context.captured_queries[0]["sql"]
+        self.assertNotIn("JOIN", sql)
+        self.assertNotIn('"email"', sql)
+
+    def test_related_ids_without_expand(self):
+        """Тестируем вывод id адреса и продуктов без их раскрытия:
+        звено без JOIN и id продуктов одной предвыборкой."""
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse("chain:network_link-detail", args=[self.retail.id]),
+                {"fields": "id,address,products"},
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["address"], self.address.id)
+        self.assertCountEqual(
+            response.data["products"], [product.id for product in self.products]
+        )
+
+    def test_expand(self):
+        """Тестируем раскрытие вложенных объектов из ?expand=."""
+        full = self.client.get(
+            reverse("chain:network_link-detail", args=[self.retail.id])
+        ).data
+        response = self.client.get(
+            self.url, {"fields": "id", "expand": "address,products"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.data["results"][1]
+        self.assertEqual(set(result), {"id", "address", "products"})
+        self.assertEqual(result["address"], full["address"])
+        self.assertEqual(result["products"], full["products"])
+
+    def test_stream_and_async(self):
+        """Тестируем выбор полей в потоковой выгрузке и асинхронном пути."""
+        data = {"fields": "id,name", "ordering": "-product_count"}
+        response = self.client.get(self.url, {**data, "stream": "ndjson"})
+        rows = [json.loads(line) for line in response.streaming_content]
+        self.assertEqual(rows[0], {"id": self.factory.id, "name": "Factory"})
+
+        sync_data = self.client.get(self.url, data).json()
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+        async def get():
+            return await self.async_client.get(
+                reverse("chain:async_network_link-list"), data, headers=headers
+            )
+
+        async_data = async_to_sync(get)().json()
+        self.assertEqual(async_data["results"], sync_data["results"])
+        self.assertEqual(
+            [row["id"] for row in sync_data["results"]],
+            [self.retail.id, self.factory.id],
+        )
+
+    def test_unknown_fields(self):
+        """Тестируем ошибку при неизвестных полях."""
+        response = self.client.get(self.url, {"fields": "id,path"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", response.data)
+        response = self.client.get(self.url, {"fields": "id", "expand": "supplier"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("expand", response.data)
+
+
+class FastSerializationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        address = Address.objects.create(
+            country="Россия", city="Москва", street="Ленина \u2028", house_number="1"
+        )
+        products = [
+            Product.objects.create(
+                name=f'Продукт "{i}"\t\x01', model="Модель", release_date="2020-10-01"
+            )
+            for i in range(3)
+        ]
+        self.factory = NetworkLink.objects.create(
+            name="Завод \u2029", email="factory@example.com", address=address
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail\\\n",
+            email="retail@example.com",
+            address=address,
+            supplier=self.factory,
+            debt_to_supplier=Decimal("1234.50"),
+        )
+        self.retail.products.set(products)
+        NetworkLink.objects.create(name="Без адреса", email="empty@example.com")
+        self.url = reverse("chain:network_link-list")
+
+    def get_links(self):
+        queryset = NetworkLink.objects.select_related("address").prefetch_related(
+            "products__network_links"
+        )
+        return list(queryset.order_by("id"))
+
+    def test_compiled_serializer(self):
+        """Тестируем совпадение скомпилированного сериализатора с DRF."""
+        links = self.get_links()
+        for fields, expand in (
+            (None, ()),
+            ({"id", "name", "level"}, ()),
+            ({"address", "products", "supplier"}, ()),
+            ({"id", "debt_to_supplier", "created_at"}, {"address", "products"}),
+        ):
+            expected = NetworkLinkSerializer(
+                links, many=True, fields=fields, expand=expand
+            ).data
+            compiled = get_compiled_network_link_serializer(
+                fields and frozenset(fields), frozenset(expand)
+            )
+            # Продукты и их звенья берутся из кэша предвыборки
+            with self.assertNumQueries(0):
+                data = compiled.many(links)
+            self.assertEqual(data, expected)
+
+    def test_fast_renderer(self):
+        """Тестируем совпадение FastJSONRenderer с JSONRenderer байт в байт."""
+        data = NetworkLinkSerializer(self.get_links(), many=True).data
+        extra = {
+            "decimal": Decimal("1.10"),
+            "datetime": self.retail.created_at,
+            "date": self.retail.created_at.date(),
+            "nested": [None, True, 1, "\u2028\x1f\x7f"],
+        }
+        for value in (data, extra):
+            self.assertEqual(
+                FastJSONRenderer().render(value), JSONRenderer().render(value)
+            )
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=4"),
+            JSONRenderer().render(data, "application/json; indent=4"),
+        )
+
+    def test_same_responses(self):
+        """Тестируем совпадение ответов API с быстрым путем и без него."""
+        requests = [
+            (self.url, {}),
+            (self.url, {"fields": "id,name,products", "expand": "address"}),
+            (self.url, {"stream": "ndjson"}),
+            (reverse("chain:network_link-detail", args=[self.retail.id]), {}),
+        ]
+        for url, data in requests:
+            responses = []
+            for fast in (True, False):
+                cache.get_cache().clear()
+                with override_settings(CHAIN_FAST_SERIALIZATION=fast):
+                    response = self.client.get(url, data)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                responses.append(response.getvalue())
+            self.assertEqual(responses[0], responses[1])
+
+    def test_empty_fields(self):
+        """Тестируем пустой ?fields= в быстром пути."""
+        response = self.client.get(self.url, {"fields": ""})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"], [{}, {}, {}])
+
+    def test_benchmark_command(self):
+        """Тестируем микробенчмарк сериализации."""
+        out = StringIO()
+        call_command(
+            "benchmark_serialization",
+            links=20,
+            products_per_link=2,
+            repeat=1,
+            stdout=out,
+        )
+        self.assertIn("total.fast", out.getvalue())
+        self.assertEqual(NetworkLink.objects.count(), 3)
+
+
+class ReportTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=self.user)
+        moscow = Address.objects.create(
+            country="Россия", city="Москва", street="Ленина", house_number="1"
+        )
+        berlin = Address.objects.create(
+            country="Germany", city="Berlin", street="Main", house_number="2"
+        )
+        self.products = [
+            Product.objects.create(
+                name=f"Product {i}", model="Model", release_date="2020-10-01"
+            )
+            for i in range(3)
+        ]
+        self.factory = NetworkLink.objects.create(
+            name="Factory",
+            network_type="factory",
+            email="factory@example.com",
+            address=berlin,
+        )
+        self.retail = NetworkLink.objects.create(
+            name="Retail",
+            email="retail@example.com",
+            address=moscow,
+            supplier=self.factory,
+            debt_to_supplier=Decimal("100.50"),
+        )
+        self.shop = NetworkLink.objects.create(
+            name="Shop",
+            network_type="individual",
+            email="shop@example.com",
+            address=moscow,
+            supplier=self.retail,
+            debt_to_supplier=Decimal("20.25"),
+        )
+        NetworkLink.objects.create(name="Без адреса", email="empty@example.com")
+        self.factory.products.set(self.products)
+        self.retail.products.set(self.products[:2])
+        self.shop.products.set(self.products[1:2])
+
+    def test_reports(self):
+        """Тестируем группировки отчетов."""
+        response = self.client.get(reverse("chain:report-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = {name: report["results"] for name, report in response.data.items()}
+        self.assertEqual(
+            data["debt_by_country"],
+            [
+                {"country": "", "links": 1, "debt": "0.00"},
+                {"country": "Germany", "links": 1, "debt": "0.00"},
+                {"country": "Россия", "links": 2, "debt": "120.75"},
+            ],
+        )
+        self.assertEqual(
+            data["debt_by_network_type"],
+            [
+                {"network_type": "factory", "links": 1, "debt": "0.00"},
+                {"network_type": "individual", "links": 1, "debt": "20.25"},
+                {"network_type": "retail", "links": 2, "debt": "100.50"},
+            ],
+        )
+        self.assertEqual(
+            data["debt_by_level"],
+            [{"level": 1, "debt": "100.50"}, {"level": 2, "debt": "20.25"}],
+        )
+        self.assertEqual(
+            data["product_coverage_by_city"],
+            [
+                {"country": "", "city": "", "links": 1, "products": 0},
+                {"country": "Germany", "city": "Berlin", "links": 1, "products": 3},
+                {"country": "Россия", "city": "Москва", "links": 2, "products": 2},
+            ],
+        )
+        self.assertEqual(response.data["debt_by_level"]["source"], "live")
+
+    @override_settings(CACHES=CHAIN_LOCMEM_CACHES)
+    def test_cache(self):
+        """Тестируем кэширование отчета до изменения звеньев."""
+        url = reverse("chain:report-detail", args=["debt_by_country"])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        DebtTransaction.objects.post(
+            [DebtTransaction(link_id=self.factory.id, amount=Decimal("5.00"))]
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.data["results"][1]["debt"], "5.00")
+
+    def test_errors(self):
+        """Тестируем неизвестный отчет, доступ и команду обновления без PostgreSQL."""
+        url = reverse("chain:report-detail", args=["unknown"])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse("chain:report-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_command_requires_postgresql(self):
+        """Тестируем ошибку команды обновления отчетов не в PostgreSQL."""
+        with mock.patch.object(connection, "vendor", "sqlite"):
+            with self.assertRaises(CommandError):
+                call_command("refresh_reports", stdout=StringIO())
+
+    def assertTablesMatch(self):
+        for name, report in reports.REPORTS.items():
+            if report["table"]:
+                self.assertEqual(
+                    reports.build_report(name, "live", reports.read_table(name)),
+                    reports.build_report(name, "live", report["query"]()),
+                    name,
+                )
+
+    @skipUnless(connection.vendor == "postgresql", "Только PostgreSQL")
+    def test_tables_follow_changes(self):
+        """Тестируем инкрементальное обновление таблиц отчетов триггерами."""
+        self.assertTablesMatch()
+        kazan = Address.objects.create(
+            country="Россия", city="Казань", street="Баумана", house_number="3"
+        )
+        kiosk = NetworkLink.objects.create(
+            name="Kiosk", email="kiosk@example.com", address=kazan, supplier=self.shop
+        )
+        kiosk.products.set(self.products)
+        DebtTransaction.objects.post(
+            [
+                DebtTransaction(link_id=kiosk.id, amount=Decimal("7.00")),
+                DebtTransaction(link_id=self.retail.id, amount=Decimal("-0.50")),
+            ]
+        )
+        self.assertTablesMatch()
+
+        # Смена адреса и типа звена, города у адреса, связей с продуктами
+        self.shop.address = kazan
+        self.shop.network_type = "retail"
+        self.shop.save()
+        Address.objects.filter(pk=kazan.pk).update(city="Москва")
+        self.retail.products.remove(self.products[0])
+        self.products[1].network_links.clear()
+        self.assertTablesMatch()
+
+        # Удаление продукта, звена и адреса вместе с его звеньями
+        self.products[2].delete()
+        kiosk.delete()
+        self.factory.address.delete()
+        self.assertTablesMatch()
+        self.assertNotIn(
+            "Germany",
+            [row["country"] for row in reports.read_table("debt_by_country")],
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "Только PostgreSQL")
+    def test_refresh_command(self):
+        """Тестируем пересчет таблиц отчетов командой и чтение из них."""
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM chain_report_debt_by_country")
+        call_command("refresh_reports", stdout=StringIO())
+        self.assertTablesMatch()
+        with override_settings(CHAIN_REPORTS_MATERIALIZED=True):
+            response = self.client.get(reverse("chain:report-list"))
+        self.assertEqual(response.data["debt_by_country"]["source"], "materialized")
+        self.assertEqual(len(response.data["debt_by_country"]["results"]), 3)
+        self.assertEqual(response.data["debt_by_level"]["source"], "live")
@@ -1,11 +1,44 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
 from chain.apps import ChainConfig
-from chain.views import NetworkLinkViewSet
+from chain.async_views import AsyncNetworkLinkView
+from chain.views import (DebtLevelTotalViewSet, DebtTransactionViewSet,
+                         NetworkLinkViewSet, ProductViewSet, ReportViewSet)
 
 app_name = ChainConfig.name
 
 router = DefaultRouter()
 router.register(r"network_links", NetworkLinkViewSet, basename="network_link")
+router.register(r"products", ProductViewSet, basename="product")
+router.register(
+    r"debt_transactions", DebtTransactionViewSet, basename="debt_transaction"
+)
+router.register(r"debt_levels", DebtLevelTotalViewSet, basename="debt_level")
+router.register(r"reports", ReportViewSet, basename="report")
 
-urlpatterns = router.urls
+# Асинхронный (ASGI) путь чтения звеньев с теми же ответами, что и у network_links
+async_urlpatterns = [
+    path(
+        "async/network_links/",
+        AsyncNetworkLinkView.as_view(action="list"),
+        name="async_network_link-list",
+    ),
+    path(
+        "async/network_links/<int:pk>/",
+        AsyncNetworkLinkView.as_view(action="retrieve"),
+        name="async_network_link-detail",
+    ),
+    path(
+        "async/network_links/<int:pk>/descendants/",
+        AsyncNetworkLinkView.as_view(action="descendants"),
+        name="async_network_link-descendants",
+    ),
+    path(
+        "async/network_links/<int:pk>/ancestors/",
+        AsyncNetworkLinkView.as_view(action="ancestors"),
+        name="async_network_link-ancestors",
+    ),
+]
+
+urlpatterns = router.urls + async_urlpatterns
@@ -0,0 +1,83 @@
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Case, Value, When
+
+ADDRESS_FIELDS = ("country", "city", "street", "house_number")
+
+
+def normalize_address_value(value):
+    """Убирает лишние пробелы в начале, конце и внутри значения поля адреса."""
+    return " ".join(str(value).split())
+
+
+def normalize_address(data):
+    """Возвращает нормализованные поля адреса в виде словаря."""
+    return {field: normalize_address_value(data[field]) for field in ADDRESS_FIELDS}
+
+
+def merge_duplicate_addresses(address_model, link_model, batch_size=1000, log=None):
+    """Объединяет адреса, совпадающие после нормализации.
+    Звенья сети переводятся на адрес с наименьшим id, дубликаты удаляются.
+    Каждая порция из `batch_size` дубликатов обрабатывается в своей транзакции.
+    Модели передаются параметрами (миграция 0014 использует копию функции).
+    Возвращает количество удаленных дубликатов.
+    """
+    canonical = {}  # нормализованный адрес -> id основного адреса
+    duplicates = {}  # id дубликата -> id основного адреса
+    to_normalize = []
+    merged = 0
+
+    def flush():
+        nonlocal merged
+        if not duplicates:
+            return
+        with transaction.atomic():
+            link_model.objects.filter(address_id__in=duplicates).update(
+                address_id=Case(
+                    *[
+                        When(address_id=duplicate_id, then=Value(canonical_id))
+                        for duplicate_id, canonical_id in duplicates.items()
+                    ]
+                )
+            )
+            address_model.objects.filter(pk__in=duplicates).delete()
+        merged += len(duplicates)
+        if log:
+            log(f"Объединено дубликатов адресов: {merged}")
+        duplicates.clear()
+
+    rows = address_model.objects.order_by("pk").values_list("pk", *ADDRESS_FIELDS)
+    for pk, *values in rows.iterator(chunk_size=batch_size):
+        key = tuple(normalize_address_value(value) for value in values)
+        if key in canonical:
+            duplicates[pk] = canonical[key]
+            if len(duplicates) >= batch_size:
+                flush()
+        else:
+            canonical[key] = pk
+            if key != tuple(values):
+                to_normalize.append(pk)
+    flush()
+
+    # Нормализуем оставшиеся адреса: дубликатов у них уже нет
+    for start in range(0, len(to_normalize), batch_size):
+        addresses = list(
+            address_model.objects.filter(
+                pk__in=to_normalize[start : start + batch_size]
+            )
+        )
+        for address in addresses:
+            for field in ADDRESS_FIELDS:
+                setattr(
+                    address, field, normalize_address_value(getattr(address, field))
+                )
+        address_model.objects.bulk_update(addresses, ADDRESS_FIELDS)
+    return merged
+
+
+def reset_sequences(*models):
+    """Сдвигает последовательности id после вставки с явными ключами."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
@@ -1,8 +1,35 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import http_date, quote_etag
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.mixins import CreateModelMixin, ListModelMixin
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.viewsets import GenericViewSet, ModelViewSet, ViewSet
 
-from chain.models import NetworkLink
-from chain.serializers import NetworkLinkSerializer
+from chain import cache, reports
+from chain.filters import NetworkLinkFilterBackend, ProductFilterBackend
+from chain.models import DebtLevelTotal, DebtTransaction, NetworkLink, Product
+from chain.parsers import NDJSONParser
+from chain.renderers import FastJSONRenderer
+from chain.serializers import (DebtLevelTotalSerializer,
+                               DebtTransactionSerializer,
+                               NetworkLinkBulkSerializer,
+                               NetworkLinkSerializer, ProductAssignSerializer,
+                               ProductSerializer,
+                               get_compiled_network_link_serializer)
 from users.permissions import IsActiveEmployee
 
 
@@ -10,16 +37,280 @@ class NetworkLinkViewSet(ModelViewSet):
     queryset = NetworkLink.objects.all()
     serializer_class = NetworkLinkSerializer
     permission_classes = [IsActiveEmployee]
+    filter_backends = [NetworkLinkFilterBackend]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    # Поля для сортировки списка через ?ordering= (см. KeysetPagination)
+    ordering_fields = ("product_count", "client_count", "subtree_debt")
+    # Только канонический id: "012" и "12" - один ключ кэша звена
+    lookup_value_regex = "[1-9][0-9]*"
+
+    # Параметр запроса для потоковой выгрузки всех звеньев в формате NDJSON
+    stream_query_param = "stream"
+    stream_chunk_size = 2000
+
+    # Параметр запроса для ограничения глубины обхода иерархии
+    depth_field = serializers.IntegerField(min_value=0, required=False)
+
+    # Максимальное число звеньев в одном запросе массового создания
+    bulk_max_items = 10000
+
+    # Параметры запроса для выбора выводимых полей и раскрытия вложенных объектов
+    fields_query_param = "fields"
+    expand_query_param = "expand"
 
     def get_queryset(self):
-        """Добавлена возможность фильтрации объектов по определенной стране
-        (если передан параметр `country`).
+        """Адрес подгружается через JOIN, продукты и их звенья - предвыборкой,
+        поэтому число запросов не зависит от количества звеньев.
+        При выборе полей (`?fields=`) читаются только нужные столбцы, а JOIN
+        и предвыборка выполняются только для раскрытых объектов.
         """
         queryset = super().get_queryset()
-        country = self.request.query_params.get("country")
-        if country:
-            queryset = queryset.filter(country=country)
-        return queryset
+        if self.sparse_fieldset is None:
+            queryset = queryset.select_related("address")
+        else:
+            fields, expand = self.sparse_fieldset
+            if "address" in expand:
+                queryset = queryset.select_related("address")
+            queryset = queryset.only(*self.get_sparse_columns(fields))
+        return queryset.prefetch_related(*self.get_prefetch_lookups())
+
+    def get_sparse_columns(self, fields):
+        """Столбцы для выбранных полей: кроме них нужны id и updated_at (ETag)
+        и поля сортировки (курсор пагинации).
+        """
+        ordering = self.paginator.get_ordering(self.request, self)
+        columns = {"id", "updated_at", *(field.lstrip("-") for field in ordering)}
+        columns.update(field for field in fields if field != "products")
+        return sorted(columns)
+
+    def get_prefetch_lookups(self):
+        # Продукты и их звенья упорядочены по id: ответ и его ETag стабильны
+        if self.sparse_fieldset is not None:
+            fields, expand = self.sparse_fieldset
+            if "products" not in fields:
+                return []
+            if "products" not in expand:
+                # Для вывода нужны только id продуктов
+                return [
+                    Prefetch(
+                        "products", queryset=Product.objects.only("id").order_by("id")
+                    )
+                ]
+        return [
+            Prefetch(
+                "products",
+                queryset=Product.objects.order_by("id").prefetch_related(
+                    Prefetch(
+                        "network_links",
+                        queryset=NetworkLink.objects.only("id").order_by("id"),
+                    )
+                ),
+            )
+        ]
+
+    @cached_property
+    def sparse_fieldset(self):
+        """Выводимые поля из `?fields=` и раскрываемые объекты из `?expand=`
+        (поля через запятую) для запросов на чтение. Раскрытый объект выводится
+        и без упоминания в `?fields=`. Без `?fields=` (None) выводятся все поля
+        с вложенными адресом и продуктами.
+        """
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+        fields = self.get_list_param(
+            self.fields_query_param, NetworkLinkSerializer.Meta.fields
+        )
+        if fields is None:
+            return None
+        expand = self.get_list_param(
+            self.expand_query_param, NetworkLinkSerializer.expandable_fields
+        )
+        return fields | (expand or set()), expand or set()
+
+    def get_list_param(self, name, choices):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        values = {item.strip() for item in value.split(",") if item.strip()}
+        unknown = values - set(choices)
+        if unknown:
+            raise serializers.ValidationError(
+                {name: f"Неизвестные поля: {', '.join(sorted(unknown))}."}
+            )
+        return values
+
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fieldset is not None:
+            kwargs["fields"], kwargs["expand"] = self.sparse_fieldset
+        return super().get_serializer(*args, **kwargs)
+
+    def serialize(self, instance, many=False):
+        """Данные ответа на чтение. При CHAIN_FAST_SERIALIZATION они строятся
+        скомпилированным сериализатором - так же, как NetworkLinkSerializer,
+        но без накладных расходов DRF на каждое поле.
+        """
+        if not settings.CHAIN_FAST_SERIALIZATION:
+            return self.get_serializer(instance, many=many).data
+        fields, expand = self.sparse_fieldset or (None, ())
+        serializer = get_compiled_network_link_serializer(
+            None if fields is None else frozenset(fields), frozenset(expand)
+        )
+        return serializer.many(instance) if many else serializer(instance)
+
+    def list(self, request, *args, **kwargs):
+        """Возвращает страницу звеньев сети или, при `?stream=ndjson`,
+        потоковую выгрузку всех звеньев (по одному JSON-объекту на строку).
+        """
+        if request.query_params.get(self.stream_query_param) == "ndjson":
+            return self.stream_ndjson()
+        return self.cached_list_response(
+            lambda: self.filter_queryset(self.get_queryset())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Данные звена берутся из кэша; запросы с фильтрами кэш не используют.
+        Поддерживаются условные запросы (If-None-Match / If-Modified-Since).
+        """
+        pk = int(kwargs["pk"])
+        use_cache = not request.query_params
+        entry = cache.get_detail(pk) if use_cache else None
+        if entry is None:
+            # Продукты подгружаются только если ответ не 304
+            queryset = self.filter_queryset(self.get_queryset().prefetch_related(None))
+            instance = get_object_or_404(queryset, pk=pk)
+            self.check_object_permissions(request, instance)
+            entry = self.get_validators([instance])
+            not_modified = self.get_not_modified_response(entry)
+            if not_modified:
+                return not_modified
+            prefetch_related_objects([instance], *self.get_prefetch_lookups())
+            entry["data"] = self.serialize(instance)
+            if use_cache:
+                cache.set_detail(pk, entry)
+        else:
+            not_modified = self.get_not_modified_response(entry)
+            if not_modified:
+                return not_modified
+        return self.set_validator_headers(Response(entry["data"]), entry)
+
+    def cached_list_response(self, get_queryset):
+        """Возвращает закэшированную страницу списка или строит и кэширует новую.
+        Поддерживаются условные запросы (If-None-Match / If-Modified-Since).
+        """
+        key = cache.get_list_key(self.request.get_full_path())
+        entry = cache.get_list(key)
+        if entry is None:
+            # Продукты подгружаются только если ответ не 304
+            page = self.paginate_queryset(get_queryset().prefetch_related(None))
+            entry = self.get_validators(page, self.paginator.get_next_link())
+            not_modified = self.get_not_modified_response(entry)
+            if not_modified:
+                return not_modified
+            prefetch_related_objects(page, *self.get_prefetch_lookups())
+            entry["data"] = self.get_paginated_response(
+                self.serialize(page, many=True)
+            ).data
+            cache.set_list(key, entry)
+        else:
+            not_modified = self.get_not_modified_response(entry)
+            if not_modified:
+                return not_modified
+        return self.set_validator_headers(Response(entry["data"]), entry)
+
+    def get_validators(self, instances, next_link=None):
+        """Строит ETag и Last-Modified по id и updated_at звеньев без сериализации.
+        Для страницы списка в ETag входит и ссылка на следующую страницу.
+        """
+        versions = [self.request.get_full_path(), next_link or ""]
+        versions.extend(f"{obj.pk}:{obj.updated_at.isoformat()}" for obj in instances)
+        last_modified = max((obj.updated_at for obj in instances), default=None)
+        return {
+            "etag": quote_etag(hashlib.md5("|".join(versions).encode()).hexdigest()),
+            "last_modified": last_modified and int(last_modified.timestamp()),
+        }
+
+    def get_not_modified_response(self, entry):
+        return get_conditional_response(
+            self.request, etag=entry["etag"], last_modified=entry["last_modified"]
+        )
+
+    @staticmethod
+    def set_validator_headers(response, entry):
+        response["ETag"] = entry["etag"]
+        if entry["last_modified"] is not None:
+            response["Last-Modified"] = http_date(entry["last_modified"])
+        return response
+
+    def stream_ndjson(self):
+        """Выгружает звенья серверным курсором порциями по `stream_chunk_size`,
+        поэтому расход памяти не зависит от размера таблицы.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by(
+            *self.pagination_class.ordering
+        )
+
+        def rows():
+            for instance in queryset.iterator(chunk_size=self.stream_chunk_size):
+                data = self.serialize(instance)
+                yield json.dumps(data, cls=JSONEncoder, ensure_ascii=False) + "\n"
+
+        return StreamingHttpResponse(rows(), content_type="application/x-ndjson")
+
+    @action(detail=False, methods=["post"], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Массовое создание звеньев сети из JSON-массива или NDJSON.
+        Все звенья создаются в одной транзакции; при ошибках возвращается
+        список ошибок по позициям, и ничего не создается.
+        """
+        serializer = NetworkLinkBulkSerializer(
+            data=request.data, many=True, max_length=self.bulk_max_items
+        )
+        serializer.is_valid(raise_exception=True)
+        links = serializer.save()
+        return Response(
+            {"created": [link.id for link in links]}, status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True)
+    def descendants(self, request, pk=None):
+        """Все клиенты звена (поддерево) с фильтрами, пагинацией и `?depth=`."""
+        return self.cached_list_response(
+            lambda: self.filter_queryset(
+                self.get_queryset().descendants_of(
+                    self.get_hierarchy_root(), depth=self.get_depth()
+                )
+            )
+        )
+
+    @action(detail=True)
+    def ancestors(self, request, pk=None):
+        """Цепочка поставщиков звена с фильтрами, пагинацией и `?depth=`."""
+        return self.cached_list_response(
+            lambda: self.filter_queryset(
+                self.get_queryset().ancestors_of(
+                    self.get_hierarchy_root(), depth=self.get_depth()
+                )
+            )
+        )
+
+    def get_hierarchy_root(self):
+        """Возвращает звено, от которого строится обход иерархии.
+        Фильтры запроса к нему не применяются - они относятся к результату.
+        """
+        root = get_object_or_404(
+            NetworkLink.objects.only("id", "path", "level"), pk=self.kwargs["pk"]
+        )
+        self.check_object_permissions(self.request, root)
+        return root
+
+    def get_depth(self):
+        depth = self.request.query_params.get("depth")
+        if depth in (None, ""):
+            return None
+        try:
+            return self.depth_field.run_validation(depth)
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({"depth": exc.detail})
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop("partial", False)
@@ -27,4 +318,98 @@ class NetworkLinkViewSet(ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
+
+        # Продукты перечитываются предвыборкой, чтобы в ответе были актуальные
+        # данные, а число запросов не зависело от числа продуктов
+        instance._prefetched_objects_cache = {}
+        prefetch_related_objects([instance], *self.get_prefetch_lookups())
+
         return Response(serializer.data)
+
+
+class ProductViewSet(ModelViewSet):
+    """Каталог продуктов: поиск `?search=` по названию и модели, фильтры
+    `release_date_from`/`release_date_to` и `network_link`, курсорная пагинация
+    по id или по дате выхода (`?ordering=release_date`).
+    """
+
+    serializer_class = ProductSerializer
+    permission_classes = [IsActiveEmployee]
+    filter_backends = [ProductFilterBackend]
+    ordering_fields = ("release_date",)
+    pagination_ordering = ("id",)
+
+    def get_queryset(self):
+        # Для вывода нужны только id звеньев - одним дополнительным запросом
+        return Product.objects.prefetch_related(
+            Prefetch(
+                "network_links", queryset=NetworkLink.objects.only("id").order_by("id")
+            )
+        )
+
+    @action(detail=False, methods=["post"])
+    def assign(self, request):
+        """Массово связывает продукты `products` со звеньями `network_links`."""
+        serializer = ProductAssignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created = serializer.save()
+        return Response({"created": created}, status=status.HTTP_200_OK)
+
+
+class DebtTransactionViewSet(CreateModelMixin, ListModelMixin, GenericViewSet):
+    """Журнал задолженности: список проводок (`?link=<id>` - по звену)
+    и загрузка проводок - одной или пачкой (JSON-массив или NDJSON).
+    """
+
+    queryset = DebtTransaction.objects.all()
+    serializer_class = DebtTransactionSerializer
+    permission_classes = [IsActiveEmployee]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    link_field = serializers.IntegerField(min_value=1)
+
+    # Максимальное число проводок в одном запросе
+    bulk_max_items = 10000
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        link = self.request.query_params.get("link")
+        if link not in (None, ""):
+            try:
+                link = self.link_field.run_validation(link)
+            except serializers.ValidationError as exc:
+                raise serializers.ValidationError({"link": exc.detail})
+            queryset = queryset.filter(link_id=link)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if isinstance(kwargs.get("data"), list):
+            kwargs.update(many=True, max_length=self.bulk_max_items)
+        return super().get_serializer(*args, **kwargs)
+
+
+class DebtLevelTotalViewSet(ListModelMixin, GenericViewSet):
+    """Суммарная задолженность по уровням иерархии (итоги хранятся в БД)."""
+
+    queryset = DebtLevelTotal.objects.all()
+    serializer_class = DebtLevelTotalSerializer
+    permission_classes = [IsActiveEmployee]
+    pagination_class = None
+
+
+class ReportViewSet(ViewSet):
+    """Отчеты по сети поставок, посчитанные группировкой в БД: задолженность
+    по странам, типам звеньев и уровням, охват продуктами по городам.
+    `/chain/reports/` - все отчеты, `/chain/reports/<название>/` - один.
+    """
+
+    permission_classes = [IsActiveEmployee]
+    lookup_value_regex = "[a-z_]+"
+
+    def list(self, request):
+        return Response({name: reports.get_report(name) for name in reports.REPORTS})
+
+    def retrieve(self, request, pk=None):
+        if pk not in reports.REPORTS:
+            raise NotFound(f"Неизвестный отчет: {pk}.")
+        return Response(reports.get_report(pk))
@@ -61,14 +61,21 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication"
+        "users.authentication.EmployeeJWTAuthentication"
     ],
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
+    "DEFAULT_PAGINATION_CLASS": "chain.paginators.KeysetPagination",
+    "PAGE_SIZE": 100,
 }
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
+# Быстрый режим JWT: пользователь берется из утверждений токена без запроса к БД,
+# а деактивация, удаление и смена is_staff проверяются по кэшу активных пользователей
+# в памяти процесса, который перечитывается из БД не чаще раза в JWT_REVOCATION_TTL секунд
+JWT_STATELESS_AUTH = os.getenv("JWT_STATELESS_AUTH") == "1"
+JWT_REVOCATION_TTL = 30
 
 DATABASES = {
     "default": {
@@ -81,6 +88,34 @@ DATABASES = {
     }
 }
 
+# Кэш сериализованных звеньев сети. Бэкенд задается через .env и должен быть общим
+# для всех процессов сервера, например django.core.cache.backends.redis.RedisCache
+# и redis://localhost:6379: кэш сбрасывается только в процессе, изменившем звенья,
+# поэтому LocMemCache подходит лишь для одного процесса. По умолчанию кэш выключен
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "chain": {
+        "BACKEND": os.getenv("CHAIN_CACHE_BACKEND")
+        or "django.core.cache.backends.dummy.DummyCache",
+        "LOCATION": os.getenv("CHAIN_CACHE_LOCATION") or "chain",
+    },
+}
+CHAIN_CACHE_ALIAS = "chain"
+CHAIN_CACHE_TIMEOUT = 300
+
+# Размер пакета (и транзакции) при очистке задолженности из админки
+CHAIN_CLEAR_DEBT_BATCH_SIZE = 1000
+
+# Ответы API звеньев на чтение строятся скомпилированным сериализатором
+# (вывод тот же, что у NetworkLinkSerializer)
+CHAIN_FAST_SERIALIZATION = True
+
+# Отчеты (/chain/reports/) из таблиц PostgreSQL, которые триггеры обновляют
+# инкрементально при каждой записи в звенья, адреса и связи продуктов
+CHAIN_REPORTS_MATERIALIZED = os.getenv("CHAIN_REPORTS_MATERIALIZED") == "1"
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
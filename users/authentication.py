@@ -0,0 +1,178 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Утверждения токена, по которым работает быстрый режим (см. EmployeeTokenObtainPairSerializer)
+IS_ACTIVE_CLAIM = "is_active"
+STAFF_CLAIM = "is_staff"
+
+
+class ActiveUsers:
+    """Кэш активных пользователей в памяти процесса: id -> is_staff.
+    Перечитывается из БД не чаще раза в JWT_REVOCATION_TTL секунд, а изменения
+    пользователей в этом же процессе применяются сразу (см. users/signals.py).
+    Пользователь, которого нет в кэше (создан в другом процессе после загрузки),
+    читается из БД; деактивированные и удаленные хранятся как None.
+    """
+
+    def __init__(self):
+        self.staff = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        return (
+            self.loaded_at is None
+            or time.monotonic() - self.loaded_at >= settings.JWT_REVOCATION_TTL
+        )
+
+    @staticmethod
+    def get_queryset():
+        return (
+            get_user_model()
+            .objects.filter(is_active=True)
+            .values_list("pk", "is_staff")
+        )
+
+    def refresh(self):
+        if self.is_stale():
+            with self.lock:
+                if self.is_stale():
+                    self.set(self.get_queryset())
+
+    async def arefresh(self):
+        if self.is_stale():
+            self.set([row async for row in self.get_queryset()])
+
+    def get(self, user_id):
+        """is_staff активного пользователя или None."""
+        self.refresh()
+        try:
+            return self.staff[user_id]
+        except KeyError:
+            return self.load(user_id, self.get_queryset().filter(pk=user_id).first())
+
+    async def aget(self, user_id):
+        await self.arefresh()
+        try:
+            return self.staff[user_id]
+        except KeyError:
+            return self.load(
+                user_id, await self.get_queryset().filter(pk=user_id).afirst()
+            )
+
+    def load(self, user_id, row):
+        is_staff = None if row is None else row[1]
+        self.update(user_id, is_staff)
+        return is_staff
+
+    def set(self, rows):
+        self.staff = dict(rows)
+        self.loaded_at = time.monotonic()
+
+    def update(self, user_id, is_staff):
+        """is_staff=None отзывает токены пользователя (деактивирован или удален)."""
+        self.staff = {**self.staff, user_id: is_staff}
+
+    def clear(self):
+        self.staff = {}
+        self.loaded_at = None
+
+
+active_users = ActiveUsers()
+
+
+class EmployeeJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация сотрудников.
+    При JWT_STATELESS_AUTH пользователь строится из утверждений токена
+    (TokenUser) без запроса к БД, а деактивация, удаление и смена is_staff
+    проверяются по active_users. is_superuser в токен не пишется, и TokenUser
+    считает его False. Токены без утверждения is_active проверяются обычным способом.
+    """
+
+    def get_user(self, validated_token):
+        if not self.is_stateless(validated_token):
+            return super().get_user(validated_token)
+        user_id = self.get_user_id(validated_token)
+        return self.get_token_user(validated_token, active_users.get(user_id))
+
+    @staticmethod
+    def is_stateless(validated_token):
+        return settings.JWT_STATELESS_AUTH and IS_ACTIVE_CLAIM in validated_token
+
+    @staticmethod
+    def get_user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    @staticmethod
+    def get_token_user(validated_token, is_staff):
+        """TokenUser, если пользователь активен и его is_staff совпадает с токеном."""
+        if not validated_token[IS_ACTIVE_CLAIM] or is_staff is None:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if validated_token.get(STAFF_CLAIM, False) != is_staff:
+            raise AuthenticationFailed(
+                "Права пользователя изменились, войдите заново.",
+                code="user_permissions_changed",
+            )
+
+        return api_settings.TOKEN_USER_CLASS(validated_token)
+
+
+class AsyncJWTAuthentication(EmployeeJWTAuthentication):
+    """JWT-аутентификация для асинхронных представлений.
+    Токен проверяется без обращения к БД, пользователь загружается асинхронным ORM
+    (в быстром режиме - берется из токена).
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """Асинхронный вариант get_user с теми же проверками."""
+        user_id = self.get_user_id(validated_token)
+        if self.is_stateless(validated_token):
+            return self.get_token_user(
+                validated_token, await active_users.aget(user_id)
+            )
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.db import connections
+
+# Меньше этого числа пароли хэшируются в текущем процессе: запуск пула дороже
+POOL_MIN_PASSWORDS = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """Настраивает Django в процессе пула и закрывает соединения с БД,
+    если процесс получил их от родителя: хэшированию они не нужны.
+    """
+    django.setup()
+    connections.close_all()
+
+
+def get_pool():
+    """Возвращает общий пул процессов, создавая его при первом вызове.
+    Процессы запускаются через spawn, а не fork: копия процесса сервера
+    со всеми потоками и открытыми соединениями не создается на каждый импорт.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def hash_passwords(passwords, workers=None):
+    """Хэширует пароли (make_password) в общем пуле процессов - по одному на ядро.
+    Хэширование намеренно медленное и упирается в процессор, поэтому потоки
+    из-за GIL не помогают. Пустой пароль (None) дает непригодный для входа хэш.
+    `workers` - на сколько процессов рассчитано деление паролей на части.
+    """
+    passwords = list(passwords)
+    workers = min(workers or os.cpu_count() or 1, len(passwords))
+    if workers < 2 or len(passwords) < POOL_MIN_PASSWORDS:
+        return [make_password(password) for password in passwords]
+
+    # Процессы пула читают настройки заново, поэтому хэшер передается явно
+    hasher = partial(make_password, hasher=get_hasher())
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(get_pool().map(hasher, passwords, chunksize=chunksize))
@@ -0,0 +1,73 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from users.serializers import UserImportSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Массовая регистрация сотрудников из CSV (с заголовком) или NDJSON: "
+        "email, password, first_name, last_name, is_active, is_staff. "
+        "Пароли хэшируются в пуле процессов, пользователи создаются пачками "
+        "через bulk_create в одной транзакции."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Число процессов для хэширования паролей (по умолчанию - по числу ядер)",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        context = {"hash_workers": options["workers"]}
+        imported = 0
+        with path.open(encoding="utf-8", newline="") as file, transaction.atomic():
+            rows = self.read_rows(path, file)
+            while batch := list(islice(rows, options["batch_size"])):
+                serializer = UserImportSerializer(
+                    data=batch, many=True, context=context
+                )
+                if not serializer.is_valid():
+                    raise CommandError(self.format_errors(serializer.errors, imported))
+                imported += len(serializer.save())
+                self.stdout.write(f"Создано пользователей: {imported}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово, создано пользователей: {imported}")
+        )
+
+    @staticmethod
+    def read_rows(path, file):
+        if path.suffix.lower() == ".csv":
+            for row in csv.DictReader(file):
+                # Пустые ячейки CSV - незаданные поля
+                yield {key: value for key, value in row.items() if value != ""}
+            return
+        for number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise CommandError(f"Строка {number}: {exc}")
+
+    @staticmethod
+    def format_errors(errors, offset):
+        if not isinstance(errors, list):
+            return str(errors)
+        lines = [
+            f"Запись {offset + index + 1}: {error}"
+            for index, error in enumerate(errors)
+            if error
+        ]
+        return "Ничего не создано.\n" + "\n".join(lines)
@@ -2,7 +2,10 @@ from rest_framework.permissions import BasePermission
 
 
 class IsActiveEmployee(BasePermission):
-    """Проверяет, является ли пользователь (сотрудник) активным."""
+    """Проверяет, является ли пользователь (сотрудник) активным.
+    Читает только атрибуты уже загруженного пользователя и не обращается к БД,
+    поэтому безопасна и для асинхронных представлений (chain/async_views.py).
+    """
 
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.is_active
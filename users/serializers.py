@@ -1,5 +1,11 @@
-from rest_framework.serializers import ModelSerializer
+from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import make_password
+from rest_framework.serializers import (CharField, ListSerializer,
+                                        ModelSerializer, ValidationError)
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from users.authentication import IS_ACTIVE_CLAIM, STAFF_CLAIM
+from users.hashers import hash_passwords
 from users.models import User
 
 
@@ -7,3 +13,83 @@ class UserSerializer(ModelSerializer):
     class Meta:
         model = User
         fields = "__all__"
+
+    def create(self, validated_data):
+        # Пароль хэшируется до записи, чтобы пользователь сохранялся одним INSERT
+        validated_data["password"] = make_password(validated_data["password"])
+        return super().create(validated_data)
+
+
+class UserImportListSerializer(ListSerializer):
+    """Массовое создание пользователей: пароли хэшируются в пуле процессов
+    (число процессов - context["hash_workers"], по умолчанию по числу ядер),
+    пользователи сохраняются через bulk_create. Занятость почт проверяется
+    для всего списка одним запросом.
+    """
+
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        errors = [{} for _ in attrs]
+
+        emails = [item["email"] for item in attrs]
+        existing = set(
+            User.objects.filter(email__in=emails).values_list("email", flat=True)
+        )
+        seen = set()
+        for index, email in enumerate(emails):
+            if email in existing or email in seen:
+                errors[index]["email"] = ["Пользователь с такой почтой уже существует."]
+            seen.add(email)
+
+        if any(errors):
+            raise ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        passwords = hash_passwords(
+            [item.pop("password", None) for item in validated_data],
+            workers=self.context.get("hash_workers"),
+        )
+        return User.objects.bulk_create(
+            [
+                User(password=password, **item)
+                for item, password in zip(validated_data, passwords)
+            ]
+        )
+
+
+class UserImportSerializer(ModelSerializer):
+    password = CharField(
+        write_only=True, required=False, allow_null=True, trim_whitespace=False
+    )
+
+    class Meta:
+        model = User
+        list_serializer_class = UserImportListSerializer
+        fields = [
+            "id",
+            "email",
+            "password",
+            "first_name",
+            "last_name",
+            "is_active",
+            "is_staff",
+        ]
+        # Уникальность почты проверяет UserImportListSerializer
+        extra_kwargs = {"email": {"validators": []}}
+
+    def validate_email(self, value):
+        return BaseUserManager.normalize_email(value)
+
+
+class EmployeeTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Добавляет в токены данные, нужные для проверки прав без запроса к БД
+    (см. EmployeeJWTAuthentication)."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[IS_ACTIVE_CLAIM] = user.is_active
+        token["email"] = user.email
+        token[STAFF_CLAIM] = user.is_staff
+        return token
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.authentication import active_users
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+def update_active_users(sender, instance, **kwargs):
+    """Деактивация и смена is_staff действуют в этом процессе сразу,
+    не дожидаясь обновления кэша."""
+    active_users.update(instance.pk, instance.is_staff if instance.is_active else None)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user(sender, instance, **kwargs):
+    active_users.update(instance.pk, None)
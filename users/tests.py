@@ -0,0 +1,227 @@
+import tempfile
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import check_password
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users import hashers
+from users.authentication import active_users
+from users.hashers import POOL_MIN_PASSWORDS, hash_passwords
+from users.models import User
+
+
+@override_settings(JWT_STATELESS_AUTH=True)
+class StatelessJWTAuthTest(APITestCase):
+    def setUp(self):
+        active_users.clear()
+        self.user = User.objects.create(email="test@test.com", is_active=True)
+        self.user.set_password("password")
+        self.user.save()
+        response = self.client.post(
+            reverse("users:login"), {"email": "test@test.com", "password": "password"}
+        )
+        self.token = response.data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.url = reverse("chain:network_link-list")
+
+    def tearDown(self):
+        active_users.clear()
+
+    def test_login_claims(self):
+        """Тестируем утверждения в токене, выданном при входе."""
+        token = AccessToken(self.token)
+        self.assertIs(token["is_active"], True)
+        self.assertIs(token["is_staff"], False)
+        self.assertEqual(token["email"], "test@test.com")
+
+    def test_no_auth_queries(self):
+        """Тестируем аутентификацию без запросов к таблице пользователей."""
+        self.client.get(self.url)  # загрузка кэша неактивных пользователей
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            [q for q in context.captured_queries if "users_user" in q["sql"]]
+        )
+
+    def test_deactivation(self):
+        """Тестируем немедленный отказ в доступе после деактивации пользователя."""
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_without_signals(self):
+        """Тестируем деактивацию в обход save(): действует после обновления кэша."""
+        self.client.get(self.url)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with override_settings(JWT_REVOCATION_TTL=0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deletion_in_other_process(self):
+        """Тестируем отказ в доступе пользователю, удаленному в другом процессе."""
+        self.user.delete()
+        active_users.clear()  # кэш процесса, не получившего сигнал
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_change(self):
+        """Тестируем отказ в доступе по токену с устаревшим is_staff."""
+        self.client.get(self.url)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        with override_settings(JWT_REVOCATION_TTL=0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_created_after_load(self):
+        """Тестируем вход пользователя, созданного в обход save() после загрузки кэша."""
+        self.client.get(self.url)
+        User.objects.bulk_create([User(email="new@test.com")])
+        token = AccessToken.for_user(User.objects.get(email="new@test.com"))
+        token["is_active"], token["is_staff"] = True, False
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_async_view(self):
+        """Тестируем быстрый режим в асинхронном пути."""
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        async def request():
+            return await self.async_client.get(
+                reverse("chain:async_network_link-list"),
+                headers={"Authorization": f"Bearer {self.token}"},
+            )
+
+        response = async_to_sync(request)()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class UserImportTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create(
+            email="admin@test.com", is_active=True, is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse("users:import")
+
+    def test_register_single_write(self):
+        """Тестируем регистрацию одним запросом на запись."""
+        self.client.force_authenticate(user=None)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                reverse("users:register"),
+                {"email": "new@test.com", "password": "password"},
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        writes = [
+            q["sql"]
+            for q in context.captured_queries
+            if q["sql"].startswith(("INSERT", "UPDATE"))
+        ]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(
+            User.objects.get(email="new@test.com").check_password("password")
+        )
+
+    def test_import(self):
+        """Тестируем массовую регистрацию с хэшированием в пуле процессов."""
+        data = [
+            {"email": f"user{n}@Test.com", "password": f"password{n}"}
+            for n in range(10)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 10)
+        self.assertNotIn("password", response.data[0])
+        inserts = [q for q in context.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        user = User.objects.get(email="user3@test.com")
+        self.assertTrue(user.check_password("password3"))
+        self.assertFalse(user.is_staff)
+
+    def test_hash_passwords_pool(self):
+        """Тестируем хэширование паролей в пуле процессов."""
+        passwords = [f"password{n}" for n in range(POOL_MIN_PASSWORDS)]
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertEqual(len(set(hashes)), len(passwords))
+        for password, encoded in zip(passwords, hashes):
+            # Процессы пула хэшируют тем же хэшером, что и текущий процесс
+            self.assertTrue(encoded.startswith("md5$"))
+            self.assertTrue(check_password(password, encoded))
+        # Пул общий для всех вызовов и не копирует процесс через fork
+        pool = hashers.get_pool()
+        self.assertIs(hashers.get_pool(), pool)
+        self.assertEqual(pool._mp_context.get_start_method(), "spawn")
+
+    def test_import_duplicates(self):
+        """Тестируем отказ при занятых и повторяющихся почтах."""
+        data = [
+            {"email": "admin@test.com", "password": "password"},
+            {"email": "user@test.com", "password": "password"},
+            {"email": "user@test.com", "password": "password"},
+        ]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.data[0])
+        self.assertEqual(response.data[1], {})
+        self.assertIn("email", response.data[2])
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_import_permissions(self):
+        """Тестируем доступ к массовой регистрации только для персонала."""
+        user = User.objects.create(email="test@test.com", is_active=True)
+        self.client.force_authenticate(user=user)
+        response = self.client.post(self.url, [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_command(self):
+        """Тестируем команду импорта пользователей из CSV."""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as file:
+            file.write("email,password,first_name,is_staff\n")
+            for n in range(5):
+                file.write(f"user{n}@test.com,password{n},User,{n == 0}\n")
+            file.write("nopassword@test.com,,,\n")
+            file.flush()
+            call_command(
+                "import_users", file.name, batch_size=2, workers=2, stdout=StringIO()
+            )
+        self.assertEqual(User.objects.count(), 7)
+        self.assertTrue(User.objects.get(email="user0@test.com").is_staff)
+        self.assertTrue(
+            User.objects.get(email="user4@test.com").check_password("password4")
+        )
+        self.assertFalse(
+            User.objects.get(email="nopassword@test.com").has_usable_password()
+        )
+
+    def test_import_command_errors(self):
+        """Тестируем откат всего импорта при ошибке в записи."""
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as file:
+            file.write('{"email": "user@test.com", "password": "password"}\n')
+            file.write('{"email": "admin@test.com", "password": "password"}\n')
+            file.flush()
+            with self.assertRaisesMessage(CommandError, "Запись 2"):
+                call_command("import_users", file.name, batch_size=1, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 1)
@@ -4,15 +4,20 @@ from rest_framework_simplejwt.views import (TokenObtainPairView,
                                             TokenRefreshView)
 
 from users.apps import UsersConfig
-from users.views import UserCreateAPIView
+from users.serializers import EmployeeTokenObtainPairSerializer
+from users.views import UserCreateAPIView, UserImportAPIView
 
 app_name = UsersConfig.name
 
 urlpatterns = [
     path("register/", UserCreateAPIView.as_view(), name="register"),
+    path("import/", UserImportAPIView.as_view(), name="import"),
     path(
         "login/",
-        TokenObtainPairView.as_view(permission_classes=(AllowAny,)),
+        TokenObtainPairView.as_view(
+            serializer_class=EmployeeTokenObtainPairSerializer,
+            permission_classes=(AllowAny,),
+        ),
         name="login",
     ),
     path(
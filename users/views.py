@@ -1,8 +1,10 @@
 from rest_framework.generics import CreateAPIView
-from rest_framework.permissions import AllowAny
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import AllowAny, IsAdminUser
 
+from chain.parsers import NDJSONParser
 from users.models import User
-from users.serializers import UserSerializer
+from users.serializers import UserImportSerializer, UserSerializer
 
 
 class UserCreateAPIView(CreateAPIView):
@@ -13,6 +15,23 @@ class UserCreateAPIView(CreateAPIView):
     permission_classes = (AllowAny,)
 
     def perform_create(self, serializer):
-        user = serializer.save(is_active=True)
-        user.set_password(user.password)
-        user.save()
+        serializer.save(is_active=True)
+
+
+class UserImportAPIView(CreateAPIView):
+    """Массовая регистрация сотрудников (JSON-массив или NDJSON), только для
+    персонала. Все пользователи запроса создаются одной транзакцией.
+    """
+
+    serializer_class = UserImportSerializer
+    queryset = User.objects.all()
+    permission_classes = (IsAdminUser,)
+    parser_classes = (JSONParser, NDJSONParser)
+
+    # Максимальное число пользователей в одном запросе
+    bulk_max_items = 10000
+
+    def get_serializer(self, *args, **kwargs):
+        if "data" in kwargs:
+            kwargs.update(many=True, max_length=self.bulk_max_items)
+        return super().get_serializer(*args, **kwargs)